@@ -1,15 +1,24 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
+import click
 from extensions import db, migrate
 from constants.roles import RoleID
+import logging
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def create_app():
     """Flask application factory"""
+    # Structured JSON logs written by a background thread (see services/logging_service.py)
+    from services.logging_service import configure_logging, init_request_logging
+    configure_logging()
+    
     app = Flask(__name__)
+    init_request_logging(app)
     
     # Enable CORS for all routes
     CORS(app)
@@ -17,11 +26,18 @@ def create_app():
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://localhost/performance_management')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool size/overflow/timeouts from DB_* env vars (see services/db_pool_service.py)
+    from services.db_pool_service import build_engine_options, instrument_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SECRET_KEY'] = os.getenv('JWT_SECRET', 'your-secret-key-change-this-in-production')
+    # Background job worker threads per process (0 = run jobs inline in the request)
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    with app.app_context():
+        instrument_engine('primary', db.engine)
     
     # Load roles into cache at startup (dynamic role loading)
     # Import all models first to avoid circular import issues
@@ -41,18 +57,41 @@ def create_app():
         from models.notification import Notification
         from models.master import Master
         from models.eligibility_profile import EligibilityProfile
+        from models.job import Job
+        from models.cache_version import CacheVersion
+        from models.used_refresh_token import UsedRefreshToken
+        
+        # Registers the listeners that publish eligibility changes to every
+        # worker, so CLI commands and workers that never matched profiles bump it too
+        import services.eligibility_index  # noqa: F401
         
         # Now load roles
         from services.role_service import load_roles
         try:
             load_roles()
         except Exception as e:
-            print(f"Warning: Could not load roles at startup: {e}")
-            print("Roles will be loaded on first use")
+            logger.warning("Could not load roles at startup, roles will be loaded on first use: %s", e)
+    
+    # GET/HEAD requests run in read-only transactions, on a read replica when configured
+    from services.db_session_service import init_read_replicas
+    init_read_replicas(app)
+    
+    # Opt-in per-request query counts, DB time and N+1 warnings (QUERY_STATS_ENABLED)
+    from services.query_stats_service import init_query_stats
+    init_query_stats(app)
+    
+    # Request/domain metrics and GET /metrics (Prometheus text format)
+    from services.metrics_service import init_metrics
+    init_metrics(app)
     
     # Register routes
     register_routes(app)
     
+    # Background job workers start with the first request each serving process handles
+    # (registered after routes so all job handlers exist; CLI commands never start them)
+    from services.job_service import init_job_runner
+    init_job_runner(app)
+    
     # Register CLI commands
     register_commands(app)
     
@@ -75,16 +114,27 @@ def register_routes(app):
     from models.notification import Notification
     from models.master import Master
     from models.eligibility_profile import EligibilityProfile
-    from services.auth_service import create_user, authenticate_user, generate_token, get_user_by_id
-    from services.goal_service import create_goal, get_user_goals
+    from services.auth_service import create_user, authenticate_user, get_user_by_id, token_issuer, refresh_access_token
+    from services.password_service import PasswordPoolBusy
+    from services.metrics_service import goals_added, login_attempts
+    from services.goal_service import (
+        create_goal, get_user_goals, resolve_goal_targets, bulk_add_goals,
+        get_score_card_goals_data
+    )
     from services.competency_service import create_competency, get_user_competencies
-    from services.score_card_service import create_score_card, get_user_score_cards
+    from services.score_card_service import (
+        create_score_card, get_user_score_cards, adjust_goal_weight,
+        DEFAULT_GOALS_WEIGHTAGE, DEFAULT_COMPETENCIES_WEIGHTAGE, DEFAULT_VALUES_WEIGHTAGE, GOAL_ROLE_WEIGHT_COLUMNS
+    )
     from services.evaluation_service import create_evaluation, get_user_evaluations
     from services.notification_service import create_notification, get_unread_notifications, mark_notification_as_read
     from services.review_period_service import (
         create_review_period, get_all_review_periods, get_review_period_by_id,
-        update_review_period, delete_review_period, open_review_period, close_review_period
+        update_review_period, delete_review_period, open_review_period, close_review_period,
+        iter_review_periods, get_active_review_periods_with_counts
     )
+    from services.job_service import enqueue_job, get_job
+    from services.streaming_service import wants_stream, stream_json_array
     from middleware.auth import authenticate_token, authorize_role, role_required
 
     # Auth Routes
@@ -105,6 +155,8 @@ def register_routes(app):
             return jsonify(user.to_dict()), 201
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
+        except PasswordPoolBusy as e:
+            return jsonify({'error': 'Server is busy, please retry shortly'}), 503, {'Retry-After': str(e.retry_after)}
 
     @app.route('/api/login', methods=['POST'])
     def login():
@@ -119,27 +171,42 @@ def register_routes(app):
             if not email or not password:
                 return jsonify({'error': 'Email and password are required'}), 400
             
-            # Debug logging
-            print(f"Login attempt for email: {email}")
+            logger.debug("Login attempt for %s", email)
             
             user = authenticate_user(email, password)
             if not user:
-                print(f"Authentication failed for email: {email}")
+                login_attempts.inc(result='failed')
                 return jsonify({'error': 'Invalid email or password'}), 401
             
             # Ensure role relationship is loaded before generating token
             from sqlalchemy.orm import joinedload
             user = User.query.options(joinedload(User.role)).filter(User.id == user.id).first()
             
-            print(f"Authentication successful for user: {user.email} (role: {user.role.role_name if user.role else 'None'})")
-            token = generate_token(user)
-            return jsonify({'token': token, 'user': user.to_dict()})
+            logger.debug("Authentication successful for %s (role: %s)", user.email, user.role.role_name if user.role else None)
+            tokens = token_issuer.issue_tokens(user)
+            login_attempts.inc(result='success')
+            return jsonify({**tokens, 'user': user.to_dict()})
+        except PasswordPoolBusy as e:
+            # Too many logins in flight: shed load instead of queueing behind bcrypt
+            login_attempts.inc(result='busy')
+            return jsonify({'error': 'Too many login attempts in progress, please retry shortly'}), 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
-            print(f"Login error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            login_attempts.inc(result='error')
+            logger.exception("Login error")
             return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
+    @app.route('/api/token/refresh', methods=['POST'])
+    def refresh_token():
+        """Exchange a refresh token for a new access token (when JWT_REFRESH_TOKENS is enabled)"""
+        data = request.get_json() or {}
+        if not data.get('refresh_token'):
+            return jsonify({'error': 'refresh_token is required'}), 400
+        try:
+            user, tokens = refresh_access_token(data['refresh_token'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 401
+        return jsonify(tokens), 200
+
     @app.route('/api/current-user', methods=['GET'])
     @authenticate_token
     def get_current_user():
@@ -250,7 +317,9 @@ def register_routes(app):
     @app.route('/api/review-periods', methods=['GET'])
     @authenticate_token
     def get_all_review_periods_route():
-        """Get all review periods"""
+        """Get all review periods (?stream=true streams the array from a server-side cursor)"""
+        if wants_stream(request):
+            return stream_json_array(iter_review_periods(), lambda period: period.to_dict())
         periods = get_all_review_periods()
         return jsonify([period.to_dict() for period in periods])
 
@@ -356,31 +425,22 @@ def register_routes(app):
     @app.route('/api/review-periods/active', methods=['GET'])
     @authenticate_token
     def get_active_review_periods_route():
-        """Get active review periods with employee counts"""
-        from models.score_card import ScoreCard
-        
-        # Get active review periods
-        active_periods = ReviewPeriod.query.filter_by(
-            is_active=True,
-            deleted_at=None
-        ).all()
+        """Get active review periods with employee counts (?include_status=true adds per-status counts)"""
+        include_status = request.args.get('include_status', '').lower() in ('1', 'true', 'yes')
         
         result = []
-        for period in active_periods:
-            # Count employees with score cards for this period
-            employee_count = ScoreCard.query.filter_by(
-                review_period_id=period.id,
-                deleted_at=None
-            ).count()
-            
-            result.append({
+        for period, employee_count, status_counts in get_active_review_periods_with_counts(include_status):
+            item = {
                 'id': period.id,
                 'name': period.period_name,
                 'startDate': period.start_date.strftime('%b %d, %Y') if period.start_date else '',
                 'endDate': period.end_date.strftime('%b %d, %Y') if period.end_date else '',
                 'status': period.status or 'Draft',
                 'employeeCount': employee_count
-            })
+            }
+            if include_status:
+                item['statusCounts'] = status_counts
+            result.append(item)
         
         return jsonify(result), 200
 
@@ -390,22 +450,15 @@ def register_routes(app):
     @role_required('HR Admin')
     def get_eligibility_profiles():
         """Get all eligibility profiles with counts (HR Admin only)"""
-        from services.eligibility_service import get_all_profiles_with_counts, get_matching_employees
+        from services.eligibility_service import get_all_profiles_with_counts
         
         # Get the logged-in user's employee_id to exclude them from counts
         current_user_id = request.user.get('user_id') or request.user.get('id')
         current_user = User.query.get(current_user_id)
         excluded_employee_id = current_user.employee_id if current_user and current_user.employee_id else None
         
-        # Get profiles with counts
-        profiles = get_all_profiles_with_counts()
-        
-        # Adjust counts to exclude the logged-in user
-        if excluded_employee_id:
-            for profile in profiles:
-                employee_ids = get_matching_employees(profile['id'])
-                if excluded_employee_id in employee_ids:
-                    profile['matching_employees'] -= 1
+        # Get profiles with counts (all profiles evaluated in one grouped query)
+        profiles = get_all_profiles_with_counts(exclude_employee_id=excluded_employee_id)
         
         return jsonify(profiles), 200
 
@@ -419,11 +472,15 @@ def register_routes(app):
         Request body:
         {
             "review_period_id": 1,
-            "profile_ids": [1, 2, 3]
+            "profile_ids": [1, 2, 3],
+            "async": false
         }
+        
+        With "async": true the generation is enqueued as a background job and
+        202 is returned with the job id; poll GET /api/jobs/<job_id> for progress.
         """
-        from services.eligibility_service import get_matching_employees
-        from services.score_card_service import bulk_create_score_cards
+        from services.eligibility_service import get_matching_employees_for_profiles
+        from services.score_card_service import bulk_create_score_cards, get_score_card_employee_summaries
         
         data = request.get_json()
         review_period_id = data.get('review_period_id')
@@ -432,103 +489,132 @@ def register_routes(app):
         if not review_period_id or not profile_ids:
             return jsonify({'error': 'Missing required fields: review_period_id and profile_ids'}), 400
         
-        # Collect all unique employee IDs
-        all_employee_ids = set()
-        for profile_id in profile_ids:
-            employee_ids = get_matching_employees(profile_id)
-            all_employee_ids.update(employee_ids)
-        
         # Exclude the logged-in user's employee record
         # HR Admin shouldn't create a performance review for themselves
         current_user_id = request.user.get('user_id') or request.user.get('id')
         current_user = User.query.get(current_user_id)
+        
+        if data.get('async'):
+            job = enqueue_job('generate_score_cards', {
+                'review_period_id': review_period_id,
+                'profile_ids': profile_ids,
+                'created_by_user_id': current_user_id,
+                'excluded_employee_id': current_user.employee_id if current_user else None
+            }, created_by=current_user_id)
+            return jsonify({
+                'message': 'Score card generation started',
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}'
+            }), 202
+        
+        # Collect all unique employee IDs (union of profiles via the eligibility index)
+        all_employee_ids = set(get_matching_employees_for_profiles(profile_ids))
+        
         if current_user and current_user.employee_id:
             all_employee_ids.discard(current_user.employee_id)
-            print(f"Excluded logged-in user's employee_id {current_user.employee_id} from score card generation")
+            logger.debug("Excluded logged-in user's employee_id %s from score card generation", current_user.employee_id)
         
-        # Create score cards
-        created = bulk_create_score_cards(
+        # Create score cards (returns IDs of newly inserted cards only)
+        created_ids = bulk_create_score_cards(
             review_period_id=review_period_id,
             employee_ids=list(all_employee_ids),
             created_by_user_id=current_user_id
         )
+        created_id_set = set(created_ids)
         
-        # Get employee details for response
+        # Get employee details for response: every card, employee, department and
+        # position for the selected employees in one joined query
         employees_data = []
-        
-        # If new score cards were created, return those
-        if created:
-            for doc in created:
-                emp = doc.employee
-                employees_data.append({
-                    'id': emp.id,
-                    'name': emp.full_name,
-                    'department': emp.department.name if emp.department else 'N/A',
-                    'position': emp.position.title if emp.position else 'N/A',
-                    'score_card_id': doc.id
-                })
-        else:
-            # If no new ones created (already exist), get the existing ones
-            for employee_id in all_employee_ids:
-                existing_card = ScoreCard.query.filter_by(
-                    employee_id=employee_id,
-                    review_period_id=review_period_id,
-                    deleted_at=None
-                ).first()
-                if existing_card:
-                    emp = existing_card.employee
-                    employees_data.append({
-                        'id': emp.id,
-                        'name': emp.full_name,
-                        'department': emp.department.name if emp.department else 'N/A',
-                        'position': emp.position.title if emp.position else 'N/A',
-                        'score_card_id': existing_card.id
-                    })
+        for card in get_score_card_employee_summaries(review_period_id, all_employee_ids):
+            # If new score cards were created, return only those; otherwise the existing ones
+            if created_id_set and card['score_card_id'] not in created_id_set:
+                continue
+            employees_data.append(card)
         
         return jsonify({
-            'message': f'Created {len(created)} new score cards' if created else f'Score cards already exist for {len(employees_data)} employees',
-            'count': len(created) if created else len(employees_data),
+            'message': f'Created {len(created_ids)} new score cards' if created_ids else f'Score cards already exist for {len(employees_data)} employees',
+            'count': len(created_ids) if created_ids else len(employees_data),
             'employees': employees_data,
-            'already_existed': len(created) == 0
+            'already_existed': len(created_ids) == 0
         }), 201
 
+    # Job Routes
+    @app.route('/api/jobs/<int:job_id>', methods=['GET'])
+    @authenticate_token
+    def get_job_route(job_id):
+        """Get status and progress of a background job (creator only)"""
+        current_user_id = request.user.get('user_id') or request.user.get('id')
+        job = get_job(job_id)
+        if not job or job.created_by != current_user_id:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict()), 200
+
     # ==================== GOALS API ENDPOINTS (Phase 1) ====================
     
     @app.route('/api/score-cards', methods=['GET'])
     @authenticate_token
     def get_score_cards():
-        """Get all score cards, optionally filtered by review_period_id"""
-        review_period_id = request.args.get('review_period_id', type=int)
-        
-        query = ScoreCard.query.filter_by(deleted_at=None)
-        if review_period_id:
-            query = query.filter_by(review_period_id=review_period_id)
+        """
+        List score cards with optional filters, field selection and keyset pagination.
         
-        score_cards = query.all()
+        Query params: review_period_id, department_id, department, status, search,
+        manager_id (an Employee id, or "me" for the logged-in user's team),
+        fields (comma-separated), limit, cursor, stream. Without limit/cursor the full
+        list is returned as a plain array (streamed with ?stream=true); otherwise
+        {items, next_cursor}.
+        """
+        from services.score_card_service import list_score_cards, iter_score_cards, MAX_SCORE_CARD_PAGE_SIZE
+        
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+        paginated = 'limit' in request.args or 'cursor' in request.args
+        if paginated:
+            if limit is None:
+                limit = 100
+            if limit < 1 or limit > MAX_SCORE_CARD_PAGE_SIZE:
+                return jsonify({'error': f'limit must be between 1 and {MAX_SCORE_CARD_PAGE_SIZE}'}), 400
+        
+        manager_id = request.args.get('manager_id')
+        if manager_id == 'me':
+            current_user = User.query.get(request.user.get('user_id'))
+            if not current_user or not current_user.employee_id:
+                return jsonify({'error': 'Current user has no employee record'}), 400
+            manager_id = current_user.employee_id
+        elif manager_id:
+            if not manager_id.isdigit():
+                return jsonify({'error': 'manager_id must be an employee id or "me"'}), 400
+            manager_id = int(manager_id)
+        
+        fields = request.args.get('fields')
+        fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+        filters = dict(
+            review_period_id=request.args.get('review_period_id', type=int),
+            manager_id=manager_id,
+            department_id=request.args.get('department_id', type=int),
+            department=request.args.get('department'),
+            status=request.args.get('status'),
+            search=request.args.get('search'),
+            fields=fields
+        )
         
-        result = []
-        for sc in score_cards:
-            result.append({
-                'id': sc.id,
-                'employee_id': sc.employee_id,
-                'review_period_id': sc.review_period_id,
-                'status': sc.status,
-                'employee': {
-                    'id': sc.employee.id,
-                    'full_name': sc.employee.full_name,
-                    'email': sc.employee.email,
-                    'department': {
-                        'id': sc.employee.department.id if sc.employee.department else None,
-                        'name': sc.employee.department.name if sc.employee.department else None
-                    },
-                    'position': {
-                        'id': sc.employee.position.id if sc.employee.position else None,
-                        'title': sc.employee.position.title if sc.employee.position else None
-                    }
-                } if sc.employee else None
-            })
+        try:
+            if not paginated and wants_stream(request):
+                return stream_json_array(iter_score_cards(**filters))
+            items, next_cursor = list_score_cards(
+                limit=limit if paginated else None,
+                after_id=cursor,
+                **filters
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify(result), 200
+        if not paginated:
+            return jsonify(items), 200
+        return jsonify({
+            'items': items,
+            'next_cursor': str(next_cursor) if next_cursor is not None else None
+        }), 200
     
     @app.route('/api/score-cards/<int:score_card_id>/weightage', methods=['GET'])
     @authenticate_token
@@ -538,12 +624,18 @@ def register_routes(app):
         if not score_card:
             return jsonify({'error': 'Score card not found'}), 404
         
+        # Legacy cards without weightage read as the defaults (see `flask backfill-weightage`)
+        goals_weightage = score_card.goals_weightage if score_card.goals_weightage is not None else DEFAULT_GOALS_WEIGHTAGE
+        competencies_weightage = (score_card.competencies_weightage if score_card.competencies_weightage is not None
+                                  else DEFAULT_COMPETENCIES_WEIGHTAGE)
+        values_weightage = score_card.values_weightage if score_card.values_weightage is not None else DEFAULT_VALUES_WEIGHTAGE
+        
         return jsonify({
             'score_card_id': score_card_id,
-            'goals_weightage': score_card.goals_weightage,
-            'competencies_weightage': score_card.competencies_weightage,
-            'values_weightage': score_card.values_weightage,
-            'total': score_card.goals_weightage + score_card.competencies_weightage + score_card.values_weightage
+            'goals_weightage': goals_weightage,
+            'competencies_weightage': competencies_weightage,
+            'values_weightage': values_weightage,
+            'total': goals_weightage + competencies_weightage + values_weightage
         }), 200
 
     @app.route('/api/score-cards/<int:score_card_id>/weightage', methods=['PUT'])
@@ -595,36 +687,23 @@ def register_routes(app):
         if not score_card:
             return jsonify({'error': 'Score card not found'}), 404
         
-        # Set default weightage if null (for score cards created before migration)
-        if score_card.goals_weightage is None:
-            score_card.goals_weightage = 60
-            score_card.competencies_weightage = 25
-            score_card.values_weightage = 15
-            db.session.commit()
-        
-        # Get all active goals for this score card
-        goals = Goal.query.filter_by(
-            score_card_id=score_card_id,
-            deleted_at=None
-        ).all()
+        # Get all active goals for this score card (authors are loaded in the same query)
+        goals_data = get_score_card_goals_data(score_card_id)
         
-        # Calculate planning progress by role
+        # Calculate planning progress by role (weights come from the score card's running totals)
         planning_progress = {}
-        for role in ['HR', 'Manager', 'Employee']:
-            role_goals = [g for g in goals if g.added_by_role == role]
+        for role, weight_column in GOAL_ROLE_WEIGHT_COLUMNS.items():
             planning_progress[role] = {
-                'count': len(role_goals),
-                'total_weight': sum(g.weight for g in role_goals)
+                'count': sum(1 for g in goals_data if g['added_by_role'] == role),
+                'total_weight': getattr(score_card, weight_column.key)
             }
         
-        planning_progress['total_weight'] = sum(g.weight for g in goals)
-        
-        # Format goals for response (using to_dict method which includes user details)
-        goals_data = [goal.to_dict() for goal in goals]
+        planning_progress['total_weight'] = score_card.total_goal_weight
         
         return jsonify({
             'score_card_id': score_card_id,
-            'goals_weightage': score_card.goals_weightage,
+            # Legacy cards without weightage read as the defaults (see `flask backfill-weightage`)
+            'goals_weightage': score_card.goals_weightage if score_card.goals_weightage is not None else DEFAULT_GOALS_WEIGHTAGE,
             'goals': goals_data,
             'planning_progress': planning_progress
         }), 200
@@ -661,22 +740,10 @@ def register_routes(app):
         added_by_role = role_mapping.get(role_name, 'Employee')
         
         # Debug: log the role mapping
-        print(f"DEBUG: JWT role={role_name}, mapped to added_by_role={added_by_role}")
+        logger.debug("JWT role=%s, mapped to added_by_role=%s", role_name, added_by_role)
         
-        # Validate total weight doesn't exceed goals_weightage
-        existing_goals = Goal.query.filter_by(
-            score_card_id=score_card_id,
-            deleted_at=None
-        ).all()
-        
-        total_existing_weight = sum(g.weight for g in existing_goals)
         new_weight = int(data.get('weight', 0))
         
-        if total_existing_weight + new_weight > score_card.goals_weightage:
-            return jsonify({
-                'error': f'Total goal weight would exceed {score_card.goals_weightage}%. Current total: {total_existing_weight}%, trying to add: {new_weight}%'
-            }), 400
-        
         # Parse dates if provided
         from datetime import datetime
         start_date = None
@@ -718,20 +785,70 @@ def register_routes(app):
             updated_by=current_user['user_id']
         )
         
+        # Validate total weight doesn't exceed goals_weightage (atomic check-and-increment)
+        if not adjust_goal_weight(score_card_id, new_weight, added_by_role):
+            db.session.rollback()
+            goals_weightage = score_card.goals_weightage or DEFAULT_GOALS_WEIGHTAGE
+            return jsonify({
+                'error': f'Total goal weight would exceed {goals_weightage}%. Current total: {score_card.total_goal_weight}%, trying to add: {new_weight}%'
+            }), 400
+        
         db.session.add(goal)
         db.session.commit()
+        goals_added.inc(source='single')
         
         return jsonify({
             'message': 'Goal added successfully',
             'goal': goal.to_dict()
         }), 201
 
+    @app.route('/api/goals/bulk', methods=['POST'])
+    @authenticate_token
+    @role_required('HR Admin')
+    def bulk_add_goals_route():
+        """
+        Add a goal set to many score cards at once.
+        
+        Request body:
+        {
+            "goals": [{"goal_name": "...", "weight": 20, ...}],   (or "goal": {...} for one template)
+            "score_card_ids": [1, 2, 3],                          (or "review_period_id", optionally with "profile_ids")
+        }
+        
+        Cards without enough weight budget (or not found) are reported in "failed";
+        the rest of the batch is still applied.
+        """
+        data = request.get_json() or {}
+        goals = data.get('goals') or ([data['goal']] if data.get('goal') else [])
+        
+        try:
+            score_card_ids = resolve_goal_targets(
+                score_card_ids=data.get('score_card_ids'),
+                review_period_id=data.get('review_period_id'),
+                profile_ids=data.get('profile_ids')
+            )
+            result = bulk_add_goals(
+                score_card_ids,
+                goals,
+                added_by_role='HR',
+                user_id=request.user['user_id']
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'message': f"Added {len(goals)} goal(s) to {len(result['applied'])} score card(s)",
+            'targets': len(score_card_ids),
+            **result
+        }), 200
+
     @app.route('/api/goals/<int:goal_id>', methods=['PUT'])
     @authenticate_token
     def update_goal(goal_id):
         """Update an existing goal"""
         
-        goal = Goal.query.get(goal_id)
+        # Lock the goal row so concurrent edits see each other's weight changes
+        goal = Goal.query.filter_by(id=goal_id).with_for_update().first()
         if not goal:
             return jsonify({'error': 'Goal not found'}), 404
         
@@ -751,25 +868,15 @@ def register_routes(app):
         if 'status' in data:
             goal.status = data['status']
         
-        # Update weight with validation
+        # Update weight with validation (atomic check-and-adjust of the score card total)
         if 'weight' in data:
             new_weight = int(data['weight'])
             
-            # Get score card to check weightage limit
-            score_card = ScoreCard.query.get(goal.score_card_id)
-            
-            # Calculate total weight excluding current goal
-            other_goals = Goal.query.filter(
-                Goal.score_card_id == goal.score_card_id,
-                Goal.id != goal_id,
-                Goal.deleted_at.is_(None)
-            ).all()
-            
-            total_other_weight = sum(g.weight for g in other_goals)
-            
-            if total_other_weight + new_weight > score_card.goals_weightage:
+            if not adjust_goal_weight(goal.score_card_id, new_weight - goal.weight, goal.added_by_role):
+                db.session.rollback()
+                score_card = ScoreCard.query.get(goal.score_card_id)
                 return jsonify({
-                    'error': f'Total goal weight would exceed {score_card.goals_weightage}%'
+                    'error': f'Total goal weight would exceed {score_card.goals_weightage or DEFAULT_GOALS_WEIGHTAGE}%'
                 }), 400
             
             goal.weight = new_weight
@@ -809,15 +916,17 @@ def register_routes(app):
     def delete_goal(goal_id):
         """Soft delete a goal"""
         
-        goal = Goal.query.get(goal_id)
+        # Lock the goal row so a concurrent delete cannot release its weight twice
+        goal = Goal.query.filter_by(id=goal_id).with_for_update().first()
         if not goal:
             return jsonify({'error': 'Goal not found'}), 404
         
         if goal.deleted_at:
             return jsonify({'error': 'Goal already deleted'}), 404
         
-        # Soft delete
+        # Soft delete and release its weight from the score card totals
         from datetime import datetime
+        adjust_goal_weight(goal.score_card_id, -goal.weight, goal.added_by_role, enforce_limit=False)
         goal.deleted_at = datetime.utcnow()
         goal.updated_by = request.user['user_id']
         db.session.commit()
@@ -835,17 +944,14 @@ def register_routes(app):
             return jsonify({'error': 'Score card not found'}), 404
         
         # Validate total goal weights = goals_weightage
-        goals = Goal.query.filter_by(
-            score_card_id=score_card_id,
-            deleted_at=None
-        ).all()
-        
-        total_goal_weight = sum(g.weight for g in goals)
+        # (legacy cards without weightage read as the defaults, see `flask backfill-weightage`)
+        total_goal_weight = score_card.total_goal_weight
+        goals_weightage = score_card.goals_weightage if score_card.goals_weightage is not None else DEFAULT_GOALS_WEIGHTAGE
         
-        if total_goal_weight != score_card.goals_weightage:
+        if total_goal_weight != goals_weightage:
             return jsonify({
-                'error': f'Total goal weight must equal {score_card.goals_weightage}%. Current: {total_goal_weight}%',
-                'required': score_card.goals_weightage,
+                'error': f'Total goal weight must equal {goals_weightage}%. Current: {total_goal_weight}%',
+                'required': goals_weightage,
                 'current': total_goal_weight
             }), 400
         
@@ -862,6 +968,43 @@ def register_routes(app):
             'status': 'pending_acceptance'
         }), 200
 
+    # ==================== ORG HIERARCHY ENDPOINTS ====================
+    
+    def _org_hierarchy_response(employee_id):
+        from services.org_hierarchy_service import get_subtree, get_ancestors, get_span_of_control
+        
+        depth = request.args.get('depth', type=int)
+        if depth is not None and depth < 1:
+            return jsonify({'error': 'depth must be at least 1'}), 400
+        return jsonify({
+            'employee_id': employee_id,
+            'managers': get_ancestors(employee_id),
+            'span_of_control': get_span_of_control(employee_id),
+            'reports': get_subtree(employee_id, max_depth=depth)
+        }), 200
+    
+    @app.route('/api/my-team', methods=['GET'])
+    @authenticate_token
+    def get_my_team():
+        """
+        The logged-in user's reporting chain, span of control and everyone
+        reporting to them (any depth; limit levels with ?depth=N).
+        """
+        current_user = User.query.get(request.user.get('user_id'))
+        if not current_user or not current_user.employee_id:
+            return jsonify({'error': 'Current user has no employee record'}), 404
+        return _org_hierarchy_response(current_user.employee_id)
+    
+    @app.route('/api/employees/<int:employee_id>/hierarchy', methods=['GET'])
+    @authenticate_token
+    @role_required('HR Admin')
+    def get_employee_hierarchy(employee_id):
+        """Reporting chain, span of control and reports of any employee (HR Admin)"""
+        employee = Employee.query.filter_by(id=employee_id, deleted_at=None).first()
+        if not employee:
+            return jsonify({'error': 'Employee not found'}), 404
+        return _org_hierarchy_response(employee_id)
+
 
 def register_commands(app):
     """Register Flask CLI commands"""
@@ -871,6 +1014,24 @@ def register_commands(app):
         from seed_db import seed_database
         seed_database()
 
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Run queued and crashed background jobs in the foreground"""
+        from services.job_service import run_pending_jobs
+        count = run_pending_jobs()
+        print(f"✓ Processed {count} queued jobs")
+
+    @app.cli.command('backfill-weightage')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Score cards updated per transaction')
+    def backfill_weightage_command(chunk_size):
+        """Set default weightage (60/25/15) on legacy score cards with NULL weightage"""
+        from services.score_card_service import backfill_default_weightage
+        count = backfill_default_weightage(
+            chunk_size=chunk_size,
+            progress_callback=lambda updated: print(f"  ... {updated} score cards updated")
+        )
+        print(f"✓ Backfilled weightage on {count} score cards")
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True, port=5002)
\ No newline at end of file
@@ -0,0 +1,409 @@
+"""
+Index benchmark - query plans and latencies before/after the hot-query indexes
+(migration e6a1c93f7b52) on a seeded dataset.
+
+Usage:
+    python benchmark_indexes.py [--url URL] [--employees 100000] [--repeat 50]
+
+The "before" schema is the tables as migrated to the revision preceding
+e6a1c93f7b52, derived by replaying the migrations' index operations (the
+chain itself only runs on PostgreSQL).
+
+The dataset is written to a scratch database, never to the application tables:
+a fresh SQLite file (default /tmp/pms_index_benchmark.sqlite), or for PostgreSQL
+a dedicated `pms_index_benchmark` schema that is dropped and recreated.
+"""
+from sqlalchemy import Index, MetaData, Table, UniqueConstraint, create_engine, func, select, text
+from contextlib import contextmanager
+from datetime import date, datetime
+import argparse
+import glob
+import importlib.util
+import os
+import random
+import statistics
+import time
+
+from models.role import Role
+from models.department import Department
+from models.position import Position
+from models.employee import Employee
+from models.user import User
+from models.review_period import ReviewPeriod
+from models.score_card import ScoreCard
+from models.goal import Goal
+from models.notification import Notification
+from models.evaluation import Evaluation
+# Remaining models are imported so relationships between all mappers resolve
+from models.competency import Competency  # noqa: F401
+from models.master import Master  # noqa: F401
+from models.eligibility_profile import EligibilityProfile  # noqa: F401
+
+BENCHMARK_SCHEMA = 'pms_index_benchmark'
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', 'versions')
+MIGRATION_PATH = os.path.join(VERSIONS_DIR, 'e6a1c93f7b52_add_partial_indexes_for_hot_queries.py')
+
+TABLES = [Role, Department, Position, Employee, User, ReviewPeriod, ScoreCard, Goal, Notification, Evaluation]
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_migration():
+    return load_module(MIGRATION_PATH)
+
+
+class _IndexRecorder:
+    """
+    Stand-in for alembic's `op` that replays a migration's upgrade() and only
+    tracks the indexes and unique constraints it leaves behind (every other
+    operation is a no-op).
+    """
+
+    def __init__(self):
+        self.indexes = {}  # name -> (table, columns, unique)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def create_table(self, table_name, *elements, **kwargs):
+        table = Table(table_name, MetaData(), *elements)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                columns = [column.name for column in constraint.columns]
+                self.indexes[constraint.name or f"{table_name}_{'_'.join(columns)}_key"] = (table_name, columns, True)
+        for index in table.indexes:
+            self.indexes[index.name] = (table_name, [column.name for column in index.columns], index.unique)
+
+    def drop_table(self, table_name, **kwargs):
+        self.indexes = {name: spec for name, spec in self.indexes.items() if spec[0] != table_name}
+
+    def rename_table(self, old_name, new_name, **kwargs):
+        self.indexes = {name: (new_name if spec[0] == old_name else spec[0],) + spec[1:]
+                        for name, spec in self.indexes.items()}
+
+    def create_index(self, name, table_name, columns, unique=False, **kwargs):
+        self.indexes[name] = (table_name, list(columns), unique)
+
+    def create_unique_constraint(self, name, table_name, columns, **kwargs):
+        self.indexes[name] = (table_name, list(columns), True)
+
+    def drop_index(self, name, table_name=None, **kwargs):
+        self.indexes.pop(name, None)
+
+    def drop_constraint(self, name, table_name=None, type_=None, **kwargs):
+        if name is not None:
+            self.indexes.pop(name, None)
+
+    @contextmanager
+    def batch_alter_table(self, table_name, **kwargs):
+        yield _BatchIndexRecorder(self, table_name)
+
+
+class _BatchIndexRecorder:
+    def __init__(self, recorder, table_name):
+        self.recorder = recorder
+        self.table_name = table_name
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def create_index(self, name, columns, unique=False, **kwargs):
+        self.recorder.create_index(name, self.table_name, columns, unique)
+
+    def create_unique_constraint(self, name, columns, **kwargs):
+        self.recorder.create_unique_constraint(name, self.table_name, columns)
+
+    def drop_index(self, name, **kwargs):
+        self.recorder.drop_index(name)
+
+    def drop_constraint(self, name, type_=None, **kwargs):
+        self.recorder.drop_constraint(name)
+
+
+def migrated_indexes(head_revision):
+    """
+    Indexes on the benchmarked tables at head_revision, derived by replaying
+    every migration up to it. Uniques the model tables already create are left
+    out, so the result can be added to a schema created from the models.
+    """
+    migrations = {}
+    for path in glob.glob(os.path.join(VERSIONS_DIR, '*.py')):
+        module = load_module(path)
+        migrations[module.revision] = module
+    chain = []
+    revision = head_revision
+    while revision is not None:
+        chain.append(migrations[revision])
+        revision = migrations[revision].down_revision
+
+    recorder = _IndexRecorder()
+    for module in reversed(chain):
+        module.op = recorder
+        module.upgrade()
+
+    tables = {model.__table__.name: model.__table__ for model in TABLES}
+    specs = []
+    for name, (table_name, columns, unique) in sorted(recorder.indexes.items()):
+        table = tables.get(table_name)
+        if table is None:
+            continue
+        model_unique = [[column.name for column in c.columns] for c in table.constraints
+                        if isinstance(c, UniqueConstraint)]
+        model_unique += [[column.name] for column in table.columns if column.unique]
+        if unique and columns in model_unique:
+            continue
+        specs.append((name, table_name, columns, None, unique))
+    return specs
+
+
+def make_engine(url):
+    if url.startswith('sqlite'):
+        path = url.split('///', 1)[-1]
+        if path and os.path.exists(path):
+            os.remove(path)
+        return create_engine(url)
+    engine = create_engine(url, connect_args={'options': f'-c search_path={BENCHMARK_SCHEMA}'})
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE')
+        connection.exec_driver_sql(f'CREATE SCHEMA {BENCHMARK_SCHEMA}')
+    return engine
+
+
+def insert_chunked(connection, table, rows, chunk_size=10000):
+    for start in range(0, len(rows), chunk_size):
+        connection.execute(table.insert(), rows[start:start + chunk_size])
+
+
+def seed(engine, employees):
+    """Seed roles, org structure, users, periods, score cards, goals, notifications and evaluations"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    audit = {'created_at': now, 'updated_at': now}
+    departments = 20
+    positions = 200
+    titles = ['Engineer', 'Senior Engineer', 'Manager', 'Director', 'Analyst', 'Sales Lead', 'HR Partner', 'Developer']
+
+    for model in TABLES:
+        model.__table__.create(engine)
+
+    with engine.begin() as connection:
+        insert_chunked(connection, Role.__table__, [
+            dict(id=i, role_name=name, is_active=True, **audit)
+            for i, name in enumerate(['User Admin', 'HR Admin', 'Manager', 'Employee', 'External User'], 1)
+        ])
+        insert_chunked(connection, Department.__table__, [
+            dict(id=i, name=f'Department {i}', **audit) for i in range(1, departments + 1)
+        ])
+        insert_chunked(connection, Position.__table__, [
+            dict(id=i, title=f'{titles[i % len(titles)]} {i}', department_id=(i % departments) + 1, **audit)
+            for i in range(1, positions + 1)
+        ])
+        insert_chunked(connection, Employee.__table__, [dict(
+            id=i,
+            employee_id=f'E{i:06d}',
+            full_name=f'Employee {i}',
+            email=f'employee{i}@example.com',
+            joining_date=date(2020, 1, 1),
+            department_id=rng.randint(1, departments),
+            position_id=rng.randint(1, positions),
+            reporting_manager_id=(i - 1) // 8 or None,
+            employment_status='Active' if rng.random() < 0.95 else 'Terminated',
+            is_active=rng.random() < 0.95,
+            deleted_at=now if rng.random() < 0.02 else None,
+            **audit
+        ) for i in range(1, employees + 1)])
+        insert_chunked(connection, User.__table__, [dict(
+            id=i,
+            username=f'user{i}',
+            email=f'employee{i}@example.com',
+            password='x',
+            role_id=4,
+            is_active=True,
+            employee_id=i,
+            deleted_at=now if rng.random() < 0.02 else None,
+            **audit
+        ) for i in range(1, employees + 1)])
+        insert_chunked(connection, ReviewPeriod.__table__, [dict(
+            id=i,
+            period_name=f'Period {i}',
+            period_type='Annual',
+            start_date=date(2018 + i, 1, 1),
+            end_date=date(2018 + i, 12, 31),
+            status='Active' if i >= 7 else 'Completed',
+            is_active=i >= 7,
+            created_by=1,
+            **audit
+        ) for i in range(1, 9)])
+
+        # Two score cards per employee (one closed and one active period)
+        cards = []
+        for i in range(1, employees + 1):
+            for period_id in (6, 8):
+                cards.append(dict(
+                    id=len(cards) + 1,
+                    employee_id=i,
+                    review_period_id=period_id,
+                    status=rng.choice(['planning', 'planning', 'pending_acceptance', 'active']),
+                    goals_weightage=60,
+                    competencies_weightage=25,
+                    values_weightage=15,
+                    total_goal_weight=45,
+                    deleted_at=now if rng.random() < 0.02 else None,
+                    approval_history=[],
+                    **audit
+                ))
+        insert_chunked(connection, ScoreCard.__table__, cards)
+
+        goals = [dict(
+            score_card_id=card['id'],
+            goal_name=f'Goal {n}',
+            weight=15,
+            added_by_role='HR',
+            added_by_user_id=1,
+            created_by=1,
+            status='active',
+            deleted_at=now if rng.random() < 0.05 else None,
+            **audit
+        ) for card in cards for n in range(3)]
+        insert_chunked(connection, Goal.__table__, goals)
+
+        insert_chunked(connection, Notification.__table__, [dict(
+            recipient_id=rng.randint(1, employees),
+            message='Score card ready',
+            entity_type='ScoreCard',
+            entity_id=rng.randint(1, len(cards)),
+            is_read=rng.random() >= 0.2,
+            **audit
+        ) for _ in range(employees * 3)])
+
+        insert_chunked(connection, Evaluation.__table__, [dict(
+            evaluation_type='Self',
+            score_card_id=card['id'],
+            user_id=card['employee_id'],
+            ratings={},
+            status='Draft',
+            **audit
+        ) for card in cards if card['review_period_id'] == 6])
+
+    print(f"Seeded {employees} employees, {len(cards)} score cards, {len(goals)} goals, "
+          f"{employees * 3} notifications")
+    return len(cards)
+
+
+def build_queries(employees, cards):
+    """The application's hot query shapes, built with the same SQLAlchemy expressions"""
+    rng = random.Random(7)
+    return {
+        'goals_for_score_card': lambda: select(Goal).where(
+            Goal.score_card_id == rng.randint(1, cards), Goal.deleted_at.is_(None)),
+        'score_cards_page': lambda: select(ScoreCard.id, ScoreCard.status).where(
+            ScoreCard.deleted_at.is_(None), ScoreCard.review_period_id == 8,
+            ScoreCard.id > rng.randint(1, cards - 1000)).order_by(ScoreCard.id).limit(100),
+        'active_period_counts': lambda: select(
+            ReviewPeriod.id, ScoreCard.status, func.count(ScoreCard.id)
+        ).outerjoin(
+            ScoreCard, (ScoreCard.review_period_id == ReviewPeriod.id) & ScoreCard.deleted_at.is_(None)
+        ).where(
+            ReviewPeriod.is_active == True, ReviewPeriod.deleted_at.is_(None)
+        ).group_by(ReviewPeriod.id, ScoreCard.status),
+        'unread_notifications': lambda: select(Notification).filter_by(
+            recipient_id=rng.randint(1, employees), is_read=False),
+        'eligible_employees': lambda: select(Employee.id).where(
+            Employee.is_active == True, Employee.employment_status == 'Active', Employee.deleted_at.is_(None),
+            Employee.department_id == rng.randint(1, 20), Employee.position_id.in_(range(1, 200, 8))),
+        'login_by_email': lambda: select(User).where(
+            User.email == f'employee{rng.randint(1, employees)}@example.com',
+            User.deleted_at.is_(None), User.is_active == True),
+    }
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    sql = str(compiled)
+    if connection.dialect.name == 'postgresql':
+        rows = connection.exec_driver_sql('EXPLAIN (ANALYZE, BUFFERS) ' + sql, compiled.params)
+        return '\n'.join(row[0] for row in rows)
+    params = tuple(compiled.params[key] for key in compiled.positiontup)
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params)
+    return '\n'.join(row[-1] for row in rows)
+
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as connection:
+        connection.exec_driver_sql('ANALYZE')
+        for name, make_statement in queries.items():
+            plan = explain(connection, make_statement())
+            timings = []
+            for _ in range(repeat):
+                statement = make_statement()
+                start = time.perf_counter()
+                connection.execute(statement).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                'plan': plan,
+                'median_ms': statistics.median(timings),
+                'p95_ms': timings[int(len(timings) * 0.95) - 1]
+            }
+    return results
+
+
+def create_indexes(engine, specs):
+    tables = {model.__table__.name: model.__table__ for model in TABLES}
+    sqlite_predicate = load_migration().sqlite_predicate
+    with engine.begin() as connection:
+        for spec in specs:
+            name, table_name, columns = spec[:3]
+            where = spec[3] if len(spec) > 3 else None
+            unique = spec[4] if len(spec) > 4 else False
+            table = tables[table_name]
+            Index(
+                name, *[table.c[column] for column in columns], unique=unique,
+                postgresql_where=text(where) if where else None,
+                sqlite_where=text(sqlite_predicate(where)) if where else None
+            ).create(connection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.getenv('BENCHMARK_DATABASE_URL', 'sqlite:////tmp/pms_index_benchmark.sqlite'))
+    parser.add_argument('--employees', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    migration = load_migration()
+    # The "before" state is the schema as migrated up to the revision preceding the new indexes
+    baseline = migrated_indexes(migration.down_revision)
+    print(f"Baseline indexes at {migration.down_revision}: " +
+          (', '.join(spec[0] for spec in baseline) or 'none beyond primary keys and model uniques'))
+
+    engine = make_engine(args.url)
+    cards = seed(engine, args.employees)
+    create_indexes(engine, baseline)
+    queries = build_queries(args.employees, cards)
+
+    before = measure(engine, queries, args.repeat)
+    create_indexes(engine, migration.INDEXES)
+    after = measure(engine, queries, args.repeat)
+
+    for name in queries:
+        print(f"\n=== {name} ===")
+        print(f"-- before: median {before[name]['median_ms']:.2f} ms, p95 {before[name]['p95_ms']:.2f} ms")
+        print(before[name]['plan'])
+        print(f"-- after:  median {after[name]['median_ms']:.2f} ms, p95 {after[name]['p95_ms']:.2f} ms")
+        print(after[name]['plan'])
+
+    print(f"\n{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in queries:
+        b, a = before[name]['median_ms'], after[name]['median_ms']
+        print(f"{name:<24}{b:>12.2f}{a:>12.2f}{b / a if a else float('inf'):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,18 @@
 from functools import wraps
 from flask import request, jsonify
 import jwt
-import os
+import logging
 from dotenv import load_dotenv
-from cryptography.hazmat.primitives import serialization
+from services.jwt_key_service import public_keyring
+from services.token_cache_service import token_cache, token_revocations
 
 load_dotenv()
 
-# JWT configuration - EdDSA only
-JWT_PUBLIC_KEY = os.getenv('JWT_PUBLIC_KEY')
+logger = logging.getLogger(__name__)
 
-if not JWT_PUBLIC_KEY:
-    raise ValueError("JWT_PUBLIC_KEY must be set in .env file for EdDSA authentication")
+# JWT configuration - EdDSA only (keys are parsed once and cached in the keyring)
+if not public_keyring.is_configured():
+    raise ValueError("JWT_PUBLIC_KEY or JWT_PUBLIC_KEYS_FILE must be set in .env file for EdDSA authentication")
 
 def authenticate_token(f):
     """Decorator to authenticate JWT token"""
@@ -30,19 +31,35 @@ def authenticate_token(f):
         if not token:
             return jsonify({'error': 'Missing authentication token'}), 401
         
+        # Previously verified tokens skip signature verification (see services/token_cache_service.py)
+        data = token_cache.get(token)
+        if data is not None:
+            if token_revocations.is_revoked(data):
+                return jsonify({'error': 'Token has been revoked'}), 401
+            request.user = data
+            return f(*args, **kwargs)
+        
         try:
-            # Decode token with EdDSA only
-            # Replace escaped newlines with actual newlines
-            public_key_str = JWT_PUBLIC_KEY.replace('\\n', '\n')
-            public_key = serialization.load_pem_public_key(
-                public_key_str.encode('utf-8')
-            )
+            # Decode token with EdDSA only, using the cached key selected by the 'kid' header
+            kid = jwt.get_unverified_header(token).get('kid')
+            public_key = public_keyring.get(kid)
+            if public_key is None:
+                return jsonify({'error': 'Invalid token'}), 401
             data = jwt.decode(token, public_key, algorithms=['EdDSA'])
             
+            # Refresh tokens may only be used at /api/token/refresh
+            if data.get('typ') == 'refresh':
+                return jsonify({'error': 'Invalid token'}), 401
+            
             # Normalize user_id (token may have 'id' or 'user_id')
             if 'user_id' not in data and 'id' in data:
                 data['user_id'] = data['id']
             
+            # Issued before the user was deactivated (see services/token_cache_service.py)
+            if token_revocations.is_revoked(data):
+                return jsonify({'error': 'Token has been revoked'}), 401
+            
+            token_cache.put(token, data)
             request.user = data  # Store user info in request
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
@@ -85,7 +102,33 @@ def role_required(*allowed_role_names):
     
     Can also accept role_ids (integers) for backward compatibility:
     Usage: @role_required(2)  # HR Admin (by ID)
+    
+    Allowed role names are resolved to a frozenset of role_ids once and reused
+    until services/role_service bumps its cache version; unknown names never
+    trigger a database reload from the request path.
     """
+    fixed_role_ids = frozenset(r for r in allowed_role_names if isinstance(r, int))
+    role_names = tuple(r for r in allowed_role_names if isinstance(r, str))
+    # (role cache version, resolved role_ids) - replaced atomically on re-resolve
+    resolved = [None, fixed_role_ids]
+    
+    def resolve_allowed_role_ids():
+        from services.role_service import get_role_id_by_name, get_role_cache_version
+        version = get_role_cache_version()
+        if resolved[0] == version:
+            return resolved[1]
+        
+        role_ids = set(fixed_role_ids)
+        for name in role_names:
+            role_id = get_role_id_by_name(name)
+            if role_id:
+                role_ids.add(role_id)
+            else:
+                logger.warning("role_required references unknown role '%s'", name)
+        # Read the version after resolving: the lookup above may have loaded roles
+        resolved[:] = [get_role_cache_version(), frozenset(role_ids)]
+        return resolved[1]
+    
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -93,33 +136,10 @@ def role_required(*allowed_role_names):
                 return jsonify({'error': 'Authentication required'}), 401
             
             user_role_id = request.user.get('role_id')
-            user_role_name = request.user.get('role')
-            
-            # Convert role names to role_ids if needed
-            from services.role_service import get_role_id_by_name, get_all_roles
-            allowed_role_ids = set()
             
-            for allowed in allowed_role_names:
-                if isinstance(allowed, int):
-                    # Already a role_id
-                    allowed_role_ids.add(allowed)
-                elif isinstance(allowed, str):
-                    # Role name - convert to role_id
-                    role_id = get_role_id_by_name(allowed)
-                    if role_id:
-                        allowed_role_ids.add(role_id)
-                    else:
-                        # Role not found in cache, try to reload
-                        from services.role_service import reload_roles
-                        reload_roles()
-                        role_id = get_role_id_by_name(allowed)
-                        if role_id:
-                            allowed_role_ids.add(role_id)
-            
-            if user_role_id not in allowed_role_ids:
+            if user_role_id not in resolve_allowed_role_ids():
                 return jsonify({'error': 'Insufficient permissions'}), 403
             
             return f(*args, **kwargs)
         return decorated_function
     return decorator
-
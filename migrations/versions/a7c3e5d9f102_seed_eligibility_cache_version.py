@@ -0,0 +1,37 @@
+"""seed the eligibility row in cache_versions
+
+Revision ID: a7c3e5d9f102
+Revises: f29d5b7c4e18
+Create Date: 2026-10-18 19:12:44.108215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5d9f102'
+down_revision = 'f29d5b7c4e18'
+branch_labels = None
+depends_on = None
+
+
+cache_versions = sa.table(
+    'cache_versions',
+    sa.column('name', sa.String),
+    sa.column('version', sa.Integer),
+    sa.column('updated_at', sa.DateTime)
+)
+
+
+def upgrade():
+    # Every eligibility-relevant write bumps this row; seeding it means the
+    # first concurrent writers only ever UPDATE (no racing INSERTs)
+    op.bulk_insert(cache_versions, [
+        {'name': 'eligibility', 'version': 1, 'updated_at': datetime.utcnow()}
+    ])
+
+
+def downgrade():
+    op.execute(cache_versions.delete().where(cache_versions.c.name == 'eligibility'))
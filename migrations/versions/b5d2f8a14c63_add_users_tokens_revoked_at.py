@@ -0,0 +1,42 @@
+"""add users.tokens_revoked_at and the token_revocations cache version
+
+Revision ID: b5d2f8a14c63
+Revises: a7c3e5d9f102
+Create Date: 2026-10-18 20:03:51.772094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2f8a14c63'
+down_revision = 'a7c3e5d9f102'
+branch_labels = None
+depends_on = None
+
+
+cache_versions = sa.table(
+    'cache_versions',
+    sa.column('name', sa.String),
+    sa.column('version', sa.Integer),
+    sa.column('updated_at', sa.DateTime)
+)
+
+
+def upgrade():
+    # Tokens issued before this moment are rejected (set when a user is deactivated)
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tokens_revoked_at', sa.DateTime(), nullable=True))
+
+    op.bulk_insert(cache_versions, [
+        {'name': 'token_revocations', 'version': 1, 'updated_at': datetime.utcnow()}
+    ])
+
+
+def downgrade():
+    op.execute(cache_versions.delete().where(cache_versions.c.name == 'token_revocations'))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('tokens_revoked_at')
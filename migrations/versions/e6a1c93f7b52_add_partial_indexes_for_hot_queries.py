@@ -0,0 +1,67 @@
+"""add composite and partial indexes for hot query shapes
+
+Revision ID: e6a1c93f7b52
+Revises: d82f4c6e1a37
+Create Date: 2026-10-18 16:05:12.337904
+
+"""
+from alembic import op
+from contextlib import nullcontext
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a1c93f7b52'
+down_revision = 'd82f4c6e1a37'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, partial index predicate) - predicates mirror the
+# WHERE clauses the application sends, so the planner can prove they apply.
+# benchmark_indexes.py reads this list to compare plans before/after.
+INDEXES = [
+    # Goals of a score card (goal list, weight validation, bulk authoring)
+    ('ix_goals_score_card_active', 'goals', ['score_card_id'], 'deleted_at IS NULL'),
+    # Score card list per period in id order (keyset pagination)
+    ('ix_score_cards_period_active', 'score_cards', ['review_period_id', 'id'], 'deleted_at IS NULL'),
+    # Active period dashboard: score card counts per period and status
+    ('ix_score_cards_period_status_active', 'score_cards', ['review_period_id', 'status'], 'deleted_at IS NULL'),
+    # Unread notifications of a user
+    ('ix_notifications_recipient_unread', 'notifications', ['recipient_id'], 'is_read = false'),
+    # Eligibility matching: active employees by department and position
+    ('ix_employees_eligible_dept_pos', 'employees', ['department_id', 'position_id'],
+     'is_active = true AND deleted_at IS NULL'),
+    # Login / registration lookups by email
+    ('ix_users_email_active', 'users', ['email'], 'deleted_at IS NULL'),
+    # Evaluations of a score card
+    ('ix_evaluations_score_card_id', 'evaluations', ['score_card_id'], None),
+]
+
+
+def sqlite_predicate(where):
+    """SQLite compares booleans as 1/0, the way SQLAlchemy renders them there"""
+    return where.replace('= true', '= 1').replace('= false', '= 0')
+
+
+def index_build_block():
+    """CONCURRENTLY cannot run inside a transaction; build without blocking writes on PostgreSQL"""
+    context = op.get_context()
+    return context.autocommit_block() if context.dialect.name == 'postgresql' else nullcontext()
+
+
+def upgrade():
+    with index_build_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                sqlite_where=sa.text(sqlite_predicate(where)) if where else None,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    with index_build_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
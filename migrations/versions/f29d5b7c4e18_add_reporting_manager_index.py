@@ -0,0 +1,40 @@
+"""add index on employees.reporting_manager_id for org hierarchy queries
+
+Revision ID: f29d5b7c4e18
+Revises: e6a1c93f7b52
+Create Date: 2026-10-18 17:42:08.514230
+
+"""
+from alembic import op
+from contextlib import nullcontext
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f29d5b7c4e18'
+down_revision = 'e6a1c93f7b52'
+branch_labels = None
+depends_on = None
+
+
+def index_build_block():
+    """CONCURRENTLY cannot run inside a transaction; build without blocking writes on PostgreSQL"""
+    context = op.get_context()
+    return context.autocommit_block() if context.dialect.name == 'postgresql' else nullcontext()
+
+
+def upgrade():
+    # Each recursive step of the org hierarchy CTE looks up reports by manager
+    # (idx_employees_reporting_manager_id was dropped in 57cacb67b56c)
+    with index_build_block():
+        op.create_index(
+            'ix_employees_reporting_manager_active', 'employees', ['reporting_manager_id'], unique=False,
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            sqlite_where=sa.text('deleted_at IS NULL'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with index_build_block():
+        op.drop_index('ix_employees_reporting_manager_active', table_name='employees', postgresql_concurrently=True)
@@ -0,0 +1,18 @@
+from extensions import db
+from datetime import datetime
+
+
+class CacheVersion(db.Model):
+    """Shared version counters used to invalidate per-process caches across workers"""
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(100), primary_key=True)  # e.g. 'roles'
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
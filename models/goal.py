@@ -34,7 +34,14 @@ class Goal(db.Model):
     creator = db.relationship('User', foreign_keys=[created_by])
     updater = db.relationship('User', foreign_keys=[updated_by])
 
-    def to_dict(self):
+    def to_dict(self, added_by_user=None):
+        """
+        Serialize the goal. Pass added_by_user (an author projection dict with id,
+        email, username) when it was loaded alongside the goal, so the lazy
+        relationship is not touched (one users query per goal otherwise).
+        """
+        if added_by_user is None and self.added_by_user:
+            added_by_user = author_projection(self.added_by_user)
         return {
             'id': self.id,
             'score_card_id': self.score_card_id,
@@ -43,11 +50,7 @@ class Goal(db.Model):
             'success_criteria': self.success_criteria,
             'weight': self.weight,
             'added_by_role': self.added_by_role,
-            'added_by_user': {
-                'id': self.added_by_user.id,
-                'email': self.added_by_user.email,
-                'username': self.added_by_user.username
-            } if self.added_by_user else None,
+            'added_by_user': added_by_user,
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
             'deadline_date': self.deadline_date.isoformat() if self.deadline_date else None,
@@ -55,4 +58,12 @@ class Goal(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
-        }
\ No newline at end of file
+        }
+
+def author_projection(user):
+    """Lightweight author fields exposed on goals (works on User rows or id/email/username tuples)"""
+    return {
+        'id': user.id,
+        'email': user.email,
+        'username': user.username
+    }
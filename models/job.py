@@ -0,0 +1,42 @@
+from extensions import db
+from models.base import AuditMixin
+
+
+class Job(AuditMixin, db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_type = db.Column(db.String(100), nullable=False)  # e.g. 'generate_score_cards'
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed', 'failed'
+    params = db.Column(db.JSON, nullable=False, default={})  # Handler keyword arguments
+    progress = db.Column(db.JSON, nullable=False, default={})  # Handler-defined counters
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Last progress update; used to detect crashed workers
+
+    __table_args__ = (
+        db.Index('ix_jobs_status', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'params': self.params,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_by': self.created_by,
+            'updated_by': self.updated_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
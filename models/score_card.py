@@ -18,6 +18,13 @@ class ScoreCard(db.Model):
     competencies_weightage = db.Column(db.Integer, default=25)
     values_weightage = db.Column(db.Integer, default=15)
     
+    # Denormalized sums of active (non-deleted) goal weights, maintained by
+    # score_card_service.adjust_goal_weight in the same transaction as goal writes
+    total_goal_weight = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    hr_goal_weight = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    manager_goal_weight = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    employee_goal_weight = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Legacy fields (now nullable for backward compatibility)
     title = db.Column(db.String(200), nullable=True)
     content = db.Column(db.Text, nullable=True)
@@ -65,6 +72,7 @@ class ScoreCard(db.Model):
             'version': self.version,
             'published_date': self.published_date.isoformat() if self.published_date else None,
             'approval_status': self.current_approval_status,
+            'total_goal_weight': self.total_goal_weight,
             'created_by': self.created_by,
             'updated_by': self.updated_by,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -0,0 +1,16 @@
+from extensions import db
+from datetime import datetime
+
+
+class UsedRefreshToken(db.Model):
+    """Refresh tokens already exchanged; presenting one again is a replay"""
+    __tablename__ = 'used_refresh_tokens'
+
+    token_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 hex digest of the token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)  # The token's exp; the row is useless after it
+    used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_used_refresh_tokens_user_id', 'user_id'),
+    )
@@ -14,6 +14,7 @@ class User(UserMixin, AuditMixin, db.Model):
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=True)
     last_login = db.Column(db.DateTime, nullable=True)
+    tokens_revoked_at = db.Column(db.DateTime, nullable=True)  # Tokens issued before this are rejected
 
     # Relationships
     role = db.relationship('Role', back_populates='users', foreign_keys=[role_id], lazy=True)
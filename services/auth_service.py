@@ -1,23 +1,115 @@
 from models.user import User
 from models.role import Role
+from models.used_refresh_token import UsedRefreshToken
 from extensions import db
 from constants.roles import RoleID, get_role_id_by_name
-import bcrypt
+from services.password_service import hash_password, check_password, PasswordPoolBusy
 from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+import hashlib
 import jwt
+import logging
 import os
+import uuid
 from dotenv import load_dotenv
-from cryptography.hazmat.primitives import serialization
+from services.jwt_key_service import private_keyring, public_keyring
+from services.token_cache_service import issued_before
 
 load_dotenv()
 
-# EdDSA keys required - no fallback
-JWT_PRIVATE_KEY = os.getenv('JWT_PRIVATE_KEY')
-JWT_PUBLIC_KEY = os.getenv('JWT_PUBLIC_KEY')
+logger = logging.getLogger(__name__)
 
-if not JWT_PRIVATE_KEY or not JWT_PUBLIC_KEY:
+# EdDSA keys required - no fallback
+if not private_keyring.is_configured() or not public_keyring.is_configured():
     raise ValueError("JWT_PRIVATE_KEY and JWT_PUBLIC_KEY must be set in .env file for EdDSA authentication")
 
+# Token lifetimes. With JWT_REFRESH_TOKENS enabled, login issues a short-lived access
+# token plus a refresh token that can be exchanged without re-checking the password.
+JWT_REFRESH_TOKENS = os.getenv('JWT_REFRESH_TOKENS', 'false').lower() in ('1', 'true', 'yes')
+JWT_TOKEN_HOURS = int(os.getenv('JWT_TOKEN_HOURS', '8'))
+JWT_ACCESS_TOKEN_MINUTES = int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', '15'))
+JWT_REFRESH_TOKEN_DAYS = int(os.getenv('JWT_REFRESH_TOKEN_DAYS', '7'))
+
+
+class TokenIssuer:
+    """
+    Issues EdDSA (Ed25519) JWTs using signing keys cached in the private keyring.
+    Tokens carry a 'kid' header so verifiers can pick the matching public key
+    while keys are being rotated. The signing key is JWT_SIGNING_KEY_ID if set,
+    otherwise the keyring's default key.
+    """
+
+    def __init__(self, keyring, refresh_enabled=False, token_ttl=None, access_ttl=None, refresh_ttl=None):
+        self.keyring = keyring
+        self.refresh_enabled = refresh_enabled
+        self.token_ttl = token_ttl or timedelta(hours=8)
+        self.access_ttl = access_ttl or timedelta(minutes=15)
+        self.refresh_ttl = refresh_ttl or timedelta(days=7)
+
+    @property
+    def access_token_ttl(self):
+        return self.access_ttl if self.refresh_enabled else self.token_ttl
+
+    def _sign(self, payload):
+        kid = os.getenv('JWT_SIGNING_KEY_ID') or self.keyring.default_kid
+        private_key = self.keyring.get(kid)
+        if private_key is None:
+            raise ValueError(f"No JWT signing key available for kid '{kid}'")
+        return jwt.encode(payload, private_key, algorithm='EdDSA', headers={'kid': kid})
+
+    def issue_access_token(self, user):
+        """Access token with user identity and role claims"""
+        # Get role_name for token (role relationship should already be loaded)
+        role_name = user.role.role_name if user.role else None
+        now = datetime.utcnow()
+        payload = {
+            'user_id': user.id,  # Use user_id as per knowledge transfer
+            'username': user.username,
+            'role_id': user.role_id,
+            'role': role_name,  # Include role_name for frontend compatibility
+            'typ': 'access',
+            'exp': now + self.access_token_ttl,
+            'iat': now
+        }
+        return self._sign(payload)
+
+    def issue_refresh_token(self, user):
+        """Single-use refresh token carrying only the user id; rejected by authenticate_token"""
+        now = datetime.utcnow()
+        payload = {
+            'user_id': user.id,
+            'typ': 'refresh',
+            'jti': uuid.uuid4().hex,  # Unique, so each token can be redeemed exactly once
+            'exp': now + self.refresh_ttl,
+            'iat': now
+        }
+        return self._sign(payload)
+
+    def issue_tokens(self, user):
+        """
+        Issue the login token set.
+
+        Returns:
+            Dict with 'token' and 'expires_in' (seconds), plus 'refresh_token'
+            when refresh tokens are enabled
+        """
+        tokens = {
+            'token': self.issue_access_token(user),
+            'expires_in': int(self.access_token_ttl.total_seconds())
+        }
+        if self.refresh_enabled:
+            tokens['refresh_token'] = self.issue_refresh_token(user)
+        return tokens
+
+
+token_issuer = TokenIssuer(
+    private_keyring,
+    refresh_enabled=JWT_REFRESH_TOKENS,
+    token_ttl=timedelta(hours=JWT_TOKEN_HOURS),
+    access_ttl=timedelta(minutes=JWT_ACCESS_TOKEN_MINUTES),
+    refresh_ttl=timedelta(days=JWT_REFRESH_TOKEN_DAYS)
+)
+
 def create_user(username, email, password, role_id=None, role_name=None):
     """Create a new user. Provide either role_id or role_name"""
     # Check if user already exists (where deleted_at IS NULL)
@@ -44,11 +136,8 @@ def create_user(username, email, password, role_id=None, role_name=None):
     elif not role_id:
         raise ValueError("Either role_id or role_name must be provided")
     
-    # Create new user with bcrypt password hashing
-    password_hash = bcrypt.hashpw(
-        password.encode('utf-8'),
-        bcrypt.gensalt(rounds=10)
-    ).decode('utf-8')
+    # Create new user with bcrypt password hashing (runs on the bounded password pool)
+    password_hash = hash_password(password, rounds=10)
     user = User(
         username=username,
         email=email,
@@ -61,7 +150,10 @@ def create_user(username, email, password, role_id=None, role_name=None):
     return user
 
 def authenticate_user(email, password):
-    """Authenticate user and return user object if valid"""
+    """
+    Authenticate user and return user object if valid.
+    Raises PasswordPoolBusy when too many password checks are already queued.
+    """
     try:
         user = User.query.filter(
             User.email == email,
@@ -70,62 +162,103 @@ def authenticate_user(email, password):
         ).first()
         
         if not user:
-            print(f"User not found: {email}")
+            logger.info("Login failed: user not found", extra={'email': email})
             return None
         
-        # Check password with bcrypt
+        # Check password with bcrypt (runs on the bounded password pool)
         try:
-            # Ensure password is bytes for bcrypt
-            password_bytes = password.encode('utf-8')
-            stored_hash = user.password.encode('utf-8') if isinstance(user.password, str) else user.password
-            
-            if bcrypt.checkpw(password_bytes, stored_hash):
+            if check_password(password, user.password):
                 # Update last_login
                 user.last_login = datetime.utcnow()
                 db.session.commit()
-                print(f"Password check successful for: {email}")
+                logger.debug("Password check successful for %s", email)
                 return user
             else:
-                print(f"Password check failed for: {email}")
+                logger.info("Login failed: wrong password", extra={'email': email})
+        except PasswordPoolBusy:
+            # Overloaded: let the caller answer 503 with Retry-After
+            raise
         except Exception as e:
             # Password check failed
-            print(f"Password check error for {email}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Password check error", extra={'email': email})
+    except PasswordPoolBusy:
+        raise
     except Exception as e:
-        print(f"Authentication error for {email}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Authentication error", extra={'email': email})
     
     return None
 
 def generate_token(user):
-    """Generate JWT token for user using EdDSA (Ed25519)"""
-    # Get role_name for token (role relationship should already be loaded)
-    role_name = user.role.role_name if user.role else None
+    """Generate JWT access token for user using EdDSA (Ed25519)"""
+    # Token expiration: 8 hours as per knowledge transfer (JWT_TOKEN_HOURS),
+    # or JWT_ACCESS_TOKEN_MINUTES when refresh tokens are enabled
+    return token_issuer.issue_access_token(user)
+
+def refresh_access_token(refresh_token):
+    """
+    Exchange a refresh token for a new access token and a new refresh token
+    (no password check). Each refresh token can be exchanged once: presenting
+    it again means it leaked, so every token of that user is revoked.
     
-    # Token expiration: 8 hours as per knowledge transfer
-    expiration = datetime.utcnow() + timedelta(hours=8)
+    Returns:
+        Tuple of (user, tokens dict); raises ValueError if the token or user is invalid
+    """
+    if not token_issuer.refresh_enabled:
+        raise ValueError("Refresh tokens are not enabled")
     
-    payload = {
-        'user_id': user.id,  # Use user_id as per knowledge transfer
-        'username': user.username,
-        'role_id': user.role_id,
-        'role': role_name,  # Include role_name for frontend compatibility
-        'exp': expiration,
-        'iat': datetime.utcnow()
-    }
+    try:
+        kid = jwt.get_unverified_header(refresh_token).get('kid')
+        public_key = public_keyring.get(kid)
+        if public_key is None:
+            raise ValueError("Invalid refresh token")
+        data = jwt.decode(refresh_token, public_key, algorithms=['EdDSA'])
+    except jwt.ExpiredSignatureError:
+        raise ValueError("Refresh token has expired")
+    except jwt.InvalidTokenError:
+        raise ValueError("Invalid refresh token")
     
-    # Use EdDSA (Ed25519) only
-    # Replace escaped newlines with actual newlines
-    private_key_str = JWT_PRIVATE_KEY.replace('\\n', '\n')
-    private_key = serialization.load_pem_private_key(
-        private_key_str.encode('utf-8'),
-        password=None
-    )
-    token = jwt.encode(payload, private_key, algorithm='EdDSA')
+    if data.get('typ') != 'refresh':
+        raise ValueError("Invalid refresh token")
     
-    return token
+    # Deactivated or deleted users can no longer refresh
+    from sqlalchemy.orm import joinedload
+    user = User.query.options(joinedload(User.role)).filter(
+        User.id == data.get('user_id'),
+        User.deleted_at.is_(None),
+        User.is_active == True
+    ).first()
+    if not user:
+        raise ValueError("User not found or inactive")
+    # Refresh tokens issued before a deactivation stay dead after reactivation
+    if issued_before(data, user.tokens_revoked_at):
+        raise ValueError("Refresh token has been revoked")
+    
+    # Redeem the token: the primary key makes a concurrent or later second exchange fail
+    now = datetime.utcnow()
+    UsedRefreshToken.query.filter(
+        UsedRefreshToken.user_id == user.id,
+        UsedRefreshToken.expires_at < now
+    ).delete(synchronize_session=False)
+    db.session.add(UsedRefreshToken(
+        token_hash=hashlib.sha256(refresh_token.encode('utf-8')).hexdigest(),
+        user_id=user.id,
+        expires_at=datetime.utcfromtimestamp(data['exp'])
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # Reuse: either the client or an attacker holds a copy, so sign the user out everywhere
+        logger.warning("Refresh token reused; revoking all tokens", extra={'user_id': user.id})
+        user.tokens_revoked_at = datetime.utcnow()
+        db.session.commit()
+        raise ValueError("Refresh token has already been used")
+    
+    return user, {
+        'token': token_issuer.issue_access_token(user),
+        'expires_in': int(token_issuer.access_token_ttl.total_seconds()),
+        'refresh_token': token_issuer.issue_refresh_token(user)
+    }
 
 def get_user_by_id(user_id):
     """Get user by ID (only active, non-deleted users)"""
@@ -0,0 +1,170 @@
+"""
+DB Pool Service - Environment-driven connection pool settings and pool metrics
+Engine options (pool size, overflow, checkout timeout, recycle, pre-ping and
+PostgreSQL statement / idle-in-transaction timeouts) come from DB_* env vars.
+
+Engines registered with instrument_engine() report checked-out connections,
+overflow in use, checkout wait times (histogram), checkout timeouts and
+connection churn (connects, closes, invalidations) through get_pool_stats().
+"""
+from sqlalchemy import event, exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from typing import Dict
+import os
+import threading
+import time
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Replace connections older than this (seconds)
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))  # 0 = no limit
+DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', '0'))  # 0 = no limit
+
+# Checkout wait histogram bucket upper bounds, in seconds
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolMetrics:
+    """Thread-safe counters for one engine's connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_bucket_counts = [0] * (len(POOL_WAIT_BUCKETS) + 1)  # Last bucket is +Inf
+
+    def record_wait(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_sum += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            for i, bound in enumerate(POOL_WAIT_BUCKETS):
+                if waited <= bound:
+                    self.wait_bucket_counts[i] += 1
+                    break
+            else:
+                self.wait_bucket_counts[-1] += 1
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'closes': self.closes,
+                'invalidations': self.invalidations,
+                'wait_seconds_sum': self.wait_seconds_sum,
+                'wait_seconds_max': self.wait_seconds_max,
+                'wait_buckets': dict(zip([str(b) for b in POOL_WAIT_BUCKETS] + ['+Inf'], self.wait_bucket_counts))
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout, including ones that wait for a free connection"""
+
+    metrics = None
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.monotonic() - start, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.monotonic() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def build_engine_options(database_uri, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                         pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE,
+                         pool_pre_ping=DB_POOL_PRE_PING, statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+                         idle_in_transaction_timeout_ms=DB_IDLE_IN_TRANSACTION_TIMEOUT_MS) -> dict:
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for a database URI.
+
+    In-memory SQLite keeps SQLAlchemy's default single-connection pool; every
+    other database gets an InstrumentedQueuePool sized from the arguments.
+    Statement and idle-in-transaction timeouts are set per connection on PostgreSQL.
+    """
+    url = make_url(database_uri)
+    options = {'pool_pre_ping': pool_pre_ping}
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle
+    )
+
+    if url.get_backend_name() == 'postgresql':
+        settings = []
+        if statement_timeout_ms:
+            settings.append(f'-c statement_timeout={statement_timeout_ms}')
+        if idle_in_transaction_timeout_ms:
+            settings.append(f'-c idle_in_transaction_session_timeout={idle_in_transaction_timeout_ms}')
+        if settings:
+            options['connect_args'] = {'options': ' '.join(settings)}
+    return options
+
+
+# name -> (engine, metrics) for every instrumented engine in this process
+_ENGINES: Dict[str, tuple] = {}
+
+
+def instrument_engine(name, engine) -> PoolMetrics:
+    """Attach pool metrics to an engine and register it for get_pool_stats()"""
+    metrics = PoolMetrics()
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = metrics
+
+    event.listen(engine, 'connect', lambda dbapi_connection, record: metrics.increment('connects'))
+    event.listen(engine, 'close', lambda dbapi_connection, record: metrics.increment('closes'))
+    event.listen(engine, 'invalidate', lambda dbapi_connection, record, exception: metrics.increment('invalidations'))
+
+    _ENGINES[name] = (engine, metrics)
+    return metrics
+
+
+def get_pool_stats() -> dict:
+    """Current pool state plus cumulative metrics for every instrumented engine"""
+    stats = {}
+    for name, (engine, metrics) in _ENGINES.items():
+        pool = engine.pool
+        entry = metrics.snapshot()
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                # overflow() counts down from -pool_size; only positive values are extra connections
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow
+            )
+        stats[name] = entry
+    return stats
@@ -0,0 +1,244 @@
+"""
+DB Session Service - Per-request transaction policy for the shared SQLAlchemy session
+Safe (GET/HEAD/OPTIONS) requests run in read-only transactions: on PostgreSQL
+every transaction they open starts with SET TRANSACTION READ ONLY, and on any
+database a flush with pending changes raises ReadOnlyRequestError. Read
+traffic therefore never takes write locks and can be served from a replica
+or a read-only pool.
+
+Disable with READ_ONLY_GET_REQUESTS=false.
+
+Read replicas (optional): with DATABASE_REPLICA_URLS set, read-only requests
+are routed to a replica through RoutingSession.get_bind. A request stays on
+the primary when
+- the replica's lag (checked every REPLICA_LAG_CHECK_SECONDS) exceeds
+  REPLICA_MAX_LAG_SECONDS, or the lag check fails,
+- the same user committed a write in this process within the last
+  REPLICA_READ_YOUR_WRITES_SECONDS (read-your-writes), or
+- the client sends `X-Consistency: strong`.
+Version-stamped per-process caches (role_service, eligibility_index) read
+their version and load their rows from the primary with
+bind_arguments={'bind': db.engine}, so a lagging replica can never be cached
+under a newer version.
+Writes are detected from ORM flushes and from INSERT/UPDATE/DELETE statements
+run through the session (raw text() SQL is not inspected).
+Responses carry `X-DB-Route: primary|replica` while replicas are configured;
+streamed responses get their route chosen before the headers are sent.
+"""
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from services.db_pool_service import build_engine_options, instrument_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import itertools
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+READ_ONLY_GET_REQUESTS = os.getenv('READ_ONLY_GET_REQUESTS', 'true').lower() in ('1', 'true', 'yes')
+
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '10'))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', '5'))
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', '5'))
+
+# Key used to flag sessions that flushed changes, so commits can record the writer
+_WROTE_KEY = 'db_session_wrote'
+
+
+class ReadOnlyRequestError(RuntimeError):
+    """Raised when a safe (GET/HEAD/OPTIONS) request tries to write through the session"""
+
+
+def is_read_only_request() -> bool:
+    """True while handling a safe request under the read-only policy"""
+    return READ_ONLY_GET_REQUESTS and has_request_context() and request.method in SAFE_METHODS
+
+
+def _has_pending_writes(session) -> bool:
+    return bool(session.new or session.deleted or any(session.is_modified(obj) for obj in session.dirty))
+
+
+@event.listens_for(Session, 'after_begin')
+def _start_read_only_transaction(session, transaction, connection):
+    if is_read_only_request() and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+
+
+@event.listens_for(Session, 'before_flush')
+def _reject_read_only_writes(session, flush_context, instances):
+    if is_read_only_request() and _has_pending_writes(session):
+        raise ReadOnlyRequestError(f"{request.method} {request.path} attempted to write to the database")
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _check_statement_write(orm_execute_state):
+    """
+    INSERT/UPDATE/DELETE statements run through session.execute() or
+    Query.update()/delete() bypass the flush: apply the same read-only check
+    and flag the session as having written.
+    """
+    if not orm_execute_state.statement.is_dml:
+        return
+    if is_read_only_request():
+        raise ReadOnlyRequestError(f"{request.method} {request.path} attempted to write to the database")
+    orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+# ---- Read replica routing ----
+
+class Replica:
+    """A replica engine plus its last measured replication lag"""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.lag_seconds: Optional[float] = None
+        self.healthy = False
+        self.checked_at: Optional[float] = None
+        self.routed = 0
+        self._lock = threading.Lock()
+
+    def _measure_lag(self) -> float:
+        if self.engine.dialect.name != 'postgresql':
+            return 0.0
+        with self.engine.connect() as connection:
+            # NULL when nothing has been replayed yet (or not a standby): treat as caught up
+            lag = connection.exec_driver_sql(
+                'SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())'
+            ).scalar()
+        return max(float(lag or 0.0), 0.0)
+
+    def check(self):
+        """Re-measure lag at most every REPLICA_LAG_CHECK_SECONDS (one thread measures, others reuse)"""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < REPLICA_LAG_CHECK_SECONDS:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.checked_at = now
+            was_healthy = self.healthy
+            try:
+                self.lag_seconds = self._measure_lag()
+                self.healthy = self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+            except Exception as e:
+                self.lag_seconds = None
+                self.healthy = False
+                logger.warning("Replica %s lag check failed: %s", self.name, e)
+            if was_healthy and not self.healthy and self.lag_seconds is not None:
+                logger.warning("Replica %s lag %.1fs exceeds %ss; reads fall back to the primary",
+                               self.name, self.lag_seconds, REPLICA_MAX_LAG_SECONDS)
+        finally:
+            self._lock.release()
+
+
+_REPLICAS: List[Replica] = []
+_REPLICA_CYCLE = None
+_RECENT_WRITERS = {}  # user_id -> monotonic time of their last committed write
+_RECENT_WRITERS_LOCK = threading.Lock()
+
+
+def init_read_replicas(app):
+    """Create replica engines from DATABASE_REPLICA_URLS (comma-separated) and route safe requests to them"""
+    global _REPLICA_CYCLE
+    urls = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    if not urls:
+        return
+    if not READ_ONLY_GET_REQUESTS:
+        logger.warning("DATABASE_REPLICA_URLS ignored because READ_ONLY_GET_REQUESTS is disabled")
+        return
+
+    _REPLICAS[:] = [Replica(f'replica-{i}', create_engine(url, **build_engine_options(url))) for i, url in enumerate(urls)]
+    for replica in _REPLICAS:
+        instrument_engine(replica.name, replica.engine)
+    _REPLICA_CYCLE = itertools.cycle(_REPLICAS)
+
+    @app.after_request
+    def _add_db_route_header(response):
+        # A streamed body runs its queries after the headers are sent: decide its route now
+        # so the header matches the bind get_bind() will use
+        if response.is_streamed and 'db_replica' not in g and is_read_only_request():
+            _choose_replica()
+        response.headers['X-DB-Route'] = 'replica' if g.get('db_replica') is not None else 'primary'
+        return response
+
+
+def _current_user_id():
+    user = getattr(request, 'user', None)
+    return user.get('user_id') if isinstance(user, dict) else None
+
+
+def _wrote_recently(user_id) -> bool:
+    if user_id is None:
+        return False
+    with _RECENT_WRITERS_LOCK:
+        wrote_at = _RECENT_WRITERS.get(user_id)
+    return wrote_at is not None and time.monotonic() - wrote_at < REPLICA_READ_YOUR_WRITES_SECONDS
+
+
+def _choose_replica() -> Optional[Replica]:
+    """Pick a healthy replica for this request (decided once per request), or None for the primary"""
+    if 'db_replica' in g:
+        return g.db_replica
+    replica = None
+    if request.headers.get('X-Consistency', '').lower() != 'strong' and not _wrote_recently(_current_user_id()):
+        for _ in range(len(_REPLICAS)):
+            candidate = next(_REPLICA_CYCLE)
+            candidate.check()
+            if candidate.healthy:
+                replica = candidate
+                replica.routed += 1
+                break
+    g.db_replica = replica
+    return replica
+
+
+def get_replica_stats() -> dict:
+    """Replica health and lag for monitoring"""
+    return {
+        replica.name: {
+            'healthy': replica.healthy,
+            'lag_seconds': replica.lag_seconds,
+            'routed_requests': replica.routed
+        } for replica in _REPLICAS
+    }
+
+
+class RoutingSession(FlaskSession):
+    """Session that sends read-only requests to a read replica when one is available"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _REPLICAS and is_read_only_request():
+            replica = _choose_replica()
+            if replica is not None:
+                return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(Session, 'after_flush')
+def _flag_write(session, flush_context):
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _record_writer(session):
+    if session.info.pop(_WROTE_KEY, False) and _REPLICAS and has_request_context():
+        user_id = _current_user_id()
+        if user_id is not None:
+            now = time.monotonic()
+            with _RECENT_WRITERS_LOCK:
+                _RECENT_WRITERS[user_id] = now
+                if len(_RECENT_WRITERS) > 10000:
+                    for stale in [uid for uid, t in _RECENT_WRITERS.items() if now - t >= REPLICA_READ_YOUR_WRITES_SECONDS]:
+                        del _RECENT_WRITERS[stale]
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_write_flag(session):
+    session.info.pop(_WROTE_KEY, None)
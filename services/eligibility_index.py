@@ -0,0 +1,411 @@
+"""
+Eligibility Index - In-memory bitmap index for eligibility profile matching
+Keeps integer bitsets of active employee IDs per department and per position,
+so profile membership is resolved with bitwise AND/OR instead of SQL joins.
+
+The index is built lazily on first use and maintained incrementally from ORM
+flush/commit events on Employee, Position and Department.
+
+Other workers (and CLI processes) keep their own index, so every transaction
+that changes eligibility data bumps the shared 'eligibility' row in
+cache_versions, as role_service does for roles. ORM changes bump it from the
+flush; INSERT/UPDATE/DELETE statements on the three tables run through the
+session (bulk updates) bump it from do_orm_execute and drop this worker's index.
+Each lookup reads the shared version first (one primary-key read through the
+request's session, pinned to the primary) and rebuilds when it differs from the
+version built plus this worker's own committed bumps, so generation and goal
+targeting never see another process's stale data.
+Writes made outside the app (raw SQL) are picked up by the full rebuild every
+ELIGIBILITY_INDEX_MAX_AGE seconds.
+"""
+from models.employee import Employee
+from models.department import Department
+from models.position import Position
+from models.cache_version import CacheVersion
+from extensions import db
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, object_session
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAX_AGE_SECONDS = int(os.getenv('ELIGIBILITY_INDEX_MAX_AGE', '300'))
+_SHARED_VERSION_NAME = 'eligibility'
+
+# Keys used on session.info: row changes pending until commit, whether this
+# transaction bumped the shared version, and whether it ran a bulk statement
+_PENDING_KEY = 'eligibility_index_changes'
+_BUMPED_KEY = 'eligibility_version_bumped'
+_BULK_KEY = 'eligibility_bulk_write'
+
+_INDEXED_TABLES = frozenset([Employee.__tablename__, Department.__tablename__, Position.__tablename__])
+# Columns whose change can move an employee in or out of a profile
+_EMPLOYEE_COLUMNS = ('department_id', 'position_id', 'is_active', 'employment_status', 'deleted_at')
+
+
+def _read_shared_version() -> int:
+    """
+    Read the committed shared eligibility version (0 until first bumped).
+
+    The read goes through the request's session, pinned to the primary, so a
+    lookup never checks out a second pooled connection. If this transaction
+    already bumped the version, its own uncommitted bump is discounted.
+    """
+    version = db.session.execute(
+        select(CacheVersion.version).where(CacheVersion.name == _SHARED_VERSION_NAME),
+        bind_arguments={'bind': db.engine}
+    ).scalar() or 0
+    if db.session.info.get(_BUMPED_KEY):
+        version -= 1
+    return version
+
+
+def _bump_shared_version(connection):
+    """Increment the shared eligibility version using the given connection/transaction"""
+    if connection.dialect.name == 'postgresql':
+        # One upsert, so concurrent first writers cannot collide on the primary key
+        # if the row was never seeded (migration a7c3e5d9f102 seeds it)
+        statement = pg_insert(CacheVersion.__table__).values(
+            name=_SHARED_VERSION_NAME, version=1, updated_at=datetime.utcnow()
+        )
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[CacheVersion.__table__.c.name],
+            set_={'version': CacheVersion.__table__.c.version + 1, 'updated_at': statement.excluded.updated_at}
+        ))
+        return
+    result = connection.execute(
+        update(CacheVersion.__table__)
+        .where(CacheVersion.name == _SHARED_VERSION_NAME)
+        .values(version=CacheVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(CacheVersion.__table__)
+            .values(name=_SHARED_VERSION_NAME, version=1, updated_at=datetime.utcnow())
+        )
+
+
+def _bits_to_ids(bits: int) -> List[int]:
+    """Expand a bitset into a sorted list of the set bit positions"""
+    ids = []
+    binary = bin(bits)[:1:-1]  # Least significant bit first
+    pos = binary.find('1')
+    while pos != -1:
+        ids.append(pos)
+        pos = binary.find('1', pos + 1)
+    return ids
+
+
+def _is_eligible(is_active, employment_status, deleted_at) -> bool:
+    """Same predicate the SQL path uses for candidate employees"""
+    return bool(is_active) and employment_status == 'Active' and deleted_at is None
+
+
+def _ilike_pattern(keyword: str):
+    """Compile keyword with the semantics of SQL `ILIKE '%keyword%'` (% and _ are wildcards)"""
+    parts = ('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in keyword)
+    return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class EligibilityIndex:
+    """Bitmap index of active employees by department and position"""
+
+    def __init__(self, max_age_seconds: int = INDEX_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._shared_version: Optional[int] = None  # cache_versions value read before the last build
+        self._own_bumps = 0  # Bumps committed by this process since the last build
+        self._employees: Dict[int, tuple] = {}  # employee_id -> (department_id, position_id)
+        self._department_names: Dict[int, str] = {}  # department_id -> name
+        self._position_titles: Dict[int, Optional[str]] = {}  # position_id -> title
+        self._by_department: Dict[Optional[int], int] = {}  # department_id -> bitset
+        self._by_position: Dict[Optional[int], int] = {}  # position_id -> bitset
+        self._keyword_positions: Dict[str, Set[int]] = {}  # keyword -> matching position_ids
+        self._all = 0
+        self.stats = {'builds': 0, 'checks': 0, 'check_errors': 0}
+
+    # ---- building ----
+
+    def build(self, shared_version: Optional[int] = None):
+        """Full rebuild from the database (three narrow column queries)"""
+        # Read the shared version first so a concurrent change is seen by the next check
+        if shared_version is None:
+            try:
+                shared_version = _read_shared_version()
+            except Exception as e:
+                logger.warning("Could not read eligibility index version: %s", e)
+                self.stats['check_errors'] += 1
+        # Always from the primary: a replica could lag behind the version just read
+        primary = {'bind': db.engine}
+        employees = db.session.execute(select(
+            Employee.id, Employee.department_id, Employee.position_id
+        ).where(
+            Employee.is_active == True,
+            Employee.employment_status == 'Active',
+            Employee.deleted_at.is_(None)
+        ), bind_arguments=primary).all()
+        departments = db.session.execute(select(Department.id, Department.name), bind_arguments=primary).all()
+        positions = db.session.execute(select(Position.id, Position.title), bind_arguments=primary).all()
+
+        with self._lock:
+            self._employees = {}
+            self._by_department = {}
+            self._by_position = {}
+            self._all = 0
+            self._department_names = {d.id: d.name for d in departments}
+            self._position_titles = {p.id: p.title for p in positions}
+            self._keyword_positions = {}
+            for e in employees:
+                self._add_employee(e.id, e.department_id, e.position_id)
+            self._built_at = time.monotonic()
+            self._shared_version = shared_version
+            self._own_bumps = 0
+            self.stats['builds'] += 1
+
+    def ensure_fresh(self):
+        """
+        Rebuild unless the index exists, is younger than max_age_seconds and no
+        other process changed eligibility data since it was built.
+        """
+        self.stats['checks'] += 1
+        try:
+            shared_version = _read_shared_version()
+        except Exception as e:
+            # Without the shared version, fall back to the max-age rebuild
+            logger.warning("Could not read eligibility index version: %s", e)
+            self.stats['check_errors'] += 1
+            shared_version = None
+        with self._lock:
+            fresh = (
+                self._built_at is not None
+                and time.monotonic() - self._built_at <= self.max_age_seconds
+                and (shared_version is None or self._shared_version is None
+                     or shared_version == self._shared_version + self._own_bumps)
+            )
+        if not fresh:
+            self.build(shared_version)
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt on next use"""
+        with self._lock:
+            self._built_at = None
+
+    def record_own_bump(self):
+        """Account for a committed shared-version bump whose changes were applied incrementally"""
+        with self._lock:
+            self._own_bumps += 1
+
+    # ---- incremental maintenance ----
+
+    def _add_employee(self, employee_id, department_id, position_id):
+        bit = 1 << employee_id
+        self._employees[employee_id] = (department_id, position_id)
+        self._by_department[department_id] = self._by_department.get(department_id, 0) | bit
+        self._by_position[position_id] = self._by_position.get(position_id, 0) | bit
+        self._all |= bit
+
+    def _remove_employee(self, employee_id):
+        previous = self._employees.pop(employee_id, None)
+        if previous is None:
+            return
+        mask = ~(1 << employee_id)
+        department_id, position_id = previous
+        self._by_department[department_id] &= mask
+        self._by_position[position_id] &= mask
+        self._all &= mask
+
+    def apply_employee(self, employee_id, department_id, position_id, eligible):
+        """Apply a committed Employee insert/update/delete"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove_employee(employee_id)
+            if eligible:
+                self._add_employee(employee_id, department_id, position_id)
+
+    def apply_department(self, department_id, name):
+        """Apply a committed Department change (name=None means deleted)"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if name is None:
+                self._department_names.pop(department_id, None)
+            else:
+                self._department_names[department_id] = name
+
+    def apply_position(self, position_id, title, deleted=False):
+        """Apply a committed Position change"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if deleted:
+                self._position_titles.pop(position_id, None)
+            else:
+                self._position_titles[position_id] = title
+            # Keyword resolutions depend on titles; recompute lazily
+            self._keyword_positions = {}
+
+    # ---- lookups ----
+
+    def _positions_for_keyword(self, keyword: str) -> Set[int]:
+        """Position IDs whose title matches ILIKE '%keyword%' (NULL titles never match)"""
+        cached = self._keyword_positions.get(keyword)
+        if cached is None:
+            pattern = _ilike_pattern(keyword)
+            cached = {pid for pid, title in self._position_titles.items()
+                      if title is not None and pattern.search(title)}
+            self._keyword_positions[keyword] = cached
+        return cached
+
+    def profile_bitset(self, department_filter, position_criteria) -> int:
+        """Bitset of employees matching a profile's department filter and position criteria (call ensure_fresh first)"""
+        with self._lock:
+            bits = self._all
+
+            if department_filter and department_filter != 'All':
+                department_bits = 0
+                for department_id, name in self._department_names.items():
+                    if name == department_filter:
+                        department_bits |= self._by_department.get(department_id, 0)
+                bits &= department_bits
+
+            if position_criteria and position_criteria != 'All':
+                position_ids = set()
+                for keyword in position_criteria.split('|'):
+                    position_ids |= self._positions_for_keyword(keyword.strip())
+                position_bits = 0
+                for position_id in position_ids:
+                    position_bits |= self._by_position.get(position_id, 0)
+                bits &= position_bits
+
+            return bits
+
+    def match_profile(self, profile) -> List[int]:
+        """Employee IDs matching an EligibilityProfile"""
+        self.ensure_fresh()
+        return _bits_to_ids(self.profile_bitset(profile.department_filter, profile.position_criteria))
+
+    def match_any(self, profiles: Iterable) -> List[int]:
+        """Employee IDs matching at least one of the given profiles (bitwise OR)"""
+        self.ensure_fresh()
+        bits = 0
+        for profile in profiles:
+            bits |= self.profile_bitset(profile.department_filter, profile.position_criteria)
+        return _bits_to_ids(bits)
+
+
+# Process-wide index instance
+eligibility_index = EligibilityIndex()
+
+
+# ---- ORM event wiring ----
+# Row changes are captured at flush time (when the values are known) and only
+# applied to the index once the transaction commits, so rollbacks never leak in.
+# The shared version is bumped (once per transaction) on the flush connection,
+# so it commits or rolls back together with the change itself.
+
+def _bump_once(session, connection):
+    if not session.info.get(_BUMPED_KEY):
+        _bump_shared_version(connection)
+        session.info[_BUMPED_KEY] = True
+
+
+def _queue_change(target, connection, change):
+    session = object_session(target)
+    if session is not None:
+        _bump_once(session, connection)
+        session.info.setdefault(_PENDING_KEY, []).append(change)
+
+
+def _changed(target, columns) -> bool:
+    state = inspect(target)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+def _employee_changed(mapper, connection, target):
+    eligible = _is_eligible(target.is_active, target.employment_status, target.deleted_at)
+    if inspect(target).pending and not eligible:
+        return  # A new employee outside every profile does not touch the index
+    if not inspect(target).pending and not _changed(target, _EMPLOYEE_COLUMNS):
+        return
+    _queue_change(target, connection, ('employee', target.id, target.department_id, target.position_id, eligible))
+
+
+def _employee_deleted(mapper, connection, target):
+    _queue_change(target, connection, ('employee', target.id, None, None, False))
+
+
+def _department_changed(mapper, connection, target):
+    if inspect(target).pending or _changed(target, ('name',)):
+        _queue_change(target, connection, ('department', target.id, target.name))
+
+
+def _department_deleted(mapper, connection, target):
+    _queue_change(target, connection, ('department', target.id, None))
+
+
+def _position_changed(mapper, connection, target):
+    if inspect(target).pending or _changed(target, ('title',)):
+        _queue_change(target, connection, ('position', target.id, target.title, False))
+
+
+def _position_deleted(mapper, connection, target):
+    _queue_change(target, connection, ('position', target.id, None, True))
+
+
+for _model, _changed_listener, _deleted_listener in (
+    (Employee, _employee_changed, _employee_deleted),
+    (Department, _department_changed, _department_deleted),
+    (Position, _position_changed, _position_deleted),
+):
+    event.listen(_model, 'after_insert', _changed_listener)
+    event.listen(_model, 'after_update', _changed_listener)
+    event.listen(_model, 'after_delete', _deleted_listener)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_write(orm_execute_state):
+    """INSERT/UPDATE/DELETE statements skip the mapper events: bump and rebuild instead"""
+    statement = orm_execute_state.statement
+    if not statement.is_dml or getattr(statement.table, 'name', None) not in _INDEXED_TABLES:
+        return
+    session = orm_execute_state.session
+    _bump_once(session, session.connection())
+    session.info[_BULK_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    bumped = session.info.pop(_BUMPED_KEY, False)
+    if session.info.pop(_BULK_KEY, False):
+        # Rows changed by a bulk statement are unknown; the rebuild re-reads the version
+        eligibility_index.invalidate()
+        return
+    for change in changes or ():
+        kind = change[0]
+        if kind == 'employee':
+            eligibility_index.apply_employee(*change[1:])
+        elif kind == 'department':
+            eligibility_index.apply_department(*change[1:])
+        elif kind == 'position':
+            eligibility_index.apply_position(*change[1:])
+    if bumped:
+        eligibility_index.record_own_bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_BULK_KEY, None)
+    if session.info.pop(_BUMPED_KEY, False):
+        # A rebuild inside this transaction would have read its uncommitted rows
+        eligibility_index.invalidate()
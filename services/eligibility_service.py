@@ -2,12 +2,49 @@ from models.employee import Employee
 from models.department import Department
 from models.position import Position
 from models.eligibility_profile import EligibilityProfile
-from sqlalchemy import or_
+from extensions import db
+from services.eligibility_index import eligibility_index
+from sqlalchemy import or_, and_, case, func
+
+
+def _active_employee_filters():
+    """Base predicates for employees that can be included in a profile"""
+    return [
+        Employee.is_active == True,
+        Employee.employment_status == 'Active',
+        Employee.deleted_at.is_(None)
+    ]
+
+
+def _profile_conditions(profile):
+    """
+    Compiles a profile's department filter and position criteria into SQL conditions.
+    Conditions reference Department and Position, so the query must join both.
+    
+    Args:
+        profile: EligibilityProfile instance
+        
+    Returns:
+        List of SQLAlchemy boolean expressions (empty list means "everyone")
+    """
+    conditions = []
+    
+    # Filter by department
+    if profile.department_filter and profile.department_filter != 'All':
+        conditions.append(Department.name == profile.department_filter)
+    
+    # Filter by position (pipe-separated keywords, any match)
+    if profile.position_criteria and profile.position_criteria != 'All':
+        keywords = profile.position_criteria.split('|')
+        conditions.append(or_(*[Position.title.ilike(f'%{k.strip()}%') for k in keywords]))
+    
+    return conditions
 
 
 def get_matching_employees(profile_id):
     """
     Returns list of employee IDs matching the profile criteria.
+    Resolved against the in-memory eligibility index (see services/eligibility_index.py).
     
     Args:
         profile_id: ID of the eligibility profile
@@ -19,33 +56,70 @@ def get_matching_employees(profile_id):
     if not profile:
         return []
     
-    # Start with all active employees
-    query = Employee.query.filter_by(
-        is_active=True,
-        employment_status='Active',
-        deleted_at=None
-    )
+    return eligibility_index.match_profile(profile)
+
+
+def get_matching_employees_for_profiles(profile_ids):
+    """
+    Returns the union of employee IDs matching any of the given profiles.
+    Profiles are loaded in one query and combined with a bitwise OR on the index.
     
-    # Filter by department
-    if profile.department_filter and profile.department_filter != 'All':
-        query = query.join(Employee.department).filter(
-            Department.name == profile.department_filter
-        )
+    Args:
+        profile_ids: List of eligibility profile IDs
+        
+    Returns:
+        List of unique employee IDs (integers)
+    """
+    if not profile_ids:
+        return []
     
-    # Filter by position
-    if profile.position_criteria and profile.position_criteria != 'All':
-        keywords = profile.position_criteria.split('|')
-        conditions = [Position.title.ilike(f'%{k.strip()}%') for k in keywords]
-        query = query.join(Employee.position).filter(or_(*conditions))
+    profiles = EligibilityProfile.query.filter(EligibilityProfile.id.in_(profile_ids)).all()
+    return eligibility_index.match_any(profiles)
+
+
+def get_profile_match_counts(profiles, exclude_employee_id=None):
+    """
+    Counts matching employees for many profiles in a single query.
+    
+    Every profile is compiled into a conditional COUNT over one scan of
+    employees (outer-joined to departments and positions), so the cost stays
+    one round trip regardless of how many profiles are evaluated.
     
-    employees = query.all()
-    return [e.id for e in employees]
+    Args:
+        profiles: List of EligibilityProfile instances
+        exclude_employee_id: Optional employee ID to leave out of every count
+        
+    Returns:
+        Dict mapping profile_id -> matching employee count
+    """
+    if not profiles:
+        return {}
+    
+    columns = []
+    for profile in profiles:
+        conditions = _profile_conditions(profile)
+        match = and_(*conditions) if conditions else True
+        columns.append(func.count(case((match, Employee.id))).label(f'p_{profile.id}'))
+    
+    query = db.session.query(*columns).select_from(Employee) \
+        .outerjoin(Department, Employee.department_id == Department.id) \
+        .outerjoin(Position, Employee.position_id == Position.id) \
+        .filter(*_active_employee_filters())
+    if exclude_employee_id:
+        query = query.filter(Employee.id != exclude_employee_id)
+    
+    row = query.one()
+    return {profile.id: row[i] for i, profile in enumerate(profiles)}
 
 
-def get_all_profiles_with_counts():
+def get_all_profiles_with_counts(exclude_employee_id=None):
     """
     Returns all active profiles with employee counts.
     
+    Args:
+        exclude_employee_id: Optional employee ID to leave out of the counts
+            (e.g. the logged-in HR Admin)
+    
     Returns:
         List of dictionaries containing profile details and matching employee counts
     """
@@ -54,17 +128,17 @@ def get_all_profiles_with_counts():
         deleted_at=None
     ).all()
     
+    counts = get_profile_match_counts(profiles, exclude_employee_id=exclude_employee_id)
+    
     result = []
     for p in profiles:
-        employee_ids = get_matching_employees(p.id)
         result.append({
             'id': p.id,
             'profile_name': p.profile_name,
             'description': p.description,
             'department': p.department_filter,
             'position_criteria': p.position_criteria,
-            'matching_employees': len(employee_ids)
+            'matching_employees': counts.get(p.id, 0)
         })
     
     return result
-
@@ -1,3 +1,12 @@
+from models.goal import Goal, author_projection
+from models.user import User
+from models.score_card import ScoreCard
+from extensions import db
+from services.score_card_service import DEFAULT_GOALS_WEIGHTAGE, GOAL_ROLE_WEIGHT_COLUMNS
+from services.metrics_service import goals_added
+from sqlalchemy import insert, update
+from datetime import datetime
+
 # Placeholder for future implementation
 # For today, we only need Auth and Review Period
 
@@ -7,3 +16,201 @@ def create_goal(user_id, title, description, start_date, end_date):
 def get_user_goals(user_id):
     return []
 
+
+# ---- Score card goals ----
+
+# Score cards reserved + filled per transaction in bulk goal authoring
+BULK_GOAL_CHUNK_SIZE = 500
+
+
+def get_score_card_goals_data(score_card_id):
+    """
+    Serialized active goals for a score card, with authors, in a single query.
+    
+    Authors are read as an (id, email, username) projection joined onto the goal
+    rows, so no User objects are hydrated and no per-goal lazy loads happen.
+    """
+    rows = db.session.query(
+        Goal, User.id, User.email, User.username
+    ).outerjoin(
+        User, Goal.added_by_user_id == User.id
+    ).filter(
+        Goal.score_card_id == score_card_id,
+        Goal.deleted_at.is_(None)
+    ).order_by(Goal.id).all()
+    
+    return [
+        row.Goal.to_dict(added_by_user=author_projection(row) if row.id is not None else None)
+        for row in rows
+    ]
+
+
+def _parse_goal_date(value, field):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Invalid {field} format. Use YYYY-MM-DD")
+
+
+def _validate_goal_templates(goals):
+    """Validate and normalize goal templates; raises ValueError on the first bad one"""
+    if not goals:
+        raise ValueError("At least one goal is required")
+    templates = []
+    for i, goal in enumerate(goals):
+        if not goal.get('goal_name'):
+            raise ValueError(f"goals[{i}]: goal_name is required")
+        try:
+            weight = int(goal.get('weight') or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"goals[{i}]: weight must be an integer")
+        if weight <= 0:
+            raise ValueError(f"goals[{i}]: weight is required")
+        templates.append({
+            'goal_name': goal['goal_name'],
+            'description': goal.get('description'),
+            'success_criteria': goal.get('success_criteria'),
+            'weight': weight,
+            'start_date': _parse_goal_date(goal.get('start_date'), 'start_date'),
+            'end_date': _parse_goal_date(goal.get('end_date'), 'end_date'),
+            'deadline_date': _parse_goal_date(goal.get('deadline_date'), 'deadline_date'),
+            'status': goal.get('status', 'active')
+        })
+    return templates
+
+
+def _parse_id_list(values, name):
+    """Client-supplied list of positive integer IDs; raises ValueError on anything else"""
+    if not isinstance(values, list):
+        raise ValueError(f"{name} must be a list of IDs")
+    ids = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit() or int(value) < 1:
+            raise ValueError(f"{name} must contain only positive integer IDs, got {value!r}")
+        ids.append(int(value))
+    return ids
+
+
+def resolve_goal_targets(score_card_ids=None, review_period_id=None, profile_ids=None):
+    """
+    Resolve a bulk goal target to non-deleted score card IDs.
+    
+    Targets are either explicit score_card_ids, every card in review_period_id,
+    or (with profile_ids) the cards in review_period_id whose employee matches
+    any of the eligibility profiles.
+    
+    Returns:
+        Sorted list of score card IDs (ValueError when no target is given or an
+        ID list holds anything but positive integer IDs)
+    """
+    if score_card_ids:
+        return sorted(set(_parse_id_list(score_card_ids, 'score_card_ids')))
+    if not review_period_id:
+        raise ValueError("Provide score_card_ids, or review_period_id (optionally with profile_ids)")
+    
+    query = db.session.query(ScoreCard.id).filter(
+        ScoreCard.review_period_id == review_period_id,
+        ScoreCard.deleted_at.is_(None)
+    )
+    if profile_ids:
+        from services.eligibility_service import get_matching_employees_for_profiles
+        employee_ids = get_matching_employees_for_profiles(_parse_id_list(profile_ids, 'profile_ids'))
+        if not employee_ids:
+            return []
+        query = query.filter(ScoreCard.employee_id.in_(employee_ids))
+    return [row.id for row in query.order_by(ScoreCard.id).all()]
+
+
+def bulk_add_goals(score_card_ids, goals, added_by_role, user_id, chunk_size=BULK_GOAL_CHUNK_SIZE):
+    """
+    Add the same set of goals to many score cards.
+    
+    Per chunk of cards, the combined weight of the goal set is reserved with one
+    conditional UPDATE ... RETURNING (only cards whose running total stays within
+    goals_weightage are returned), then every goal row for those cards is written
+    with one batched INSERT, and the chunk is committed. Cards that are missing or
+    lack weight budget are reported and skipped; they never abort the batch.
+    
+    Args:
+        score_card_ids: Target score card IDs
+        goals: List of goal dicts (goal_name, weight, optional description,
+            success_criteria, start_date, end_date, deadline_date, status)
+        added_by_role: 'HR', 'Manager' or 'Employee'
+        user_id: ID of the user adding the goals
+        chunk_size: Number of score cards per transaction
+        
+    Returns:
+        Dict with applied score card IDs, per-card failures and goals_created
+    """
+    templates = _validate_goal_templates(goals)
+    set_weight = sum(t['weight'] for t in templates)
+    
+    values = {ScoreCard.total_goal_weight: ScoreCard.total_goal_weight + set_weight}
+    role_column = GOAL_ROLE_WEIGHT_COLUMNS.get(added_by_role)
+    if role_column is not None:
+        values[role_column] = role_column + set_weight
+    
+    score_card_ids = list(score_card_ids)
+    applied = []
+    failed = []
+    goals_created = 0
+    
+    for start in range(0, len(score_card_ids), chunk_size):
+        chunk = score_card_ids[start:start + chunk_size]
+        
+        reserve = update(ScoreCard).where(
+            ScoreCard.id.in_(chunk),
+            ScoreCard.deleted_at.is_(None),
+            ScoreCard.total_goal_weight + set_weight <= db.func.coalesce(ScoreCard.goals_weightage, DEFAULT_GOALS_WEIGHTAGE)
+        ).values(values).returning(ScoreCard.id).execution_options(synchronize_session=False)
+        reserved = sorted(row.id for row in db.session.execute(reserve))
+        
+        now = datetime.utcnow()
+        rows = [dict(
+            template,
+            score_card_id=score_card_id,
+            added_by_role=added_by_role,
+            added_by_user_id=user_id,
+            created_by=user_id,
+            updated_by=user_id,
+            created_at=now,
+            updated_at=now
+        ) for score_card_id in reserved for template in templates]
+        if rows:
+            db.session.execute(insert(Goal), rows)
+        db.session.commit()
+        goals_added.inc(len(rows), source='bulk')
+        
+        applied.extend(reserved)
+        goals_created += len(rows)
+        
+        rejected = set(chunk) - set(reserved)
+        if rejected:
+            failed.extend(_describe_rejections(rejected, set_weight))
+    
+    return {
+        'applied': applied,
+        'failed': failed,
+        'goals_created': goals_created
+    }
+
+
+def _describe_rejections(score_card_ids, set_weight):
+    """Explain why cards were skipped, with one query for the whole set"""
+    cards = {row.id: row for row in db.session.query(
+        ScoreCard.id, ScoreCard.total_goal_weight, ScoreCard.goals_weightage, ScoreCard.deleted_at
+    ).filter(ScoreCard.id.in_(score_card_ids)).all()}
+    
+    failures = []
+    for score_card_id in sorted(score_card_ids):
+        card = cards.get(score_card_id)
+        if card is None or card.deleted_at is not None:
+            error = 'Score card not found'
+        else:
+            goals_weightage = card.goals_weightage if card.goals_weightage is not None else DEFAULT_GOALS_WEIGHTAGE
+            error = (f'Total goal weight would exceed {goals_weightage}%. '
+                     f'Current total: {card.total_goal_weight}%, trying to add: {set_weight}%')
+        failures.append({'score_card_id': score_card_id, 'error': error})
+    return failures
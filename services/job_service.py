@@ -0,0 +1,288 @@
+"""
+Job Service - Background job runner for long-running operations
+Jobs are persisted in the `jobs` table and executed on a thread pool inside
+each app process, so requests can enqueue work and return immediately.
+
+Handlers register with @register_job('<job_type>') and receive a JobContext
+plus the job's params as keyword arguments. Handlers must be idempotent:
+a job whose worker crashed (no heartbeat for JOB_STALE_SECONDS) is re-queued
+and run again from the start.
+
+The worker pool starts in a process when it handles its first request (or
+enqueues a job), so CLI commands and a preloading gunicorn master never run
+jobs or recovery; each serving worker gets its own pool after the fork. Every
+JOB_RECLAIM_SECONDS a reaper thread renews the heartbeat of the jobs running
+in this process, re-queues stale jobs and picks up queued ones. Set
+JOB_RUNNER_ENABLED=false to keep a process from running jobs (its jobs stay
+queued for other processes or `flask run-jobs`).
+"""
+from models.job import Job
+from extensions import db
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RUNNER_ENABLED = os.getenv('JOB_RUNNER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Must stay well below JOB_STALE_SECONDS: it is also the heartbeat interval of running jobs
+JOB_RECLAIM_SECONDS = int(os.getenv('JOB_RECLAIM_SECONDS', '60'))
+
+# job_type -> handler(job_context, **params)
+_JOB_HANDLERS: Dict[str, Callable] = {}
+
+# Set by init_job_runner(); jobs run inline when _WORKERS is 0
+_APP = None
+_WORKERS = 0
+# Started by _ensure_job_runner() in the process that owns _RUNNER_PID
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_RUNNER_PID = None
+_RUNNER_LOCK = threading.Lock()
+# Job ids handed to this process's pool (until they finish) and currently running here
+_SUBMITTED: Set[int] = set()
+_RUNNING: Set[int] = set()
+_STATE_LOCK = threading.Lock()
+
+
+class JobContext:
+    """Handle passed to job handlers for reporting progress"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def update_progress(self, **counters):
+        """Persist progress counters and refresh the heartbeat (commits)"""
+        now = datetime.utcnow()
+        Job.query.filter(Job.id == self.job_id).update({
+            'progress': counters,
+            'heartbeat_at': now,
+            'updated_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+
+
+def register_job(job_type):
+    """Decorator to register a function as the handler for a job type"""
+    def decorator(f):
+        _JOB_HANDLERS[job_type] = f
+        return f
+    return decorator
+
+
+def init_job_runner(app):
+    """Configure the runner; the worker pool starts with the first request this process serves"""
+    global _APP, _WORKERS
+    _APP = app
+    _WORKERS = app.config.get('JOB_WORKERS', 0)
+
+    @app.before_request
+    def _start_job_runner():
+        _ensure_job_runner()
+
+
+def _ensure_job_runner() -> Optional[ThreadPoolExecutor]:
+    """Start this process's worker pool and reaper once; None when jobs do not run here"""
+    global _EXECUTOR, _RUNNER_PID
+    if not JOB_RUNNER_ENABLED or _WORKERS <= 0:
+        return None
+    pid = os.getpid()
+    if _RUNNER_PID == pid:
+        return _EXECUTOR
+    with _RUNNER_LOCK:
+        if _RUNNER_PID != pid:
+            # A pool inherited over fork() has no threads in this process: start fresh
+            _EXECUTOR = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix='job-worker')
+            with _STATE_LOCK:
+                _SUBMITTED.clear()
+                _RUNNING.clear()
+            _RUNNER_PID = pid
+            threading.Thread(target=_reaper_loop, name='job-reaper', daemon=True).start()
+    return _EXECUTOR
+
+
+def _reaper_loop():
+    while True:
+        reclaim_jobs()
+        time.sleep(JOB_RECLAIM_SECONDS)
+
+
+def reclaim_jobs():
+    """Renew this process's job heartbeats, then recover stale and queued jobs (never raises)"""
+    with _APP.app_context():
+        try:
+            _renew_heartbeats()
+            recover_jobs()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("Could not reclaim background jobs: %s", e)
+
+
+def enqueue_job(job_type, params=None, created_by=None):
+    """
+    Persist a new job and hand it to the worker pool.
+
+    Args:
+        job_type: Registered job type name
+        params: JSON-serializable dict passed to the handler as keyword arguments
+        created_by: ID of the user enqueuing the job
+
+    Returns:
+        Job object (status 'queued', or final status when running inline)
+    """
+    if job_type not in _JOB_HANDLERS:
+        raise ValueError(f"Unknown job type '{job_type}'")
+
+    job = Job(
+        job_type=job_type,
+        status='queued',
+        params=params or {},
+        progress={},
+        created_by=created_by
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _submit(job.id)
+    return job
+
+
+def get_job(job_id):
+    """Get job by ID (excluding soft-deleted)"""
+    return Job.query.filter(Job.id == job_id, Job.deleted_at.is_(None)).first()
+
+
+def _renew_heartbeats():
+    """Keep jobs running in this process from looking stale while their handler is busy"""
+    with _STATE_LOCK:
+        running = list(_RUNNING)
+    if not running:
+        return
+    now = datetime.utcnow()
+    Job.query.filter(Job.id.in_(running), Job.status == 'running').update(
+        {'heartbeat_at': now}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def recover_jobs():
+    """
+    Re-queue jobs whose worker stopped heart-beating and, when this process runs
+    a worker pool, submit queued jobs not already handed to it.
+    Jobs that already used JOB_MAX_ATTEMPTS are marked failed instead.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=JOB_STALE_SECONDS)
+
+    # Conditional UPDATEs: every serving process reclaims, and a job another
+    # process has just re-queued and claimed must not be touched again
+    def stale_jobs():
+        return Job.query.filter(
+            Job.status == 'running',
+            Job.heartbeat_at < stale_before,
+            Job.deleted_at.is_(None)
+        )
+
+    stale_jobs().filter(Job.attempts >= JOB_MAX_ATTEMPTS).update({
+        'status': 'failed',
+        'error': f'Worker stopped responding after {JOB_MAX_ATTEMPTS} attempts',
+        'finished_at': now,
+        'updated_at': now
+    }, synchronize_session=False)
+    stale_jobs().update({'status': 'queued', 'updated_at': now}, synchronize_session=False)
+    db.session.commit()
+
+    # Without a pool here, queued jobs wait for a serving process or `flask run-jobs`
+    if _RUNNER_PID != os.getpid():
+        return
+
+    queued_ids = [row.id for row in db.session.query(Job.id).filter(
+        Job.status == 'queued',
+        Job.deleted_at.is_(None)
+    ).order_by(Job.id).all()]
+    for job_id in queued_ids:
+        _submit(job_id)
+
+
+def run_pending_jobs():
+    """Recover stale jobs and run every queued job in the current thread (CLI / inline mode)"""
+    recover_jobs()
+    queued_ids = [row.id for row in db.session.query(Job.id).filter(
+        Job.status == 'queued',
+        Job.deleted_at.is_(None)
+    ).order_by(Job.id).all()]
+    for job_id in queued_ids:
+        _run_job(job_id)
+    return len(queued_ids)
+
+
+def _submit(job_id):
+    if _WORKERS <= 0:
+        _run_job(job_id)
+        return
+    executor = _ensure_job_runner()
+    if executor is None:
+        return
+    with _STATE_LOCK:
+        if job_id in _SUBMITTED:
+            return
+        _SUBMITTED.add(job_id)
+    executor.submit(_run_job_in_app_context, job_id)
+
+
+def _run_job_in_app_context(job_id):
+    try:
+        with _APP.app_context():
+            _run_job(job_id)
+    finally:
+        with _STATE_LOCK:
+            _SUBMITTED.discard(job_id)
+
+
+def _run_job(job_id):
+    """Claim a queued job and run its handler, recording the outcome"""
+    now = datetime.utcnow()
+    # Atomic claim: only one worker (in any process) can move queued -> running
+    claimed = Job.query.filter(Job.id == job_id, Job.status == 'queued').update({
+        'status': 'running',
+        'attempts': Job.attempts + 1,
+        'started_at': now,
+        'heartbeat_at': now,
+        'updated_at': now
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return
+
+    with _STATE_LOCK:
+        _RUNNING.add(job_id)
+    try:
+        _run_claimed_job(job_id)
+    finally:
+        with _STATE_LOCK:
+            _RUNNING.discard(job_id)
+
+
+def _run_claimed_job(job_id):
+    job = Job.query.get(job_id)
+    handler = _JOB_HANDLERS.get(job.job_type)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job type '{job.job_type}'")
+        result = handler(JobContext(job_id), **(job.params or {}))
+        job = Job.query.get(job_id)
+        job.status = 'completed'
+        job.result = result
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Job %s (%s) failed", job_id, job.job_type)
+        job = Job.query.get(job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
@@ -0,0 +1,136 @@
+"""
+JWT Key Service - Process-wide keyrings for EdDSA (Ed25519) JWT keys
+PEM keys are parsed once and cached. Several keys can be active at the same
+time, selected by the `kid` JWT header, which allows key rotation:
+
+- JWT_PUBLIC_KEY / JWT_PRIVATE_KEY: single key from the environment, registered
+  under JWT_KEY_ID (default 'default'); also used for tokens without a `kid`
+- JWT_PUBLIC_KEYS_FILE / JWT_PRIVATE_KEYS_FILE: optional JSON file mapping
+  kid -> PEM string, for adding keys during a rotation
+
+Keyrings re-check their sources at most every JWT_KEYRING_CHECK_SECONDS and
+re-parse only when the env value or the key file's mtime has changed.
+"""
+from cryptography.hazmat.primitives import serialization
+from typing import Callable, Dict, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY_ID = 'default'
+KEYRING_CHECK_SECONDS = float(os.getenv('JWT_KEYRING_CHECK_SECONDS', '5'))
+
+
+def _normalize_pem(pem: str) -> bytes:
+    """Replace escaped newlines (as stored in .env files) with actual newlines"""
+    return pem.replace('\\n', '\n').encode('utf-8')
+
+
+def load_public_key(pem: str):
+    return serialization.load_pem_public_key(_normalize_pem(pem))
+
+
+def load_private_key(pem: str):
+    return serialization.load_pem_private_key(_normalize_pem(pem), password=None)
+
+
+class Keyring:
+    """Cached set of parsed keys keyed by kid, reloaded when its sources change"""
+
+    def __init__(self, key_env_var: str, file_env_var: str, loader: Callable,
+                 check_interval: float = KEYRING_CHECK_SECONDS):
+        self.key_env_var = key_env_var
+        self.file_env_var = file_env_var
+        self.loader = loader
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._keys: Dict[str, object] = {}
+        self._default_kid: Optional[str] = None
+        self._signature = None
+        self._checked_at = 0.0
+        self.reload_count = 0
+
+    def _source_signature(self):
+        """Cheap fingerprint of the key sources: env values plus key file mtime"""
+        path = os.getenv(self.file_env_var)
+        mtime = None
+        if path:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+        return (os.getenv(self.key_env_var), os.getenv('JWT_KEY_ID', DEFAULT_KEY_ID), path, mtime)
+
+    def _load(self, signature):
+        env_pem, env_kid, path, mtime = signature
+        keys = {}
+        if path and mtime is not None:
+            with open(path) as f:
+                for kid, pem in json.load(f).items():
+                    keys[kid] = self.loader(pem)
+        default_kid = None
+        if env_pem:
+            keys[env_kid] = self.loader(env_pem)
+            default_kid = env_kid
+        elif len(keys) == 1:
+            default_kid = next(iter(keys))
+
+        self._keys = keys
+        self._default_kid = default_kid
+        self._signature = signature
+        self.reload_count += 1
+
+    def refresh(self, force: bool = False):
+        """
+        Reload keys if the sources changed. Sources are checked at most every
+        check_interval seconds unless force is set; keys are only re-parsed
+        when the env value or key file actually changed.
+        """
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            signature = self._source_signature()
+            if signature != self._signature:
+                try:
+                    self._load(signature)
+                except Exception as e:
+                    # Keep serving the previous keys; retry once the sources change again
+                    logger.warning("Could not reload %s keyring: %s", self.key_env_var, e)
+                    self._signature = signature
+
+    def get(self, kid: Optional[str] = None):
+        """
+        Get a parsed key by kid (or the default key when kid is None).
+        An unknown kid forces one re-check of the sources before giving up.
+
+        Returns:
+            Parsed key object, or None if no key matches
+        """
+        self.refresh()
+        key = self._keys.get(kid if kid is not None else self._default_kid)
+        if key is None and kid is not None:
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+    @property
+    def default_kid(self) -> Optional[str]:
+        self.refresh()
+        return self._default_kid
+
+    def kids(self):
+        self.refresh()
+        return list(self._keys)
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv(self.key_env_var) or os.getenv(self.file_env_var))
+
+
+public_keyring = Keyring('JWT_PUBLIC_KEY', 'JWT_PUBLIC_KEYS_FILE', load_public_key)
+private_keyring = Keyring('JWT_PRIVATE_KEY', 'JWT_PRIVATE_KEYS_FILE', load_private_key)
@@ -0,0 +1,187 @@
+"""
+Logging Service - Non-blocking structured (JSON) logging with request IDs
+Log calls only build a record and put it on an in-memory queue; a background
+QueueListener thread formats it as one JSON object per line and writes it to
+stdout, so slow stdout never blocks a request. When the queue is full new
+records are dropped (and counted) instead of waiting.
+
+Every record logged while handling a request carries that request's
+`request_id` (taken from the X-Request-ID header, or generated), and the ID is
+echoed back in the X-Request-ID response header.
+
+Configuration:
+- LOG_LEVEL: root level (default INFO)
+- LOG_LEVELS: per-module levels, e.g. "services.auth_service=DEBUG,services.job_service=WARNING"
+- LOG_FORMAT: json (default) or text
+- LOG_DEBUG_SAMPLE_RATE: fraction of requests (0..1) whose DEBUG records are kept;
+  decided once per request so a sampled request keeps all of its debug lines
+- LOG_QUEUE_SIZE: records buffered before new ones are dropped
+
+Use `%s` arguments (logger.debug("... %s", value)) rather than f-strings so
+disabled levels cost only the level check.
+"""
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Client-supplied request IDs are only trusted when short and plain
+_VALID_REQUEST_ID = re.compile(r'^[\w.:-]{1,128}$')
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: standard fields, request_id and any `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the request ID and apply per-request debug sampling (runs in the calling request thread, which owns flask.g)"""
+
+    def filter(self, record):
+        if not has_request_context():
+            if record.levelno == logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1:
+                return random.random() < LOG_DEBUG_SAMPLE_RATE
+            return True
+        record.request_id = g.get('request_id')
+        if record.levelno == logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1:
+            if 'log_debug_sampled' not in g:
+                g.log_debug_sampled = random.random() < LOG_DEBUG_SAMPLE_RATE
+            return g.log_debug_sampled
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or erroring"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message and traceback here (args may not be picklable or
+        # may change later), but keep them separate for the JSON formatter
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+_handler = None
+
+
+def _start_listener():
+    global _listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else
+                                logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s',
+                                                  defaults={'request_id': '-'}))
+    _listener = QueueListener(_handler.queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+
+
+def _restart_listener_in_child():
+    # Forked workers (gunicorn --preload) do not inherit the listener thread
+    if _handler is not None:
+        _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """Route the root logger through the non-blocking queue (idempotent)"""
+    global _handler
+    if _handler is not None:
+        return
+    _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    for item in LOG_LEVELS.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _start_listener()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def get_logging_stats() -> dict:
+    """Queue depth and records dropped because the queue was full"""
+    return {
+        'queued': _handler.queue.qsize() if _handler is not None else 0,
+        'dropped': NonBlockingQueueHandler.dropped
+    }
+
+
+def init_request_logging(app):
+    """Assign every request an ID (from X-Request-ID or generated) and echo it in the response"""
+
+    @app.before_request
+    def _assign_request_id():
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = request_id if _VALID_REQUEST_ID.match(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def _add_request_id_header(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
@@ -0,0 +1,423 @@
+"""
+Metrics Service - Prometheus text-format metrics for GET /metrics
+Request middleware records per-endpoint request counts, latency and response
+size histograms and in-flight requests; services record domain counters
+(score cards generated, goals added, login attempts). Recording only touches
+in-memory dicts under one short lock, so measured paths pay no I/O.
+
+Multi-process (gunicorn): with METRICS_MULTIPROC_DIR set, every worker writes
+a snapshot of its metrics to <dir>/metrics_<pid>.json every
+METRICS_FLUSH_SECONDS (atomic replace) and at exit. A scrape flushes the
+serving worker and aggregates all files: counters and histograms are summed
+over every worker that ever ran (so they never go backwards on restarts),
+gauges only over live workers. Clear the directory when deploying, as with
+prometheus_client's multiprocess mode.
+
+Without METRICS_MULTIPROC_DIR, /metrics reports the serving process only.
+Set METRICS_AUTH_TOKEN to require `Authorization: Bearer <token>` on scrapes.
+"""
+from flask import Response, g, request
+from typing import Dict, List, Tuple
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """Process-local metric values keyed by (name, sorted label pairs)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.metadata: Dict[str, tuple] = {}  # name -> (type, help, buckets)
+        self.counters: Dict[tuple, float] = {}
+        self.gauges: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, list] = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def register(self, name, metric_type, help_text, buckets=None):
+        self.metadata[name] = (metric_type, help_text, buckets)
+
+    def add(self, store, key, amount):
+        with self._lock:
+            store[key] = store.get(key, 0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, key, value, buckets):
+        with self._lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    values[i] += 1
+                    break
+            else:
+                values[len(buckets)] += 1
+            values[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self.histograms.items()]
+            }
+
+
+_registry = Registry()
+
+
+def _key(name, labels) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        _registry.register(name, 'counter', help_text)
+
+    def inc(self, amount=1, **labels):
+        _registry.add(_registry.counters, _key(self.name, labels), amount)
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        _registry.register(name, 'gauge', help_text)
+
+    def inc(self, amount=1, **labels):
+        _registry.add(_registry.gauges, _key(self.name, labels), amount)
+
+    def dec(self, amount=1, **labels):
+        _registry.add(_registry.gauges, _key(self.name, labels), -amount)
+
+    def set(self, value, **labels):
+        _registry.set(_key(self.name, labels), value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.buckets = buckets
+        _registry.register(name, 'histogram', help_text, buckets)
+
+    def observe(self, value, **labels):
+        _registry.observe(_key(self.name, labels), value, self.buckets)
+
+
+# ---- Metrics ----
+
+http_requests = Counter('pms_http_requests_total', 'HTTP requests by method, endpoint and status')
+http_request_duration = Histogram('pms_http_request_duration_seconds', 'HTTP request latency', LATENCY_BUCKETS)
+http_response_size = Histogram('pms_http_response_size_bytes', 'HTTP response body size', SIZE_BUCKETS)
+http_requests_in_flight = Gauge('pms_http_requests_in_flight', 'HTTP requests currently being handled')
+
+score_cards_generated = Counter('pms_score_cards_generated_total', 'Score cards created by generation')
+goals_added = Counter('pms_goals_added_total', 'Goals added to score cards, by source')
+login_attempts = Counter('pms_login_attempts_total', 'Login attempts by result')
+
+
+# ---- Per-process service stats (collected at flush / scrape time) ----
+
+def _histogram_sample(wait_buckets, total) -> dict:
+    """Histogram sample value from a stats() bucket dict (upper bound -> count, '+Inf' last) and sum"""
+    return {'buckets': [[bound, count] for bound, count in wait_buckets.items()], 'sum': total}
+
+
+def _service_stats() -> List[Tuple[str, str, str, dict, object]]:
+    """
+    (name, type, help, labels, value) samples from the in-process caches and pools.
+    Histogram samples carry a _histogram_sample() dict as their value.
+    """
+    from services.password_service import password_pool
+    from services.token_cache_service import token_cache
+    from services.role_service import get_role_cache_stats
+    from services.db_pool_service import get_pool_stats
+    from services.db_session_service import get_replica_stats
+    from services.logging_service import get_logging_stats
+
+    samples = []
+    password = password_pool.stats()
+    samples += [
+        ('pms_password_pool_in_flight', 'gauge', 'bcrypt hashes running or queued', {}, password['in_flight']),
+        ('pms_password_pool_completed_total', 'counter', 'bcrypt hashes completed', {}, password['completed']),
+        ('pms_password_pool_rejected_total', 'counter', 'bcrypt requests rejected as busy', {}, password['rejected']),
+        ('pms_password_pool_wait_seconds', 'histogram', 'Time bcrypt requests spent queued for a worker', {},
+         _histogram_sample(password['wait_buckets'], password['wait_seconds_sum'])),
+    ]
+    tokens = token_cache.stats()
+    samples += [
+        ('pms_token_cache_entries', 'gauge', 'Verified tokens cached', {}, tokens['size']),
+        ('pms_token_cache_hits_total', 'counter', 'Token cache hits', {}, tokens['hits']),
+        ('pms_token_cache_misses_total', 'counter', 'Token cache misses', {}, tokens['misses']),
+        ('pms_token_cache_evictions_total', 'counter', 'Token cache evictions', {}, tokens['evictions']),
+    ]
+    roles = get_role_cache_stats()
+    samples += [
+        ('pms_role_cache_refreshes_total', 'counter', 'Role cache reloads', {}, roles['refreshes']),
+        ('pms_role_cache_check_errors_total', 'counter', 'Failed shared role version checks', {}, roles['check_errors']),
+    ]
+    logging_stats = get_logging_stats()
+    samples += [
+        ('pms_log_queue_depth', 'gauge', 'Log records waiting to be written', {}, logging_stats['queued']),
+        ('pms_log_records_dropped_total', 'counter', 'Log records dropped because the queue was full', {},
+         logging_stats['dropped']),
+    ]
+    for engine, pool in get_pool_stats().items():
+        labels = {'engine': engine}
+        samples += [
+            ('pms_db_pool_checked_out', 'gauge', 'Connections checked out', labels, pool.get('checked_out', 0)),
+            ('pms_db_pool_overflow', 'gauge', 'Overflow connections in use', labels, pool.get('overflow', 0)),
+            ('pms_db_pool_checkouts_total', 'counter', 'Connection checkouts', labels, pool['checkouts']),
+            ('pms_db_pool_timeouts_total', 'counter', 'Connection checkout timeouts', labels, pool['timeouts']),
+            ('pms_db_pool_wait_seconds', 'histogram', 'Time spent waiting to check out a connection', labels,
+             _histogram_sample(pool['wait_buckets'], pool['wait_seconds_sum'])),
+            ('pms_db_pool_invalidations_total', 'counter', 'Connections invalidated', labels, pool['invalidations']),
+        ]
+    for name, replica in get_replica_stats().items():
+        labels = {'replica': name}
+        samples += [
+            ('pms_replica_healthy', 'gauge', 'Replica is within the lag limit', labels, int(replica['healthy'])),
+            ('pms_replica_lag_seconds', 'gauge', 'Last measured replication lag', labels,
+             replica['lag_seconds'] if replica['lag_seconds'] is not None else math.nan),
+            ('pms_replica_routed_requests_total', 'counter', 'Requests routed to the replica', labels,
+             replica['routed_requests']),
+        ]
+    return samples
+
+
+def _process_snapshot() -> dict:
+    snapshot = _registry.snapshot()
+    snapshot['pid'] = os.getpid()
+    try:
+        snapshot['process'] = [[name, metric_type, help_text, sorted((k, str(v)) for k, v in labels.items()), value]
+                               for name, metric_type, help_text, labels, value in _service_stats()]
+    except Exception as e:
+        logger.warning("Could not collect service stats for metrics: %s", e)
+        snapshot['process'] = []
+    return snapshot
+
+
+# ---- Per-worker files ----
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _snapshot_path(pid) -> str:
+    return os.path.join(METRICS_MULTIPROC_DIR, f'metrics_{pid}.json')
+
+
+def flush():
+    """Write this worker's snapshot (atomic replace, so readers never see a partial file)"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(_process_snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except Exception as e:
+        logger.warning("Could not write metrics snapshot: %s", e)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        _flush_quietly()
+
+
+def _ensure_flusher():
+    """Start the flush thread once per worker (workers forked after create_app need their own)"""
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _flusher_lock:
+        if _flusher_pid == pid:
+            return
+        _flusher_pid = pid
+        threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+        atexit.register(_flush_quietly)
+
+
+def _pid_alive(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _load_snapshots() -> List[dict]:
+    if not METRICS_MULTIPROC_DIR:
+        return [_process_snapshot()]
+    flush()
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, 'metrics_*.json')):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning("Skipping metrics snapshot %s: %s", path, e)
+    return snapshots
+
+
+# ---- Exposition ----
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = [(k, str(v).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')) for k, v in labels]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def _format_value(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _histogram_lines(lines, name, labels, buckets, total):
+    """Append cumulative _bucket lines plus _count and _sum for one histogram series"""
+    cumulative = 0
+    for bound, count in buckets:
+        cumulative += count
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+    lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+
+
+def render_metrics() -> str:
+    """Aggregate every worker's snapshot into Prometheus text exposition format"""
+    counters: Dict[tuple, float] = {}
+    gauges: Dict[tuple, float] = {}
+    histograms: Dict[tuple, list] = {}
+    process_samples: Dict[tuple, float] = {}
+    process_metadata: Dict[str, tuple] = {}
+
+    for snapshot in _load_snapshots():
+        live = snapshot.get('pid') == os.getpid() or _pid_alive(snapshot.get('pid'))
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            totals = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                totals[i] += value
+        if not live:
+            continue
+        for name, labels, value in snapshot['gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        # In-process pool/cache stats are per worker; label them with the worker pid
+        for name, metric_type, help_text, labels, value in snapshot.get('process', []):
+            process_metadata[name] = (metric_type, help_text)
+            key = (name, tuple(map(tuple, labels)) + (('pid', str(snapshot['pid'])),))
+            process_samples[key] = value
+
+    lines = []
+
+    def header(name, metric_type, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+    for name, (metric_type, help_text, buckets) in _registry.metadata.items():
+        header(name, metric_type, help_text)
+        if metric_type == 'histogram':
+            for (sample_name, labels), values in sorted(histograms.items()):
+                if sample_name == name:
+                    _histogram_lines(lines, name, labels, zip(list(buckets) + ['+Inf'], values[:-1]), values[-1])
+        else:
+            store = counters if metric_type == 'counter' else gauges
+            for (sample_name, labels), value in sorted(store.items()):
+                if sample_name == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    for name, (metric_type, help_text) in process_metadata.items():
+        header(name, metric_type, help_text)
+        for (sample_name, labels), value in sorted(process_samples.items()):
+            if sample_name != name:
+                continue
+            if metric_type == 'histogram':
+                _histogram_lines(lines, name, labels, value['buckets'], value['sum'])
+            else:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+# ---- Request middleware ----
+
+def init_metrics(app):
+    """Record request metrics for every request and serve GET /metrics"""
+    if METRICS_MULTIPROC_DIR:
+        os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+
+    @app.before_request
+    def _start_request_metrics():
+        if METRICS_MULTIPROC_DIR:
+            _ensure_flusher()
+        g.metrics_started = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        # Route template (not the raw path) keeps label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_requests.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+        http_request_duration.observe(time.perf_counter() - started, method=request.method, endpoint=endpoint)
+        # Streamed responses have no length up front and are not sized
+        if response.content_length is not None:
+            http_response_size.observe(response.content_length, method=request.method, endpoint=endpoint)
+        return response
+
+    @app.teardown_request
+    def _end_request_metrics(exc):
+        if g.pop('metrics_started', None) is not None:
+            http_requests_in_flight.dec()
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_route():
+        if METRICS_AUTH_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_AUTH_TOKEN}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,134 @@
+"""
+Org Hierarchy Service - Reporting lines from Employee.reporting_manager_id
+Subtrees (everyone under a manager), ancestor chains and span-of-control counts
+are each read with one recursive CTE instead of walking the lazy
+reporting_manager / direct_reports relationships level by level.
+
+Traversal follows non-deleted employees only and stops after
+HIERARCHY_MAX_DEPTH levels, which also bounds the walk if bad data ever forms
+a reporting cycle (the table only forbids self-reporting).
+"""
+from extensions import db
+from models.employee import Employee
+from models.department import Department
+from models.position import Position
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.orm import aliased
+import os
+
+HIERARCHY_MAX_DEPTH = int(os.getenv('HIERARCHY_MAX_DEPTH', '20'))
+
+
+def _depth_limit(max_depth=None):
+    return min(max_depth, HIERARCHY_MAX_DEPTH) if max_depth else HIERARCHY_MAX_DEPTH
+
+
+def subtree_cte(manager_id, max_depth=None):
+    """
+    Recursive CTE of (id, reporting_manager_id, depth) for everyone reporting to
+    manager_id, directly (depth 1) or indirectly. The manager is not included.
+    Usable as a subquery, e.g. ScoreCard.employee_id.in_(select(cte.c.id)).
+    """
+    max_depth = _depth_limit(max_depth)
+    subtree = select(
+        Employee.id, Employee.reporting_manager_id, literal(1).label('depth')
+    ).where(
+        Employee.reporting_manager_id == manager_id,
+        Employee.deleted_at.is_(None)
+    ).cte('org_subtree', recursive=True)
+
+    report = aliased(Employee)
+    return subtree.union_all(
+        select(report.id, report.reporting_manager_id, subtree.c.depth + 1)
+        .join(subtree, report.reporting_manager_id == subtree.c.id)
+        .where(report.deleted_at.is_(None), subtree.c.depth < max_depth)
+    )
+
+
+def _ancestors_cte(employee_id):
+    chain = select(
+        Employee.id, Employee.reporting_manager_id, literal(0).label('depth')
+    ).where(
+        Employee.id == employee_id,
+        Employee.deleted_at.is_(None)
+    ).cte('org_ancestors', recursive=True)
+
+    manager = aliased(Employee)
+    return chain.union_all(
+        select(manager.id, manager.reporting_manager_id, chain.c.depth + 1)
+        .join(chain, manager.id == chain.c.reporting_manager_id)
+        .where(manager.deleted_at.is_(None), chain.c.depth < HIERARCHY_MAX_DEPTH)
+    )
+
+
+def _employee_rows(cte):
+    """Employees of a hierarchy CTE with department and position, in one joined query"""
+    return db.session.execute(
+        select(
+            Employee.id, Employee.employee_id, Employee.full_name, Employee.email, Employee.is_active,
+            Employee.reporting_manager_id, cte.c.depth,
+            Department.id.label('dept_id'), Department.name.label('dept_name'),
+            Position.id.label('pos_id'), Position.title.label('pos_title')
+        )
+        .join(cte, Employee.id == cte.c.id)
+        .outerjoin(Department, Employee.department_id == Department.id)
+        .outerjoin(Position, Employee.position_id == Position.id)
+        .order_by(cte.c.depth, Employee.full_name, Employee.id)
+    )
+
+
+def _employee_item(row):
+    return {
+        'id': row.id,
+        'employee_id': row.employee_id,
+        'full_name': row.full_name,
+        'email': row.email,
+        'is_active': row.is_active,
+        'reporting_manager_id': row.reporting_manager_id,
+        'depth': row.depth,
+        'department': {'id': row.dept_id, 'name': row.dept_name} if row.dept_id else None,
+        'position': {'id': row.pos_id, 'title': row.pos_title} if row.pos_id else None
+    }
+
+
+def get_subtree(manager_id, max_depth=None):
+    """
+    Everyone reporting to a manager, directly or indirectly, in one query.
+
+    Args:
+        manager_id: Employee.id of the manager
+        max_depth: Optional number of levels to return (1 = direct reports only)
+
+    Returns:
+        List of employee dicts (with department, position and depth), ordered by
+        depth then name
+    """
+    return [_employee_item(row) for row in _employee_rows(subtree_cte(manager_id, max_depth))]
+
+
+def get_ancestors(employee_id):
+    """Reporting chain above an employee in one query, nearest manager first (depth 1)"""
+    chain = _ancestors_cte(employee_id)
+    return [_employee_item(row) for row in _employee_rows(chain) if row.depth > 0]
+
+
+def get_span_of_control(manager_id):
+    """
+    Direct and total report counts for a manager in one aggregate query.
+
+    Returns:
+        Dict with direct_reports, total_reports and levels (depth of the deepest report)
+    """
+    subtree = subtree_cte(manager_id)
+    row = db.session.execute(
+        select(
+            func.coalesce(func.sum(case((subtree.c.depth == 1, 1), else_=0)), 0).label('direct_reports'),
+            func.count().label('total_reports'),
+            func.coalesce(func.max(subtree.c.depth), 0).label('levels')
+        ).select_from(subtree)
+    ).one()
+    return {
+        'direct_reports': row.direct_reports,
+        'total_reports': row.total_reports,
+        'levels': row.levels
+    }
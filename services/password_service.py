@@ -0,0 +1,120 @@
+"""
+Password Service - bcrypt hashing/verification on a bounded worker pool
+bcrypt at rounds=10 costs tens of milliseconds of CPU per call. Running it on a
+small dedicated pool caps how many request threads burn CPU on password checks
+at once, and the bounded queue sheds excess load (PasswordPoolBusy) so regular
+API traffic stays responsive during login storms.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import os
+import threading
+import time
+
+BCRYPT_ROUNDS = 10
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv('BCRYPT_MAX_QUEUE', '32'))  # Waiting jobs beyond the running ones
+BCRYPT_RETRY_AFTER_SECONDS = int(os.getenv('BCRYPT_RETRY_AFTER', '2'))
+
+# Queue wait histogram bucket upper bounds, in seconds
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool queue is full; callers should answer 503 + Retry-After"""
+
+    def __init__(self, retry_after=BCRYPT_RETRY_AFTER_SECONDS):
+        super().__init__("Password verification queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasherPool:
+    """Bounded executor for bcrypt with admission control and queue-wait metrics"""
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_queue: int = BCRYPT_MAX_QUEUE,
+                 retry_after: int = BCRYPT_RETRY_AFTER_SECONDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        # One slot per running or waiting job; when all are taken, new work is rejected
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_bucket_counts = [0] * (len(WAIT_BUCKETS) + 1)  # Last bucket is +Inf
+
+    def _record_wait(self, waited):
+        with self._stats_lock:
+            self.wait_seconds_sum += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    self.wait_bucket_counts[i] += 1
+                    break
+            else:
+                self.wait_bucket_counts[-1] += 1
+
+    def _run(self, enqueued_at, fn, args):
+        self._record_wait(time.monotonic() - enqueued_at)
+        return fn(*args)
+
+    def _release(self, _future):
+        with self._stats_lock:
+            self._in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the pool and wait for the result; raises PasswordPoolBusy when full"""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise PasswordPoolBusy(self.retry_after)
+        with self._stats_lock:
+            self._in_flight += 1
+        future = self._executor.submit(self._run, time.monotonic(), fn, args)
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def check_password(self, password: str, password_hash) -> bool:
+        password_bytes = password.encode('utf-8')
+        hash_bytes = password_hash.encode('utf-8') if isinstance(password_hash, str) else password_hash
+        return self.submit(bcrypt.checkpw, password_bytes, hash_bytes)
+
+    def hash_password(self, password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+        return self.submit(_hash, password.encode('utf-8'), rounds).decode('utf-8')
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'wait_seconds_sum': self.wait_seconds_sum,
+                'wait_seconds_max': self.wait_seconds_max,
+                'wait_buckets': dict(zip([str(b) for b in WAIT_BUCKETS] + ['+Inf'], self.wait_bucket_counts))
+            }
+
+
+def _hash(password_bytes, rounds):
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=rounds))
+
+
+# Process-wide pool instance
+password_pool = PasswordHasherPool()
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    """Hash a password with bcrypt on the password pool"""
+    return password_pool.hash_password(password, rounds)
+
+
+def check_password(password, password_hash):
+    """Verify a password against a bcrypt hash on the password pool"""
+    return password_pool.check_password(password, password_hash)
@@ -0,0 +1,181 @@
+"""
+Query Stats Service - Per-request SQL statement counts, DB time and N+1 detection
+Engine cursor events count every statement and its execution time. Statements
+are grouped by normalized SQL (literals, bound parameters and IN lists folded),
+so a loop that runs the same query once per row shows up as one statement
+repeated many times.
+
+Enable with QUERY_STATS_ENABLED=true. Each response then carries
+    Server-Timing: db;dur=<ms>;desc="<n> queries"
+and a structured log record is written for requests where a statement repeats
+at least QUERY_STATS_N_PLUS_ONE_THRESHOLD times (or for every request with
+QUERY_STATS_LOG_ALL=true).
+
+Tests can bound the statements an endpoint runs, independent of the env flag:
+    with assert_max_queries(3):
+        client.get('/api/review-periods/active', headers=headers)
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+QUERY_STATS_N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_STATS_N_PLUS_ONE_THRESHOLD', '5'))
+QUERY_STATS_LOG_ALL = os.getenv('QUERY_STATS_LOG_ALL', 'false').lower() in ('1', 'true', 'yes')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Bound parameters as rendered by the DBAPIs in use: %(name)s, %s, ?, :name, $1
+_PARAMETER = re.compile(r'%\(\w+\)s|%s|\?|(?<!:):\w+|\$\d+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(statement: str) -> str:
+    """Fold literals, parameters and IN lists so repeats of one query compare equal"""
+    sql = _STRING_LITERAL.sub('?', statement)
+    sql = _PARAMETER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """Statements executed during one request (or one count_queries() block)"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.statement_seconds = defaultdict(float)
+
+    def record(self, statement, seconds):
+        sql = normalize_sql(statement)
+        self.count += 1
+        self.duration += seconds
+        self.statements[sql] += 1
+        self.statement_seconds[sql] += seconds
+
+    def repeated(self, threshold=None) -> list:
+        """Statements run at least `threshold` times (default QUERY_STATS_N_PLUS_ONE_THRESHOLD), most frequent first"""
+        threshold = threshold or QUERY_STATS_N_PLUS_ONE_THRESHOLD
+        return [
+            {'sql': sql, 'count': count, 'db_ms': round(self.statement_seconds[sql] * 1000, 2)}
+            for sql, count in self.statements.most_common() if count >= threshold
+        ]
+
+    def summary(self) -> str:
+        lines = [f"{self.count} queries, {self.duration * 1000:.1f} ms"]
+        lines += [f"  {count}x {sql}" for sql, count in self.statements.most_common()]
+        return '\n'.join(lines)
+
+
+_local = threading.local()  # count_queries() collectors active on this thread
+_listeners_installed = False
+_install_lock = threading.Lock()
+
+
+def _active_collectors() -> list:
+    collectors = list(getattr(_local, 'collectors', ()))
+    if has_request_context():
+        stats = g.get('query_stats')
+        if stats is not None:
+            collectors.append(stats)
+    return collectors
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_stats_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    for stats in _active_collectors():
+        stats.record(statement, elapsed)
+
+
+def _install_listeners():
+    """Listen on every Engine (primary and replicas); installed only once instrumentation is used"""
+    global _listeners_installed
+    with _install_lock:
+        if _listeners_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+def init_query_stats(app):
+    """Collect per-request query stats and report them (no-op unless QUERY_STATS_ENABLED)"""
+    if not QUERY_STATS_ENABLED:
+        return
+    _install_listeners()
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        # Streamed responses report the statements run before the first chunk only
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        timing = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+        existing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        repeated = stats.repeated()
+        if repeated or QUERY_STATS_LOG_ALL:
+            logger.log(
+                logging.WARNING if repeated else logging.INFO,
+                "Repeated queries (possible N+1)" if repeated else "Request query stats",
+                extra={
+                    'event': 'n_plus_one' if repeated else 'query_stats',
+                    'method': request.method,
+                    'path': request.path,
+                    'endpoint': request.endpoint,
+                    'status': response.status_code,
+                    'queries': stats.count,
+                    'db_ms': round(stats.duration * 1000, 2),
+                    'repeated': repeated
+                }
+            )
+        return response
+
+
+@contextmanager
+def count_queries():
+    """Collect the statements executed on this thread inside the block"""
+    _install_listeners()
+    stats = QueryStats()
+    collectors = getattr(_local, 'collectors', None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Fail with the grouped statement list when the block runs more than max_queries statements"""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise AssertionError(f"Expected at most {max_queries} queries, got {stats.summary()}")
@@ -1,5 +1,6 @@
 from models.review_period import ReviewPeriod
 from extensions import db
+from services.streaming_service import iter_query
 from datetime import datetime, date
 
 def create_review_period(period_name, period_type, start_date, end_date, financial_period=None, description=None, status='Draft', is_active=False, created_by=None):
@@ -45,6 +46,42 @@ def get_all_review_periods():
     """Get all review periods"""
     return ReviewPeriod.query.order_by(ReviewPeriod.start_date.desc()).all()
 
+def iter_review_periods():
+    """Iterate all review periods from a server-side cursor (for streamed responses)"""
+    return iter_query(ReviewPeriod.query.order_by(ReviewPeriod.start_date.desc()))
+
+def get_active_review_periods_with_counts(include_status_counts=False):
+    """
+    Get active review periods with their score card counts in one grouped query.
+    
+    Args:
+        include_status_counts: Also return per-status score card counts
+        
+    Returns:
+        List of (review_period, employee_count, status_counts) tuples, where
+        status_counts is a dict of status -> count (empty unless requested)
+    """
+    from models.score_card import ScoreCard
+    
+    rows = db.session.query(
+        ReviewPeriod, ScoreCard.status, db.func.count(ScoreCard.id)
+    ).outerjoin(
+        ScoreCard,
+        db.and_(ScoreCard.review_period_id == ReviewPeriod.id, ScoreCard.deleted_at.is_(None))
+    ).filter(
+        ReviewPeriod.is_active == True,
+        ReviewPeriod.deleted_at.is_(None)
+    ).group_by(ReviewPeriod.id, ScoreCard.status).order_by(ReviewPeriod.id).all()
+    
+    # One row per (period, status); fold into one entry per period
+    results = {}
+    for period, status, count in rows:
+        entry = results.setdefault(period.id, [period, 0, {}])
+        entry[1] += count
+        if include_status_counts and status is not None:
+            entry[2][status] = count
+    return [tuple(entry) for entry in results.values()]
+
 def get_review_period_by_id(period_id):
     """Get review period by ID"""
     return ReviewPeriod.query.get(period_id)
@@ -1,27 +1,81 @@
 """
 Role Service - Dynamic role loading and caching
 Loads roles from database at startup and provides lookups by name or ID
+
+Each worker process keeps its own cache. To keep workers consistent, every Role
+change bumps the shared 'roles' row in cache_versions (in the same transaction),
+and each worker compares that row with the version it loaded at most once every
+ROLE_CACHE_CHECK_SECONDS, reloading only when it changed.
 """
 from models.role import Role
+from models.cache_version import CacheVersion
 from extensions import db
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session, object_session
 from typing import Optional, Dict
+from datetime import datetime
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ROLE_CACHE_CHECK_SECONDS = float(os.getenv('ROLE_CACHE_CHECK_SECONDS', '30'))
+_SHARED_VERSION_NAME = 'roles'
 
 # Global cache - loaded at startup
 _ROLE_CACHE: Dict[str, int] = {}  # role_name -> role_id
 _ROLE_ID_CACHE: Dict[int, str] = {}  # role_id -> role_name
 _ROLE_LOADED = False
+_ROLE_VERSION = 0  # Bumped on every (re)load so dependents can drop derived data
+_SHARED_VERSION: Optional[int] = None  # cache_versions.version seen at last load
+_LAST_CHECK = 0.0  # time.monotonic() of last shared version check
+
+# Per-worker refresh statistics
+_STATS = {'checks': 0, 'refreshes': 0, 'check_errors': 0, 'last_refresh_at': None}
+
+def _read_shared_version() -> Optional[int]:
+    """Read the shared roles version on its own connection (never disturbs the request transaction)"""
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(CacheVersion.version).where(CacheVersion.name == _SHARED_VERSION_NAME)
+        ).scalar()
+
+def _bump_shared_version(connection):
+    """Increment the shared roles version using the given connection/transaction"""
+    result = connection.execute(
+        update(CacheVersion.__table__)
+        .where(CacheVersion.name == _SHARED_VERSION_NAME)
+        .values(version=CacheVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(CacheVersion.__table__)
+            .values(name=_SHARED_VERSION_NAME, version=1, updated_at=datetime.utcnow())
+        )
 
 def load_roles():
     """Load all active roles from database into cache"""
-    global _ROLE_CACHE, _ROLE_ID_CACHE, _ROLE_LOADED
+    global _ROLE_CACHE, _ROLE_ID_CACHE, _ROLE_LOADED, _ROLE_VERSION, _SHARED_VERSION, _LAST_CHECK
     
     if _ROLE_LOADED:
         return  # Already loaded
     
-    roles = Role.query.filter(
-        Role.deleted_at.is_(None),
-        Role.is_active == True
-    ).all()
+    # Read the shared version first so a concurrent change is seen by the next check
+    try:
+        shared_version = _read_shared_version()
+    except Exception:
+        shared_version = None
+        _STATS['check_errors'] += 1
+    
+    # Always from the primary: a replica could lag behind the version just read
+    roles = db.session.execute(
+        select(Role).where(
+            Role.deleted_at.is_(None),
+            Role.is_active == True
+        ),
+        bind_arguments={'bind': db.engine}
+    ).scalars().all()
     
     _ROLE_CACHE = {}
     _ROLE_ID_CACHE = {}
@@ -31,33 +85,104 @@ def load_roles():
         _ROLE_ID_CACHE[role.id] = role.role_name
     
     _ROLE_LOADED = True
-    print(f"✓ Loaded {len(_ROLE_CACHE)} roles into cache")
+    _ROLE_VERSION += 1
+    _SHARED_VERSION = shared_version
+    _LAST_CHECK = time.monotonic()
+    _STATS['refreshes'] += 1
+    _STATS['last_refresh_at'] = datetime.utcnow().isoformat()
+    logger.info("Loaded %d roles into cache", len(_ROLE_CACHE))
     return _ROLE_CACHE
 
-def get_role_id_by_name(role_name: str) -> Optional[int]:
-    """Get role_id by role_name (from cache)"""
+def _ensure_fresh():
+    """Load roles if needed, and reload when another worker changed them (checked periodically)"""
+    global _LAST_CHECK, _ROLE_LOADED
     if not _ROLE_LOADED:
         load_roles()
+        return
+    
+    now = time.monotonic()
+    if now - _LAST_CHECK < ROLE_CACHE_CHECK_SECONDS:
+        return
+    _LAST_CHECK = now
+    _STATS['checks'] += 1
+    try:
+        shared_version = _read_shared_version()
+    except Exception:
+        _STATS['check_errors'] += 1
+        return
+    if shared_version != _SHARED_VERSION:
+        _ROLE_LOADED = False
+        load_roles()
+
+def get_role_cache_version() -> int:
+    """Version of the role cache; changes whenever roles are (re)loaded"""
+    _ensure_fresh()
+    return _ROLE_VERSION
+
+def get_role_cache_stats() -> dict:
+    """Refresh statistics for this worker's role cache"""
+    return {
+        'pid': os.getpid(),
+        'roles': len(_ROLE_CACHE),
+        'local_version': _ROLE_VERSION,
+        'shared_version': _SHARED_VERSION,
+        **_STATS
+    }
+
+def get_role_id_by_name(role_name: str) -> Optional[int]:
+    """Get role_id by role_name (from cache)"""
+    _ensure_fresh()
     return _ROLE_CACHE.get(role_name)
 
 def get_role_name_by_id(role_id: int) -> Optional[str]:
     """Get role_name by role_id (from cache)"""
-    if not _ROLE_LOADED:
-        load_roles()
+    _ensure_fresh()
     return _ROLE_ID_CACHE.get(role_id)
 
 def get_all_roles() -> Dict[str, int]:
     """Get all roles as dict (role_name -> role_id)"""
-    if not _ROLE_LOADED:
-        load_roles()
+    _ensure_fresh()
     return _ROLE_CACHE.copy()
 
-def reload_roles():
-    """Force reload roles from database (useful after role changes)"""
+def reload_roles(publish=True):
+    """
+    Force reload roles from database (useful after role changes).
+    With publish=True the shared version is bumped so other workers reload too
+    (needed after changes that bypass the ORM, e.g. raw SQL).
+    """
     global _ROLE_LOADED
+    if publish:
+        try:
+            with db.engine.begin() as conn:
+                _bump_shared_version(conn)
+        except Exception as e:
+            logger.warning("Could not publish role cache version: %s", e)
     _ROLE_LOADED = False
     return load_roles()
 
+# ---- Publish Role changes to other workers ----
+# The shared version is bumped on the flush connection, so it commits (or rolls
+# back) together with the role change itself. This worker re-checks right after commit.
+
+def _role_changed(mapper, connection, target):
+    _bump_shared_version(connection)
+    session = object_session(target)
+    if session is not None:
+        session.info['roles_changed'] = True
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Role, _event_name, _role_changed)
+
+@event.listens_for(Session, 'after_commit')
+def _recheck_after_commit(session):
+    global _LAST_CHECK
+    if session.info.pop('roles_changed', False):
+        _LAST_CHECK = 0.0
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('roles_changed', None)
+
 def get_hr_admin_role_id() -> Optional[int]:
     """Convenience method: Get HR Admin role_id"""
     return get_role_id_by_name('HR Admin')
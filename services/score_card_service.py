@@ -1,8 +1,99 @@
 from extensions import db
 from models.score_card import ScoreCard
 from models.employee import Employee
+from models.department import Department
+from models.position import Position
+from services.job_service import register_job
+from services.metrics_service import score_cards_generated
+from services.org_hierarchy_service import subtree_cte
+from services.streaming_service import iter_query
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
 
+# Rows per INSERT ... ON CONFLICT statement when generating score cards in bulk
+BULK_INSERT_CHUNK_SIZE = 1000
+
+# Weightage assumed for score cards created before weightage existed
+DEFAULT_GOALS_WEIGHTAGE = 60
+DEFAULT_COMPETENCIES_WEIGHTAGE = 25
+DEFAULT_VALUES_WEIGHTAGE = 15
+
+# Goal.added_by_role -> ScoreCard per-role weight total column
+GOAL_ROLE_WEIGHT_COLUMNS = {
+    'HR': ScoreCard.hr_goal_weight,
+    'Manager': ScoreCard.manager_goal_weight,
+    'Employee': ScoreCard.employee_goal_weight,
+}
+
+
+def adjust_goal_weight(score_card_id, delta, added_by_role=None, enforce_limit=True):
+    """
+    Atomically add delta to a score card's goal weight totals (does not commit).
+    
+    Runs a single conditional UPDATE, so the check against goals_weightage and the
+    increment cannot race: concurrent writers queue on the score card row lock and
+    each re-checks the condition against the committed total. Call it in the same
+    transaction as the goal insert/update/delete it accounts for.
+    
+    Args:
+        score_card_id: Score card ID
+        delta: Weight change (positive when adding weight, negative when removing)
+        added_by_role: Goal's added_by_role ('HR', 'Manager', 'Employee') for the per-role total
+        enforce_limit: Reject increases that would push the total past goals_weightage
+        
+    Returns:
+        True if applied, False if the score card is missing or the limit would be exceeded
+    """
+    values = {ScoreCard.total_goal_weight: ScoreCard.total_goal_weight + delta}
+    role_column = GOAL_ROLE_WEIGHT_COLUMNS.get(added_by_role)
+    if role_column is not None:
+        values[role_column] = role_column + delta
+    
+    query = ScoreCard.query.filter(ScoreCard.id == score_card_id)
+    if enforce_limit and delta > 0:
+        query = query.filter(
+            ScoreCard.total_goal_weight + delta <= db.func.coalesce(ScoreCard.goals_weightage, DEFAULT_GOALS_WEIGHTAGE)
+        )
+    return query.update(values, synchronize_session=False) == 1
+
+
+def backfill_default_weightage(chunk_size=BULK_INSERT_CHUNK_SIZE, progress_callback=None):
+    """
+    Set default weightage (60/25/15) on legacy score cards that still have NULLs.
+    
+    Rows are fixed chunk_size at a time, each chunk in its own short transaction,
+    so the backfill never holds locks on the whole table. Safe to re-run.
+    
+    Returns:
+        Number of score cards updated
+    """
+    weightage_is_null = db.or_(
+        ScoreCard.goals_weightage.is_(None),
+        ScoreCard.competencies_weightage.is_(None),
+        ScoreCard.values_weightage.is_(None)
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        ids = [row.id for row in db.session.query(ScoreCard.id).filter(
+            weightage_is_null, ScoreCard.id > last_id
+        ).order_by(ScoreCard.id).limit(chunk_size).all()]
+        if not ids:
+            break
+        
+        updated += ScoreCard.query.filter(ScoreCard.id.in_(ids)).update({
+            'goals_weightage': db.func.coalesce(ScoreCard.goals_weightage, DEFAULT_GOALS_WEIGHTAGE),
+            'competencies_weightage': db.func.coalesce(ScoreCard.competencies_weightage, DEFAULT_COMPETENCIES_WEIGHTAGE),
+            'values_weightage': db.func.coalesce(ScoreCard.values_weightage, DEFAULT_VALUES_WEIGHTAGE)
+        }, synchronize_session=False)
+        db.session.commit()
+        last_id = ids[-1]
+        
+        if progress_callback:
+            progress_callback(updated)
+    
+    return updated
+
 
 def create_score_card(user_id=None, title=None, period_start=None, period_end=None, status='planning', 
                       employee_id=None, review_period_id=None, created_by_user_id=None):
@@ -26,52 +117,279 @@ def create_score_card(user_id=None, title=None, period_start=None, period_end=No
     return score_card
 
 
-def bulk_create_score_cards(review_period_id, employee_ids, created_by_user_id):
+def bulk_create_score_cards(review_period_id, employee_ids, created_by_user_id, chunk_size=BULK_INSERT_CHUNK_SIZE,
+                            progress_callback=None):
     """
     Bulk create score cards for multiple employees.
     
+    Inserts every missing (employee_id, review_period_id) pair with
+    INSERT ... ON CONFLICT ON CONSTRAINT uq_employee_review_period DO NOTHING RETURNING,
+    one statement per chunk. Each chunk is committed on its own so a large
+    generation never holds one long transaction.
+    
     Args:
         review_period_id: ID of the review period
         employee_ids: List of employee IDs
         created_by_user_id: ID of the user creating these score cards
+        chunk_size: Number of rows per INSERT statement
+        progress_callback: Optional callable(processed, created) invoked after each chunk commits
         
     Returns:
-        List of created ScoreCard objects
+        List of IDs of the newly created score cards (existing ones are skipped)
     """
-    created_score_cards = []
+    created_ids = []
+    employee_ids = list(employee_ids)
     
-    for employee_id in employee_ids:
-        # Check if a score card already exists for this employee and review period
-        existing = ScoreCard.query.filter_by(
-            employee_id=employee_id,
-            review_period_id=review_period_id,
-            deleted_at=None
-        ).first()
+    for start in range(0, len(employee_ids), chunk_size):
+        now = datetime.utcnow()
+        rows = [{
+            'employee_id': employee_id,
+            'review_period_id': review_period_id,
+            'status': 'planning',
+            'created_by': created_by_user_id,
+            'created_at': now,
+            'updated_at': now
+        } for employee_id in employee_ids[start:start + chunk_size]]
         
-        if existing:
-            # Skip if already exists
-            continue
+        stmt = pg_insert(ScoreCard).values(rows).on_conflict_do_nothing(
+            constraint='uq_employee_review_period'
+        ).returning(ScoreCard.id)
         
-        # Create new score card with status="planning"
-        score_card = ScoreCard(
-            employee_id=employee_id,
-            review_period_id=review_period_id,
-            status='planning',
-            created_by=created_by_user_id,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+        chunk_ids = [row.id for row in db.session.execute(stmt)]
+        db.session.commit()
+        created_ids.extend(chunk_ids)
+        score_cards_generated.inc(len(chunk_ids))
+        
+        if progress_callback:
+            progress_callback(min(start + chunk_size, len(employee_ids)), len(created_ids))
+    
+    return created_ids
+
+
+@register_job('generate_score_cards')
+def generate_score_cards_job(job, review_period_id, profile_ids, created_by_user_id, excluded_employee_id=None):
+    """
+    Background job: generate score cards for every employee matching the profiles.
+    Safe to re-run after a crash since existing cards are skipped by ON CONFLICT.
+    
+    Progress counters: employees_total, employees_processed, cards_created, cards_skipped
+    """
+    from services.eligibility_service import get_matching_employees_for_profiles
+    
+    employee_ids = set(get_matching_employees_for_profiles(profile_ids))
+    employee_ids.discard(excluded_employee_id)
+    
+    progress = {
+        'employees_total': len(employee_ids),
+        'employees_processed': 0,
+        'cards_created': 0,
+        'cards_skipped': 0
+    }
+    job.update_progress(**progress)
+    
+    def on_chunk(processed, created):
+        progress.update(
+            employees_processed=processed,
+            cards_created=created,
+            cards_skipped=processed - created
         )
-        db.session.add(score_card)
-        created_score_cards.append(score_card)
+        job.update_progress(**progress)
     
-    # Commit all at once
-    if created_score_cards:
-        db.session.commit()
-        # Reload to get all relationships
-        for score_card in created_score_cards:
-            db.session.refresh(score_card)
+    created_ids = bulk_create_score_cards(
+        review_period_id=review_period_id,
+        employee_ids=sorted(employee_ids),
+        created_by_user_id=created_by_user_id,
+        progress_callback=on_chunk
+    )
+    
+    return {
+        'cards_created': len(created_ids),
+        'cards_skipped': len(employee_ids) - len(created_ids)
+    }
+
+
+def get_score_card_employee_summaries(review_period_id, employee_ids):
+    """
+    Get score card + employee summaries for a review period in a single query.
+    
+    Args:
+        review_period_id: ID of the review period
+        employee_ids: Iterable of employee IDs to include
+        
+    Returns:
+        List of dicts with employee id, name, department, position and score_card_id
+    """
+    employee_ids = list(employee_ids)
+    if not employee_ids:
+        return []
+    
+    rows = db.session.query(
+        ScoreCard.id.label('score_card_id'),
+        Employee.id.label('employee_id'),
+        Employee.full_name,
+        Department.name.label('department_name'),
+        Position.title.label('position_title')
+    ).join(
+        Employee, ScoreCard.employee_id == Employee.id
+    ).outerjoin(
+        Department, Employee.department_id == Department.id
+    ).outerjoin(
+        Position, Employee.position_id == Position.id
+    ).filter(
+        ScoreCard.review_period_id == review_period_id,
+        ScoreCard.employee_id.in_(employee_ids),
+        ScoreCard.deleted_at.is_(None)
+    ).all()
+    
+    return [{
+        'id': row.employee_id,
+        'name': row.full_name,
+        'department': row.department_name or 'N/A',
+        'position': row.position_title or 'N/A',
+        'score_card_id': row.score_card_id
+    } for row in rows]
+
+
+# Field name -> columns it needs, for projection-aware score card listing
+SCORE_CARD_LIST_FIELDS = {
+    'id': [ScoreCard.id],
+    'employee_id': [ScoreCard.employee_id],
+    'review_period_id': [ScoreCard.review_period_id],
+    'status': [ScoreCard.status],
+    'employee.id': [Employee.id.label('emp_id')],
+    'employee.full_name': [Employee.full_name.label('emp_full_name')],
+    'employee.email': [Employee.email.label('emp_email')],
+    'employee.department': [Department.id.label('dept_id'), Department.name.label('dept_name')],
+    'employee.position': [Position.id.label('pos_id'), Position.title.label('pos_title')],
+}
+MAX_SCORE_CARD_PAGE_SIZE = 500
+
+
+def _expand_fields(fields):
+    """Expand requested field names ('employee' means all employee.* fields); raises ValueError on unknown"""
+    if not fields:
+        return list(SCORE_CARD_LIST_FIELDS)
+    expanded = []
+    for field in fields:
+        matches = [f for f in SCORE_CARD_LIST_FIELDS if f == field or f.startswith(field + '.')]
+        if not matches:
+            raise ValueError(f"Unknown field '{field}'")
+        expanded.extend(m for m in matches if m not in expanded)
+    return expanded
+
+
+def _score_card_list_query(fields, review_period_id=None, department_id=None, department=None, status=None,
+                           search=None, after_id=None, manager_id=None):
+    """Build the joined, ordered projection query behind list_score_cards / iter_score_cards"""
+    columns = [ScoreCard.id.label('cursor_id')]
+    for field in fields:
+        columns.extend(SCORE_CARD_LIST_FIELDS[field])
     
-    return created_score_cards
+    needs_employee = search or department_id or department or any(f.startswith('employee.') for f in fields)
+    needs_department = department or 'employee.department' in fields
+    needs_position = 'employee.position' in fields
+    
+    query = db.session.query(*columns).select_from(ScoreCard)
+    if needs_employee:
+        query = query.outerjoin(Employee, ScoreCard.employee_id == Employee.id)
+    if needs_department:
+        query = query.outerjoin(Department, Employee.department_id == Department.id)
+    if needs_position:
+        query = query.outerjoin(Position, Employee.position_id == Position.id)
+    
+    query = query.filter(ScoreCard.deleted_at.is_(None))
+    if review_period_id:
+        query = query.filter(ScoreCard.review_period_id == review_period_id)
+    if status:
+        query = query.filter(ScoreCard.status == status)
+    if department_id:
+        query = query.filter(Employee.department_id == department_id)
+    if department:
+        query = query.filter(Department.name == department)
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(db.or_(
+            Employee.full_name.ilike(pattern),
+            Employee.email.ilike(pattern),
+            Employee.employee_id.ilike(pattern)
+        ))
+    if manager_id:
+        # Everyone under the manager (any depth), resolved inside the same query
+        query = query.filter(ScoreCard.employee_id.in_(db.select(subtree_cte(manager_id).c.id)))
+    if after_id:
+        query = query.filter(ScoreCard.id > after_id)
+    
+    return query.order_by(ScoreCard.id)
+
+
+def list_score_cards(review_period_id=None, department_id=None, department=None, status=None, search=None,
+                     fields=None, limit=None, after_id=None, manager_id=None):
+    """
+    List non-deleted score cards with keyset pagination in a single joined query.
+    
+    Only the columns (and joins) needed for the requested fields are selected;
+    filters are applied in SQL. Results are ordered by score card id, and the
+    next page starts after the last id returned.
+    
+    Args:
+        review_period_id, department_id, department (name), status: Optional exact-match filters
+        search: Optional case-insensitive match on employee name, email or employee code
+        manager_id: Optional Employee.id - only cards of employees reporting to this manager (any depth)
+        fields: Optional list of field names (see SCORE_CARD_LIST_FIELDS; 'employee' selects all employee.*)
+        limit: Page size (None returns every matching card)
+        after_id: Keyset cursor - only cards with id greater than this are returned
+        
+    Returns:
+        Tuple of (list of dicts, next cursor id or None)
+    """
+    fields = _expand_fields(fields)
+    query = _score_card_list_query(fields, review_period_id, department_id, department, status, search, after_id,
+                                   manager_id)
+    if limit:
+        # Fetch one extra row to know whether another page exists
+        query = query.limit(limit + 1)
+    rows = query.all()
+    
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].cursor_id
+    
+    return [_score_card_list_item(row, fields) for row in rows], next_cursor
+
+
+def iter_score_cards(review_period_id=None, department_id=None, department=None, status=None, search=None,
+                     fields=None, after_id=None, manager_id=None):
+    """
+    Same as list_score_cards without a limit, but yields dicts from a server-side
+    cursor instead of building the whole list (for streamed exports).
+    Unknown fields raise ValueError before any row is read.
+    """
+    fields = _expand_fields(fields)
+    query = _score_card_list_query(fields, review_period_id, department_id, department, status, search, after_id,
+                                   manager_id)
+    return (_score_card_list_item(row, fields) for row in iter_query(query))
+
+
+def _score_card_list_item(row, fields):
+    item = {}
+    employee = {}
+    for field in fields:
+        if field == 'employee.id':
+            employee['id'] = row.emp_id
+        elif field == 'employee.full_name':
+            employee['full_name'] = row.emp_full_name
+        elif field == 'employee.email':
+            employee['email'] = row.emp_email
+        elif field == 'employee.department':
+            employee['department'] = {'id': row.dept_id, 'name': row.dept_name}
+        elif field == 'employee.position':
+            employee['position'] = {'id': row.pos_id, 'title': row.pos_title}
+        else:
+            item[field] = getattr(row, field)
+    if any(f.startswith('employee.') for f in fields):
+        item['employee'] = employee
+    return item
 
 
 def get_user_score_cards(user_id):
@@ -0,0 +1,56 @@
+"""
+Streaming Service - Chunked JSON array responses for large list endpoints
+Rows are read from a server-side cursor (Query.yield_per) and serialized as
+they arrive, so memory per request stays flat regardless of row count and the
+first bytes go out before the query has finished.
+"""
+from flask import Response, current_app, stream_with_context
+from typing import Callable, Iterable, Optional
+import os
+
+# Rows fetched per cursor round-trip, and rows serialized per response chunk
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '500'))
+
+
+def wants_stream(request):
+    """True when the client asked for a streamed response (?stream=true)"""
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def iter_query(query, batch_size: int = STREAM_BATCH_SIZE):
+    """Iterate a query through a server-side cursor, batch_size rows at a time"""
+    return query.yield_per(batch_size)
+
+
+def stream_json_array(items: Iterable, serializer: Optional[Callable] = None,
+                      batch_size: int = STREAM_BATCH_SIZE) -> Response:
+    """
+    Stream an iterable as a JSON array response.
+
+    Args:
+        items: Iterable of rows (typically iter_query(...)); consumed lazily
+        serializer: Optional function turning a row into a JSON-serializable value
+        batch_size: Number of items serialized per chunk written to the client
+
+    Returns:
+        Flask Response (application/json) that produces the array chunk by chunk.
+        Errors after the first chunk cannot change the status code; the client
+        sees a truncated (invalid) JSON body instead.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '['
+        buffer = []
+        first = True
+        for item in items:
+            buffer.append(dumps(serializer(item) if serializer else item))
+            if len(buffer) >= batch_size:
+                yield ('' if first else ',') + ','.join(buffer)
+                first = False
+                buffer = []
+        if buffer:
+            yield ('' if first else ',') + ','.join(buffer)
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,285 @@
+"""
+Token Cache Service - Bounded LRU cache of verified JWT claims
+The same bearer token is presented many times per session, so after the first
+successful signature check its claims are cached under a SHA-256 digest of the
+token. Entries expire at the token's `exp` or after JWT_TOKEN_CACHE_TTL seconds,
+whichever is sooner.
+
+Revocation: deactivating or soft-deleting a user through the ORM stamps
+users.tokens_revoked_at, and authenticate_token rejects (cached or freshly
+verified) tokens of that user issued before the stamp. The same transaction
+bumps the shared 'token_revocations' row in cache_versions, so every worker
+reloads its markers at most JWT_REVOCATION_CHECK_SECONDS later (0 checks on
+every request); the deactivating worker applies them on commit. Deactivations
+done with raw SQL must set tokens_revoked_at and bump that row themselves.
+"""
+from models.user import User
+from models.cache_version import CacheVersion
+from extensions import db
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session, object_session
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_SIZE = int(os.getenv('JWT_TOKEN_CACHE_SIZE', '10000'))  # 0 disables the cache
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv('JWT_TOKEN_CACHE_TTL', '300'))
+REVOCATION_CHECK_SECONDS = float(os.getenv('JWT_REVOCATION_CHECK_SECONDS', '5'))
+_SHARED_VERSION_NAME = 'token_revocations'
+
+# Keys used on session.info: revoked user IDs (-> marker) pending until commit,
+# and whether this transaction bumped the shared version
+_PENDING_KEY = 'token_cache_evictions'
+_BUMPED_KEY = 'token_revocations_bumped'
+
+
+class TokenCache:
+    """Thread-safe LRU of verified token claims with per-entry expiry"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl_seconds: int = TOKEN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # digest -> (claims, expires_at, user_id)
+        self._by_user: Dict[int, Set[bytes]] = {}  # user_id -> digests
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return a copy of the cached claims for token, or None on miss/expiry"""
+        if self.max_size <= 0:
+            return None
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at, user_id = entry
+            if time.time() >= expires_at:
+                self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return dict(claims)
+
+    def put(self, token: str, claims: dict):
+        """Cache verified claims until min(exp, now + ttl)"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if claims.get('exp') is not None:
+            expires_at = min(expires_at, float(claims['exp']))
+        user_id = claims.get('user_id')
+        digest = self._digest(token)
+        with self._lock:
+            if digest in self._entries:
+                self._remove(digest)
+            self._entries[digest] = (dict(claims), expires_at, user_id)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def evict_user(self, user_id: int) -> int:
+        """Drop every cached token for a user; returns the number of entries removed"""
+        with self._lock:
+            digests = self._by_user.pop(user_id, set())
+            for digest in digests:
+                self._entries.pop(digest, None)
+            return len(digests)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, digest: bytes):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        user_id = entry[2]
+        digests = self._by_user.get(user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[user_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Process-wide cache instance
+token_cache = TokenCache()
+
+
+# ---- Revocation markers ----
+
+def _timestamp(value: datetime) -> float:
+    """Epoch seconds of a naive UTC datetime (as stored in the database)"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def issued_before(claims: dict, revoked_at: Optional[datetime]) -> bool:
+    """True if the token was issued before revoked_at (tokens without iat count as issued before)"""
+    if revoked_at is None:
+        return False
+    iat = claims.get('iat')
+    return iat is None or float(iat) < _timestamp(revoked_at)
+
+
+def _read_shared_version() -> Optional[int]:
+    """Read the shared revocation version through the request's session, pinned to the primary"""
+    return db.session.execute(
+        select(CacheVersion.version).where(CacheVersion.name == _SHARED_VERSION_NAME),
+        bind_arguments={'bind': db.engine}
+    ).scalar()
+
+
+def _bump_shared_version(connection):
+    """Increment the shared revocation version using the given connection/transaction"""
+    result = connection.execute(
+        update(CacheVersion.__table__)
+        .where(CacheVersion.name == _SHARED_VERSION_NAME)
+        .values(version=CacheVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(CacheVersion.__table__)
+            .values(name=_SHARED_VERSION_NAME, version=1, updated_at=datetime.utcnow())
+        )
+
+
+class TokenRevocations:
+    """Per-user not-before markers (users.tokens_revoked_at) kept in sync across workers"""
+
+    def __init__(self, check_seconds: float = REVOCATION_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._revoked_at: Dict[int, datetime] = {}  # user_id -> tokens_revoked_at
+        self._shared_version: Optional[int] = None
+        self._loaded = False
+        self._last_check = 0.0  # time.monotonic() of last shared version check
+        self.stats = {'checks': 0, 'reloads': 0, 'check_errors': 0}
+
+    def ensure_fresh(self):
+        """Reload the markers when another process changed them (checked periodically)"""
+        now = time.monotonic()
+        if self._loaded and now - self._last_check < self.check_seconds:
+            return
+        self._last_check = now
+        self.stats['checks'] += 1
+        try:
+            shared_version = _read_shared_version()
+            if self._loaded and shared_version == self._shared_version:
+                return
+            # Read the version first so a concurrent revocation is seen by the next check
+            rows = db.session.execute(
+                select(User.id, User.tokens_revoked_at).where(User.tokens_revoked_at.isnot(None)),
+                bind_arguments={'bind': db.engine}
+            ).all()
+        except Exception as e:
+            logger.warning("Could not refresh token revocations: %s", e)
+            self.stats['check_errors'] += 1
+            return
+        with self._lock:
+            self._revoked_at = {row.id: row.tokens_revoked_at for row in rows}
+            self._shared_version = shared_version
+            self._loaded = True
+        self.stats['reloads'] += 1
+
+    def revoke(self, user_id: int, revoked_at: datetime):
+        """Apply a committed revocation in this process without waiting for the next check"""
+        with self._lock:
+            current = self._revoked_at.get(user_id)
+            if current is None or revoked_at > current:
+                self._revoked_at[user_id] = revoked_at
+
+    def clear(self):
+        """Forget all markers; they are reloaded on next use"""
+        with self._lock:
+            self._revoked_at = {}
+            self._shared_version = None
+            self._loaded = False
+
+    def is_revoked(self, claims: dict) -> bool:
+        """True if the claims' user has a marker and the token was issued before it"""
+        user_id = claims.get('user_id')
+        if user_id is None:
+            return False
+        self.ensure_fresh()
+        return issued_before(claims, self._revoked_at.get(user_id))
+
+
+# Process-wide revocation markers
+token_revocations = TokenRevocations()
+
+
+# ---- Revoke on user deactivation ----
+# The marker is written with the user row and the shared version is bumped (once
+# per transaction) on the flush connection, so both commit or roll back with the
+# deactivation. This process evicts and applies the marker right after commit.
+
+def _queue_revocation(session, connection, user_id, revoked_at):
+    if not session.info.get(_BUMPED_KEY):
+        _bump_shared_version(connection)
+        session.info[_BUMPED_KEY] = True
+    session.info.setdefault(_PENDING_KEY, {})[user_id] = revoked_at
+
+
+@event.listens_for(User, 'before_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    deactivated = state.attrs.is_active.history.has_changes() and not target.is_active
+    deleted = state.attrs.deleted_at.history.has_changes() and target.deleted_at is not None
+    if deactivated or deleted:
+        target.tokens_revoked_at = datetime.utcnow()
+    # Also covers code that sets tokens_revoked_at directly (e.g. "sign out everywhere")
+    if target.tokens_revoked_at is not None and state.attrs.tokens_revoked_at.history.has_changes():
+        session = object_session(target)
+        if session is not None:
+            _queue_revocation(session, connection, target.id, target.tokens_revoked_at)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    # The row (and its marker) is gone: only this process can still reject its tokens
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, {})[target.id] = datetime.utcnow()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_evictions(session):
+    session.info.pop(_BUMPED_KEY, None)
+    for user_id, revoked_at in session.info.pop(_PENDING_KEY, {}).items():
+        token_revocations.revoke(user_id, revoked_at)
+        token_cache.evict_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_evictions(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_BUMPED_KEY, None)
@@ -0,0 +1,71 @@
+import os
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+# app.py reads these at import time: use a throwaway key pair, an in-memory
+# database and no background job workers for every test
+_private_key = Ed25519PrivateKey.generate()
+os.environ['JWT_PRIVATE_KEY'] = _private_key.private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+).decode()
+os.environ['JWT_PUBLIC_KEY'] = _private_key.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode()
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['JOB_WORKERS'] = '0'
+
+ROLE_NAMES = ['User Admin', 'HR Admin', 'Manager', 'Employee', 'External User']
+
+
+@pytest.fixture
+def pms_app():
+    """Full application on an in-memory SQLite database with the roles seeded"""
+    from app import create_app
+    from extensions import db
+    from models.role import Role
+    from services.role_service import load_roles
+    from services.token_cache_service import token_cache, token_revocations
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        # competencies uses a PostgreSQL ARRAY column and is not needed here
+        tables = [table for name, table in db.metadata.tables.items() if name != 'competencies']
+        db.metadata.create_all(db.engine, tables=tables)
+        db.session.add_all(Role(id=i, role_name=name) for i, name in enumerate(ROLE_NAMES, 1))
+        db.session.commit()
+        load_roles()
+        token_revocations.ensure_fresh()
+        yield app
+        # Per-process caches are keyed by user id, which the next test's database reuses
+        token_cache.clear()
+        token_revocations.clear()
+        db.session.remove()
+        # The in-memory database goes away with the engine's only connection
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(pms_app):
+    """Create a user (with an employee record) and return (user, auth headers)"""
+    from datetime import date
+    from extensions import db
+    from models.employee import Employee
+    from models.user import User
+    from services.auth_service import generate_token
+
+    def make(role_name='HR Admin', email=None, **employee_fields):
+        count = User.query.count() + 1
+        email = email or f'user{count}@example.com'
+        employee = Employee(employee_id=f'E{count}', full_name=f'User {count}', email=email,
+                            joining_date=date(2024, 1, 1), **employee_fields)
+        db.session.add(employee)
+        db.session.flush()
+        user = User(username=f'user{count}', email=email, password='x',
+                    role_id=ROLE_NAMES.index(role_name) + 1, employee_id=employee.id)
+        db.session.add(user)
+        db.session.commit()
+        return user, {'Authorization': f'Bearer {generate_token(user)}'}
+
+    return make
@@ -0,0 +1,79 @@
+import pytest
+from datetime import timedelta
+from extensions import db
+from services.auth_service import token_issuer
+from services.password_service import hash_password
+
+@pytest.fixture
+def refresh_tokens(monkeypatch):
+    monkeypatch.setattr(token_issuer, 'refresh_enabled', True)
+
+@pytest.fixture
+def login(pms_app, make_user, refresh_tokens):
+    """A user with a real password, logged in through the API"""
+    user, _ = make_user(email='refresh@example.com')
+    user.password = hash_password('secret', rounds=4)
+    db.session.commit()
+    client = pms_app.test_client()
+    response = client.post('/api/login', json={'email': 'refresh@example.com', 'password': 'secret'})
+    assert response.status_code == 200
+    return client, response.get_json()
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def test_login_issues_short_lived_access_and_refresh_token(login):
+    client, tokens = login
+    assert tokens['expires_in'] == int(token_issuer.access_ttl.total_seconds())
+    assert tokens['refresh_token']
+    assert client.get('/api/current-user', headers=_bearer(tokens['token'])).status_code == 200
+
+def test_refresh_token_exchange_rotates_the_refresh_token(login):
+    client, tokens = login
+    response = client.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+    refreshed = response.get_json()
+    assert client.get('/api/current-user', headers=_bearer(refreshed['token'])).status_code == 200
+    assert refreshed['refresh_token'] != tokens['refresh_token']
+    # The rotated token can be exchanged in turn
+    response = client.post('/api/token/refresh', json={'refresh_token': refreshed['refresh_token']})
+    assert response.status_code == 200
+
+def test_reused_refresh_token_is_rejected_and_revokes_the_user(login):
+    client, tokens = login
+    refreshed = client.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']}).get_json()
+
+    response = client.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Refresh token has already been used'
+    # Whoever holds the other copy is signed out too
+    response = client.post('/api/token/refresh', json={'refresh_token': refreshed['refresh_token']})
+    assert response.status_code == 401
+    assert client.get('/api/current-user', headers=_bearer(refreshed['token'])).status_code == 401
+
+def test_expired_refresh_token_is_rejected(pms_app, make_user, refresh_tokens, monkeypatch):
+    user, _ = make_user()
+    monkeypatch.setattr(token_issuer, 'refresh_ttl', timedelta(seconds=-1))
+    expired = token_issuer.issue_refresh_token(user)
+    response = pms_app.test_client().post('/api/token/refresh', json={'refresh_token': expired})
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Refresh token has expired'
+
+def test_refresh_token_is_not_an_access_token(login):
+    client, tokens = login
+    response = client.get('/api/current-user', headers=_bearer(tokens['refresh_token']))
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Invalid token'
+
+def test_access_token_is_not_a_refresh_token(login):
+    client, tokens = login
+    response = client.post('/api/token/refresh', json={'refresh_token': tokens['token']})
+    assert response.status_code == 401
+
+def test_refresh_disabled(pms_app, make_user, monkeypatch):
+    monkeypatch.setattr(token_issuer, 'refresh_enabled', False)
+    user, _ = make_user()
+    token = token_issuer.issue_refresh_token(user)
+    response = pms_app.test_client().post('/api/token/refresh', json={'refresh_token': token})
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Refresh tokens are not enabled'
@@ -0,0 +1,69 @@
+import pytest
+import threading
+import time
+from sqlalchemy import create_engine, exc as sa_exc
+from services.db_pool_service import InstrumentedQueuePool, build_engine_options, instrument_engine, get_pool_stats
+
+@pytest.fixture
+def engine(tmp_path):
+    options = build_engine_options(f'sqlite:///{tmp_path}/pool.sqlite', pool_size=2, max_overflow=1, pool_timeout=0.2)
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.sqlite', **options)
+    instrument_engine('test', engine)
+    yield engine
+    engine.dispose()
+
+def test_build_engine_options_postgres_timeouts():
+    options = build_engine_options('postgresql://localhost/pms', pool_size=7, statement_timeout_ms=5000,
+                                   idle_in_transaction_timeout_ms=60000)
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert options['pool_size'] == 7
+    assert options['connect_args']['options'] == '-c statement_timeout=5000 -c idle_in_transaction_session_timeout=60000'
+
+def test_build_engine_options_sqlite_memory_keeps_default_pool():
+    assert 'poolclass' not in build_engine_options('sqlite:///:memory:')
+
+def test_saturated_pool_times_out_and_counts(engine):
+    # pool_size + max_overflow connections can be held at once
+    held = [engine.connect() for _ in range(3)]
+    stats = get_pool_stats()['test']
+    assert stats['checked_out'] == 3
+    assert stats['overflow'] == 1
+
+    # The next checkout waits pool_timeout and then fails
+    with pytest.raises(sa_exc.TimeoutError):
+        engine.connect()
+    stats = get_pool_stats()['test']
+    assert stats['timeouts'] == 1
+    assert stats['wait_seconds_max'] >= 0.2
+
+    for connection in held:
+        connection.close()
+    stats = get_pool_stats()['test']
+    assert stats['checked_out'] == 0
+    assert stats['checkouts'] == 3
+    # Overflow connection is closed on return, pooled ones are kept
+    assert stats['connects'] == 3
+    assert stats['closes'] == 1
+
+def test_waiting_checkout_succeeds_when_connection_is_returned(engine):
+    held = [engine.connect() for _ in range(3)]
+    result = {}
+
+    def waiter():
+        start = time.monotonic()
+        with engine.connect():
+            result['waited'] = time.monotonic() - start
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    held.pop().close()
+    thread.join()
+    for connection in held:
+        connection.close()
+
+    assert result['waited'] >= 0.04
+    stats = get_pool_stats()['test']
+    assert stats['timeouts'] == 0
+    assert stats['checkouts'] == 4
+    assert sum(stats['wait_buckets'].values()) == 4
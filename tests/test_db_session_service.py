@@ -0,0 +1,79 @@
+import pytest
+from flask import Flask, Response, request
+from sqlalchemy import update
+import services.db_session_service as db_session_service
+from services.db_session_service import ReadOnlyRequestError, init_read_replicas
+
+@pytest.fixture
+def replicas(tmp_path, monkeypatch):
+    """One SQLite 'replica' (always zero lag) with module state restored afterwards"""
+    monkeypatch.setattr(db_session_service, '_REPLICAS', [])
+    monkeypatch.setattr(db_session_service, '_REPLICA_CYCLE', None)
+    monkeypatch.setattr(db_session_service, '_RECENT_WRITERS', {})
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', f'sqlite:///{tmp_path}/replica.sqlite')
+    yield
+    for replica in db_session_service._REPLICAS:
+        replica.engine.dispose()
+
+def _score_card_update():
+    from models.score_card import ScoreCard
+    return update(ScoreCard).where(ScoreCard.id == 1).values(status='accepted')
+
+def test_core_update_marks_writer(pms_app, replicas):
+    from extensions import db
+    init_read_replicas(pms_app)
+    with pms_app.test_request_context('/api/goals/bulk', method='POST'):
+        request.user = {'user_id': 7}
+        db.session.execute(_score_card_update())
+        db.session.commit()
+    assert 7 in db_session_service._RECENT_WRITERS
+
+def test_read_only_select_does_not_mark_writer(pms_app, replicas):
+    from extensions import db
+    from models.score_card import ScoreCard
+    init_read_replicas(pms_app)
+    with pms_app.test_request_context('/api/goals/bulk', method='POST'):
+        request.user = {'user_id': 7}
+        ScoreCard.query.all()
+        db.session.commit()
+    assert db_session_service._RECENT_WRITERS == {}
+
+def test_core_update_rejected_in_get_request(pms_app):
+    from extensions import db
+    with pms_app.test_request_context('/api/score-cards', method='GET'):
+        with pytest.raises(ReadOnlyRequestError):
+            db.session.execute(_score_card_update())
+        db.session.rollback()
+
+def test_streamed_response_route_header(replicas):
+    app = Flask(__name__)
+
+    @app.route('/export')
+    def export():
+        return Response(iter(['a', 'b']))
+
+    @app.route('/plain')
+    def plain():
+        return 'ok'
+
+    init_read_replicas(app)
+    client = app.test_client()
+    assert client.get('/export').headers['X-DB-Route'] == 'replica'
+    # A plain response that never opened a transaction stays on the primary
+    assert client.get('/plain').headers['X-DB-Route'] == 'primary'
+    assert client.get('/export', headers={'X-Consistency': 'strong'}).headers['X-DB-Route'] == 'primary'
+
+def test_cache_reloads_in_get_request_use_the_primary(pms_app, replicas):
+    """The replica here has no tables at all: any cache query routed to it would fail"""
+    from extensions import db
+    import services.role_service as role_service
+    from services.eligibility_index import EligibilityIndex
+    init_read_replicas(pms_app)
+    with pms_app.test_request_context('/api/roles', method='GET'):
+        assert db_session_service._choose_replica() is not None
+        role_service.reload_roles(publish=False)
+        assert role_service.get_role_id_by_name('HR Admin') is not None
+        index = EligibilityIndex()
+        index.build()
+        assert index.stats['builds'] == 1
+        db.session.rollback()
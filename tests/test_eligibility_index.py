@@ -0,0 +1,160 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import event, update
+from extensions import db
+from models.cache_version import CacheVersion
+from models.department import Department
+from models.eligibility_profile import EligibilityProfile
+from models.employee import Employee
+from models.position import Position
+from services.eligibility_index import EligibilityIndex, _bits_to_ids, eligibility_index
+from services.eligibility_service import get_matching_employees_for_profiles, get_profile_match_counts
+
+@pytest.fixture
+def org(pms_app):
+    """
+    Engineering: 1 Software Engineer, 2 Senior Engineer, 3 Sales_Lead (inactive)
+    Sales:       4 Sales Lead, 5 (no position), 6 Sales%Rep
+    """
+    departments = {'Engineering': Department(id=1, name='Engineering'), 'Sales': Department(id=2, name='Sales')}
+    titles = {1: 'Software Engineer', 2: 'Senior Engineer', 3: 'Sales_Lead', 4: 'Sales Lead', 6: 'Sales%Rep'}
+    db.session.add_all(departments.values())
+    db.session.add_all(Position(id=i, title=title) for i, title in titles.items())
+    for employee_id, department in ((1, 'Engineering'), (2, 'Engineering'), (3, 'Engineering'),
+                                    (4, 'Sales'), (5, 'Sales'), (6, 'Sales')):
+        db.session.add(Employee(
+            id=employee_id, employee_id=f'E{employee_id}', full_name=f'Employee {employee_id}',
+            email=f'e{employee_id}@example.com', joining_date=date(2024, 1, 1),
+            department_id=departments[department].id, position_id=employee_id if employee_id in titles else None,
+            is_active=employee_id != 3, employment_status='Active'
+        ))
+    db.session.commit()
+    eligibility_index.invalidate()
+    return pms_app
+
+def _shared_version():
+    db.session.expire_all()
+    row = db.session.get(CacheVersion, 'eligibility')
+    return row.version if row else 0
+
+def _profile(department='All', positions='All'):
+    return EligibilityProfile(profile_name='p', department_filter=department, position_criteria=positions)
+
+def test_bits_to_ids():
+    assert _bits_to_ids(0) == []
+    assert _bits_to_ids((1 << 0) | (1 << 3) | (1 << 70)) == [0, 3, 70]
+
+def test_build_bitsets(org):
+    index = EligibilityIndex()
+    index.build()
+    assert index.match_profile(_profile()) == [1, 2, 4, 5, 6]
+    assert index.match_profile(_profile('Engineering')) == [1, 2]
+    assert index.match_profile(_profile(positions='engineer')) == [1, 2]
+    assert index.match_profile(_profile('Sales', 'lead|rep')) == [4, 6]
+    assert index.match_any([_profile('Engineering'), _profile(positions='Lead')]) == [1, 2, 4]
+
+@pytest.mark.parametrize('department, positions', [
+    ('All', 'All'), ('Engineering', 'All'), ('Sales', 'Lead'), ('All', 'Sales_Lead'), ('All', 'Sales%'),
+    ('All', '_'), ('All', 'Engineer|'), ('Marketing', 'All'),
+])
+def test_index_matches_sql_counts(org, department, positions):
+    """% and _ are ILIKE wildcards and NULL titles never match, on both paths"""
+    profile = _profile(department, positions)
+    db.session.add(profile)
+    db.session.commit()
+    matched = get_matching_employees_for_profiles([profile.id])
+    assert len(matched) == get_profile_match_counts([profile])[profile.id]
+
+def test_committed_orm_change_is_applied_incrementally(org):
+    eligibility_index.ensure_fresh()
+    builds = eligibility_index.stats['builds']
+
+    employee = db.session.get(Employee, 5)
+    employee.department_id = 1
+    db.session.commit()
+    db.session.get(Employee, 1).is_active = False
+    db.session.commit()
+
+    assert eligibility_index.match_profile(_profile('Engineering')) == [2, 5]
+    assert eligibility_index.stats['builds'] == builds
+
+def test_rolled_back_change_is_not_applied(org):
+    eligibility_index.ensure_fresh()
+    db.session.get(Employee, 4).deleted_at = datetime.utcnow()
+    db.session.flush()
+    db.session.rollback()
+    assert 4 in eligibility_index.match_profile(_profile('Sales'))
+
+def test_one_bump_per_transaction_and_none_for_unrelated_changes(org):
+    eligibility_index.ensure_fresh()
+    version = _shared_version()
+    db.session.get(Employee, 1).full_name = 'Renamed'
+    db.session.commit()
+    assert _shared_version() == version
+
+    db.session.get(Employee, 1).position_id = 2
+    db.session.get(Employee, 2).position_id = 1
+    db.session.commit()
+    assert _shared_version() == version + 1
+
+def test_change_by_another_process_triggers_rebuild(org):
+    eligibility_index.ensure_fresh()
+    builds = eligibility_index.stats['builds']
+    # Another worker moved employee 4 and bumped the shared version; this index saw neither event
+    with db.engine.begin() as connection:
+        connection.execute(update(Employee).where(Employee.id == 4).values(department_id=1))
+        connection.execute(update(CacheVersion).where(CacheVersion.name == 'eligibility')
+                           .values(version=CacheVersion.version + 1))
+    assert eligibility_index.match_profile(_profile('Engineering')) == [1, 2, 4]
+    assert eligibility_index.stats['builds'] == builds + 1
+
+def test_bulk_update_through_session_is_seen(org):
+    eligibility_index.ensure_fresh()
+    version = _shared_version()
+    db.session.execute(update(Employee).where(Employee.department_id == 2).values(is_active=False))
+    db.session.commit()
+    assert _shared_version() == version + 1
+    assert eligibility_index.match_profile(_profile('Sales')) == []
+
+def test_lookup_checks_out_no_extra_connection(org):
+    eligibility_index.ensure_fresh()
+    db.session.get(Employee, 1)  # The request's session now holds its connection
+    checkouts = []
+    def count(*args):
+        checkouts.append(args)
+    event.listen(db.engine, 'checkout', count)
+    try:
+        eligibility_index.match_profile(_profile('Engineering'))
+    finally:
+        event.remove(db.engine, 'checkout', count)
+    assert checkouts == []
+
+def test_lookup_inside_a_changing_transaction(org):
+    eligibility_index.ensure_fresh()
+    builds = eligibility_index.stats['builds']
+    db.session.get(Employee, 4).department_id = 1
+    db.session.flush()
+    # The transaction's own uncommitted bump is not another process's change
+    assert eligibility_index.match_profile(_profile('Sales')) == [4, 5, 6]
+    assert eligibility_index.stats['builds'] == builds
+    db.session.commit()
+    assert eligibility_index.match_profile(_profile('Engineering')) == [1, 2, 4]
+    assert eligibility_index.stats['builds'] == builds
+
+    # A rebuild mid-transaction reads uncommitted rows; a rollback must drop it
+    eligibility_index.invalidate()
+    db.session.get(Employee, 4).department_id = 2
+    db.session.flush()
+    assert eligibility_index.match_profile(_profile('Sales')) == [4, 5, 6]
+    db.session.rollback()
+    assert eligibility_index.match_profile(_profile('Sales')) == [5, 6]
+
+def test_listeners_are_registered_by_create_app():
+    """A fresh process (like a CLI command) has the listeners before any eligibility code runs"""
+    import os
+    import subprocess
+    import sys
+    code = ('import sys; from app import create_app; create_app(); '
+            'print("services.eligibility_index" in sys.modules)')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=os.environ.copy(), cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip().splitlines()[-1] == 'True'
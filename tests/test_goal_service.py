@@ -0,0 +1,19 @@
+import pytest
+from services.goal_service import resolve_goal_targets
+
+@pytest.mark.parametrize('score_card_ids', [[1, None], [1, 'abc'], [1, -2], [1.5], [True], '12', [{'id': 1}]])
+def test_resolve_goal_targets_rejects_bad_ids(score_card_ids):
+    with pytest.raises(ValueError, match='score_card_ids'):
+        resolve_goal_targets(score_card_ids=score_card_ids)
+
+def test_resolve_goal_targets_accepts_numeric_strings():
+    assert resolve_goal_targets(score_card_ids=[3, '1', 3]) == [1, 3]
+
+def test_bulk_goals_route_returns_400_for_null_id(make_user, pms_app):
+    _, headers = make_user('HR Admin')
+    response = pms_app.test_client().post('/api/goals/bulk', headers=headers, json={
+        'score_card_ids': [None],
+        'goal': {'goal_name': 'Ship it', 'weight': 10}
+    })
+    assert response.status_code == 400
+    assert 'score_card_ids' in response.get_json()['error']
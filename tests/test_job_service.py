@@ -0,0 +1,94 @@
+import os
+import pytest
+from datetime import datetime, timedelta
+from extensions import db
+from models.job import Job
+import services.job_service as job_service
+from services.job_service import enqueue_job, reclaim_jobs, recover_jobs, register_job
+
+RUNS = []
+
+@register_job('test_echo')
+def _echo(context, value=None):
+    RUNS.append(value)
+    return {'value': value}
+
+@pytest.fixture
+def jobs(pms_app):
+    RUNS.clear()
+    yield pms_app
+    RUNS.clear()
+
+def _job(status='running', attempts=1, heartbeat_age=0):
+    job = Job(job_type='test_echo', status=status, params={'value': 'x'}, progress={}, attempts=attempts,
+              heartbeat_at=datetime.utcnow() - timedelta(seconds=heartbeat_age))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def _status(job_id):
+    db.session.expire_all()
+    return db.session.get(Job, job_id).status
+
+def test_enqueue_runs_inline_without_workers(jobs):
+    job = enqueue_job('test_echo', {'value': 1})
+    assert _status(job.id) == 'completed'
+    assert db.session.get(Job, job.id).attempts == 1
+    assert RUNS == [1]
+
+def test_claim_skips_jobs_that_are_not_queued(jobs):
+    job_id = _job(status='running')
+    job_service._run_job(job_id)
+    assert RUNS == []
+    assert _status(job_id) == 'running'
+
+def test_recover_requeues_stale_and_fails_exhausted_jobs(jobs):
+    stale = _job(attempts=1, heartbeat_age=job_service.JOB_STALE_SECONDS + 10)
+    exhausted = _job(attempts=job_service.JOB_MAX_ATTEMPTS, heartbeat_age=job_service.JOB_STALE_SECONDS + 10)
+    alive = _job(attempts=1, heartbeat_age=1)
+    recover_jobs()
+    assert _status(stale) == 'queued'
+    assert _status(exhausted) == 'failed'
+    assert _status(alive) == 'running'
+    # No pool in this process: the re-queued job waits for a serving process
+    assert RUNS == []
+
+def test_reclaim_renews_heartbeat_of_jobs_running_here(jobs, monkeypatch):
+    job_id = _job(heartbeat_age=job_service.JOB_STALE_SECONDS + 10)
+    monkeypatch.setattr(job_service, '_RUNNING', {job_id})
+    reclaim_jobs()
+    assert _status(job_id) == 'running'
+    assert db.session.get(Job, job_id).heartbeat_at > datetime.utcnow() - timedelta(seconds=5)
+
+@pytest.fixture
+def pool(jobs, monkeypatch):
+    """One worker thread; the reaper loop is not started so tests drive reclaim_jobs() themselves"""
+    monkeypatch.setattr(job_service, '_WORKERS', 1)
+    monkeypatch.setattr(job_service, '_EXECUTOR', None)
+    monkeypatch.setattr(job_service, '_RUNNER_PID', None)
+    monkeypatch.setattr(job_service, '_SUBMITTED', set())
+    monkeypatch.setattr(job_service, '_reaper_loop', lambda: None)
+    yield
+    if job_service._EXECUTOR is not None:
+        job_service._EXECUTOR.shutdown(wait=True)
+
+def test_runner_starts_on_first_request_not_at_create_app(pool, jobs):
+    assert job_service._RUNNER_PID is None
+    jobs.test_client().get('/metrics')
+    assert job_service._RUNNER_PID == os.getpid()
+    assert job_service._EXECUTOR is not None
+
+def test_runner_disabled(pool, jobs, monkeypatch):
+    monkeypatch.setattr(job_service, 'JOB_RUNNER_ENABLED', False)
+    jobs.test_client().get('/metrics')
+    assert job_service._RUNNER_PID is None
+    job = enqueue_job('test_echo', {'value': 2})
+    assert _status(job.id) == 'queued'
+
+def test_reclaim_runs_queued_jobs_on_the_pool(pool, jobs):
+    job_id = _job(status='queued', attempts=0)
+    job_service._ensure_job_runner()
+    reclaim_jobs()
+    job_service._EXECUTOR.shutdown(wait=True)
+    assert _status(job_id) == 'completed'
+    assert RUNS == ['x']
@@ -0,0 +1,116 @@
+import json
+import os
+import jwt
+import pytest
+from types import SimpleNamespace
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from services.auth_service import generate_token
+from services.jwt_key_service import Keyring, load_public_key, private_keyring, public_keyring
+
+def _key_pair():
+    key = Ed25519PrivateKey.generate()
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return key, private_pem, public_pem
+
+def _write_keys(path, keys):
+    path.write_text(json.dumps(keys))
+    # Make each rewrite visible to the mtime check even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def rotation(tmp_path):
+    """Keyrings backed by key files holding an 'old' and a 'new' key; env keys restored afterwards"""
+    pairs = {kid: _key_pair() for kid in ('old', 'new')}
+    public_file, private_file = tmp_path / 'public.json', tmp_path / 'private.json'
+    _write_keys(public_file, {kid: pair[2] for kid, pair in pairs.items()})
+    _write_keys(private_file, {kid: pair[1] for kid, pair in pairs.items()})
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('JWT_PUBLIC_KEYS_FILE', str(public_file))
+        mp.setenv('JWT_PRIVATE_KEYS_FILE', str(private_file))
+        mp.setenv('JWT_SIGNING_KEY_ID', 'new')
+        public_keyring.refresh(force=True)
+        private_keyring.refresh(force=True)
+        yield SimpleNamespace(monkeypatch=mp, pairs=pairs, public_file=public_file)
+    public_keyring.refresh(force=True)
+    private_keyring.refresh(force=True)
+
+def test_tokens_are_signed_with_the_current_kid(make_user, rotation):
+    user, _ = make_user()
+    token = generate_token(user)
+    assert jwt.get_unverified_header(token)['kid'] == 'new'
+    jwt.decode(token, rotation.pairs['new'][0].public_key(), algorithms=['EdDSA'])
+
+def test_default_kid_without_signing_key_id(make_user, monkeypatch):
+    monkeypatch.delenv('JWT_SIGNING_KEY_ID', raising=False)
+    user, _ = make_user()
+    assert jwt.get_unverified_header(generate_token(user))['kid'] == 'default'
+
+def test_token_signed_by_retired_key_still_verifies(pms_app, make_user, rotation):
+    user, _ = make_user()
+    rotation.monkeypatch.setenv('JWT_SIGNING_KEY_ID', 'old')
+    old_token = generate_token(user)
+    # Rotate: sign with 'new' from now on; 'old' stays in the public key file until its tokens expire
+    rotation.monkeypatch.setenv('JWT_SIGNING_KEY_ID', 'new')
+    assert jwt.get_unverified_header(generate_token(user))['kid'] == 'new'
+
+    response = pms_app.test_client().get('/api/current-user', headers={'Authorization': f'Bearer {old_token}'})
+    assert response.status_code == 200
+    assert response.get_json()['id'] == user.id
+
+def test_unknown_kid_is_rejected(pms_app, make_user):
+    user, _ = make_user()
+    rogue_key, _, _ = _key_pair()
+    token = jwt.encode({'user_id': user.id, 'typ': 'access'}, rogue_key, algorithm='EdDSA', headers={'kid': 'rogue'})
+    reloads = public_keyring.reload_count
+
+    response = pms_app.test_client().get('/api/current-user', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Invalid token'
+    # The unknown kid forced a re-check, but unchanged sources are not re-parsed
+    assert public_keyring.reload_count == reloads
+
+def test_key_added_to_file_is_picked_up(pms_app, make_user, rotation):
+    user, _ = make_user()
+    added_key, _, added_public = _key_pair()
+    token = jwt.encode({'user_id': user.id, 'role_id': user.role_id, 'typ': 'access'}, added_key,
+                       algorithm='EdDSA', headers={'kid': 'added'})
+    _write_keys(rotation.public_file, {
+        **{kid: pair[2] for kid, pair in rotation.pairs.items()}, 'added': added_public
+    })
+
+    # The unknown kid forces a re-check, which sees the file's new mtime
+    response = pms_app.test_client().get('/api/current-user', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert 'added' in public_keyring.kids()
+
+def test_keyring_reloads_only_when_sources_change(tmp_path, monkeypatch):
+    _, _, first_public = _key_pair()
+    _, _, second_public = _key_pair()
+    key_file = tmp_path / 'keys.json'
+    _write_keys(key_file, {'k1': first_public})
+    monkeypatch.delenv('TEST_PUBLIC_KEY', raising=False)
+    monkeypatch.setenv('TEST_PUBLIC_KEYS_FILE', str(key_file))
+    keyring = Keyring('TEST_PUBLIC_KEY', 'TEST_PUBLIC_KEYS_FILE', load_public_key, check_interval=0)
+
+    assert keyring.kids() == ['k1']
+    assert keyring.default_kid == 'k1'  # Single file key and no env key
+    assert keyring.reload_count == 1
+    keyring.get('k1')
+    assert keyring.reload_count == 1
+
+    _write_keys(key_file, {'k1': first_public, 'k2': second_public})
+    assert keyring.get('k2') is not None
+    assert keyring.reload_count == 2
+    assert keyring.default_kid is None  # Ambiguous without an env key
+
+    # A broken file keeps the previous keys
+    key_file.write_text('not json')
+    os.utime(key_file, ns=(0, os.stat(key_file).st_mtime_ns + 2_000_000_000))
+    assert sorted(keyring.kids()) == ['k1', 'k2']
@@ -0,0 +1,72 @@
+import json
+import logging
+import queue
+import pytest
+from flask import Flask, jsonify
+import services.logging_service as logging_service
+from services.logging_service import JsonFormatter, NonBlockingQueueHandler, RequestContextFilter, init_request_logging
+
+@pytest.fixture
+def records():
+    handler = NonBlockingQueueHandler(queue.Queue(2))
+    handler.addFilter(RequestContextFilter())
+    logger = logging.getLogger('tests.logging_service')
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger, handler.queue
+    logger.removeHandler(handler)
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    init_request_logging(app)
+
+    @app.route('/ping')
+    def ping():
+        logging.getLogger('tests.logging_service').info("pong", extra={'score_card_id': 7})
+        return jsonify({'ok': True})
+
+    return app
+
+def test_json_record_carries_request_id_and_extra_fields(app, records):
+    logger, log_queue = records
+    response = app.test_client().get('/ping', headers={'X-Request-ID': 'abc-123'})
+    assert response.headers['X-Request-ID'] == 'abc-123'
+
+    entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert entry['message'] == 'pong'
+    assert entry['level'] == 'INFO'
+    assert entry['request_id'] == 'abc-123'
+    assert entry['score_card_id'] == 7
+
+def test_invalid_request_id_is_replaced(app):
+    response = app.test_client().get('/ping', headers={'X-Request-ID': 'bad id \" with quotes'})
+    assert len(response.headers['X-Request-ID']) == 32
+
+def test_exception_is_kept_separate_from_message(records):
+    logger, log_queue = records
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Job %s failed", 5)
+    entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert entry['message'] == 'Job 5 failed'
+    assert 'ValueError: boom' in entry['exception']
+
+def test_full_queue_drops_instead_of_blocking(records):
+    logger, log_queue = records
+    dropped = NonBlockingQueueHandler.dropped
+    for i in range(3):
+        logger.info("record %s", i)
+    assert log_queue.qsize() == 2
+    assert NonBlockingQueueHandler.dropped == dropped + 1
+
+def test_debug_sampling_is_decided_per_request(app, records, monkeypatch):
+    logger, log_queue = records
+    monkeypatch.setattr(logging_service, 'LOG_DEBUG_SAMPLE_RATE', 0)
+    with app.test_request_context('/ping'):
+        logger.debug("dropped")
+        logger.info("kept")
+    assert log_queue.get_nowait().getMessage() == 'kept'
+    assert log_queue.empty()
@@ -0,0 +1,96 @@
+import json
+import os
+import pytest
+from flask import Flask, jsonify
+import services.metrics_service as metrics_service
+from services.metrics_service import init_metrics, render_metrics
+
+DEAD_PID = 4194305  # above Linux pid_max, never a live process
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_service, 'METRICS_MULTIPROC_DIR', str(tmp_path))
+    metrics_service._registry.clear()
+    app = Flask(__name__)
+
+    @app.route('/api/items/<int:item_id>')
+    def item(item_id):
+        return jsonify({'id': item_id})
+
+    init_metrics(app)
+    return app.test_client()
+
+def write_worker_snapshot(directory, pid, requests, in_flight):
+    with open(os.path.join(directory, f'metrics_{pid}.json'), 'w') as f:
+        json.dump({
+            'pid': pid,
+            'counters': [['pms_http_requests_total',
+                          [['endpoint', '/api/items/<int:item_id>'], ['method', 'GET'], ['status', '200']], requests]],
+            'gauges': [['pms_http_requests_in_flight', [], in_flight]],
+            'histograms': [],
+            'process': [['pms_token_cache_entries', 'gauge', 'Verified tokens cached', [], 7]]
+        }, f)
+
+def test_requests_are_labelled_by_route_template(client):
+    client.get('/api/items/1')
+    client.get('/api/items/2')
+    client.get('/missing')
+    text = render_metrics()
+    assert 'pms_http_requests_total{endpoint="/api/items/<int:item_id>",method="GET",status="200"} 2' in text
+    assert 'pms_http_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in text
+    assert 'pms_http_request_duration_seconds_count{endpoint="/api/items/<int:item_id>",method="GET"} 2' in text
+    assert 'pms_http_requests_in_flight 0' in text
+
+def test_scrape_aggregates_worker_files(client, tmp_path):
+    client.get('/api/items/1')
+    # A worker that exited: its counters still count, its gauges and process stats do not
+    write_worker_snapshot(str(tmp_path), DEAD_PID, requests=5, in_flight=3)
+
+    response = client.get('/metrics')
+    assert response.content_type == metrics_service.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'pms_http_requests_total{endpoint="/api/items/<int:item_id>",method="GET",status="200"} 6' in text
+    # Only the scrape itself is in flight
+    assert 'pms_http_requests_in_flight 1' in text
+    assert f'pid="{DEAD_PID}"' not in text
+    assert os.path.exists(tmp_path / f'metrics_{os.getpid()}.json')
+
+def test_metrics_auth_token(client, monkeypatch):
+    monkeypatch.setattr(metrics_service, 'METRICS_AUTH_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+def test_password_pool_wait_histogram(monkeypatch):
+    import services.password_service as password_service
+    pool = password_service.PasswordHasherPool(workers=1, max_queue=1)
+    monkeypatch.setattr(password_service, 'password_pool', pool)
+    monkeypatch.setattr(metrics_service, 'METRICS_MULTIPROC_DIR', '')
+    pool.submit(lambda: None)
+    pool.submit(lambda: None)
+
+    text = render_metrics()
+    pid = f'pid="{os.getpid()}"'
+    assert '# TYPE pms_password_pool_wait_seconds histogram' in text
+    assert f'pms_password_pool_wait_seconds_bucket{{{pid},le="+Inf"}} 2' in text
+    assert f'pms_password_pool_wait_seconds_count{{{pid}}} 2' in text
+    assert f'pms_password_pool_wait_seconds_sum{{{pid}}} ' in text
+
+def test_db_pool_wait_histogram(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    import services.db_pool_service as db_pool_service
+    monkeypatch.setattr(db_pool_service, '_ENGINES', {})
+    monkeypatch.setattr(metrics_service, 'METRICS_MULTIPROC_DIR', '')
+    url = f'sqlite:///{tmp_path}/pool.sqlite'
+    engine = create_engine(url, **db_pool_service.build_engine_options(url, pool_size=1, max_overflow=0))
+    db_pool_service.instrument_engine('primary', engine)
+    for _ in range(3):
+        engine.connect().close()
+
+    text = render_metrics()
+    labels = f'engine="primary",pid="{os.getpid()}"'
+    assert '# TYPE pms_db_pool_wait_seconds histogram' in text
+    assert f'pms_db_pool_wait_seconds_bucket{{{labels},le="0.001"}} 3' in text
+    assert f'pms_db_pool_wait_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'pms_db_pool_wait_seconds_count{{{labels}}} 3' in text
+    assert 'pms_db_pool_wait_seconds_total' not in text
+    engine.dispose()
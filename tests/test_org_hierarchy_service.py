@@ -0,0 +1,63 @@
+import pytest
+from datetime import date, datetime
+from flask import Flask
+from extensions import db
+# All models are imported so relationships between mappers resolve
+from models.role import Role  # noqa: F401
+from models.user import User  # noqa: F401
+from models.department import Department
+from models.position import Position
+from models.employee import Employee
+from models.review_period import ReviewPeriod  # noqa: F401
+from models.score_card import ScoreCard  # noqa: F401
+from models.goal import Goal  # noqa: F401
+from models.competency import Competency  # noqa: F401
+from models.evaluation import Evaluation  # noqa: F401
+from models.notification import Notification  # noqa: F401
+from models.master import Master  # noqa: F401
+from models.eligibility_profile import EligibilityProfile  # noqa: F401
+from models.cache_version import CacheVersion
+from services.org_hierarchy_service import get_ancestors, get_span_of_control, get_subtree
+from services.query_stats_service import assert_max_queries
+
+@pytest.fixture
+def org():
+    """
+    1 -> 2 -> 4 -> 6
+      -> 3 -> 5 (deleted) -> 7
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        # Employee changes bump the shared eligibility index version in cache_versions
+        db.metadata.create_all(db.engine, tables=[Department.__table__, Position.__table__, Employee.__table__,
+                                                  CacheVersion.__table__])
+        managers = {1: None, 2: 1, 3: 1, 4: 2, 5: 3, 6: 4, 7: 5}
+        for employee_id, manager_id in managers.items():
+            db.session.add(Employee(
+                id=employee_id, employee_id=f'E{employee_id}', full_name=f'Employee {employee_id}',
+                email=f'e{employee_id}@example.com', joining_date=date(2024, 1, 1),
+                reporting_manager_id=manager_id, deleted_at=datetime.utcnow() if employee_id == 5 else None
+            ))
+        db.session.commit()
+        yield app
+
+def test_subtree_covers_all_levels_in_one_query(org):
+    with assert_max_queries(1):
+        reports = get_subtree(1)
+    # 5 is deleted, so 7 (only reachable through 5) is not part of the tree
+    assert [(r['id'], r['depth']) for r in reports] == [(2, 1), (3, 1), (4, 2), (6, 3)]
+
+def test_subtree_depth_limit(org):
+    assert [r['id'] for r in get_subtree(1, max_depth=1)] == [2, 3]
+
+def test_ancestors_nearest_first(org):
+    with assert_max_queries(1):
+        managers = get_ancestors(6)
+    assert [m['id'] for m in managers] == [4, 2, 1]
+    assert get_ancestors(1) == []
+
+def test_span_of_control(org):
+    assert get_span_of_control(1) == {'direct_reports': 2, 'total_reports': 4, 'levels': 3}
+    assert get_span_of_control(6) == {'direct_reports': 0, 'total_reports': 0, 'levels': 0}
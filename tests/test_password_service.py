@@ -0,0 +1,41 @@
+import threading
+import pytest
+import services.password_service as password_service
+from services.password_service import PasswordHasherPool, PasswordPoolBusy
+
+@pytest.fixture
+def full_pool():
+    """A one-slot pool (no queue) whose only slot is held until the test ends"""
+    pool = PasswordHasherPool(workers=1, max_queue=0, retry_after=7)
+    started, release = threading.Event(), threading.Event()
+    def hold():
+        started.set()
+        release.wait(5)
+    holder = threading.Thread(target=pool.submit, args=(hold,))
+    holder.start()
+    assert started.wait(5)
+    yield pool
+    release.set()
+    holder.join(5)
+
+def test_full_pool_raises_busy(full_pool):
+    with pytest.raises(PasswordPoolBusy) as excinfo:
+        full_pool.check_password('secret', '$2b$04$invalidinvalidinvalidinvalidinvalidinvalidinvalidinva')
+    assert excinfo.value.retry_after == 7
+    stats = full_pool.stats()
+    assert stats['rejected'] == 1
+    assert stats['in_flight'] == 1
+
+def test_pool_accepts_work_again_once_a_slot_frees():
+    pool = PasswordHasherPool(workers=1, max_queue=0)
+    hashed = pool.hash_password('secret', rounds=4)
+    assert pool.check_password('secret', hashed)
+    assert not pool.check_password('wrong', hashed)
+
+def test_login_returns_503_with_retry_after_when_pool_is_full(pms_app, make_user, full_pool, monkeypatch):
+    make_user(email='busy@example.com')
+    monkeypatch.setattr(password_service, 'password_pool', full_pool)
+    response = pms_app.test_client().post('/api/login', json={'email': 'busy@example.com', 'password': 'secret'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    assert 'retry' in response.get_json()['error']
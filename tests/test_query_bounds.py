@@ -0,0 +1,63 @@
+import pytest
+from datetime import date
+from extensions import db
+from models.goal import Goal
+from models.review_period import ReviewPeriod
+from models.score_card import ScoreCard
+from services.query_stats_service import assert_max_queries
+
+GOAL_ROLES = ('HR', 'Manager', 'Employee')
+
+@pytest.fixture(params=[1, 8], ids=['1-employee', '8-employees'])
+def seeded(request, make_user):
+    """Two active review periods with a score card per employee in each and a goal per role on every card"""
+    hr_user, headers = make_user('HR Admin')
+    periods = [ReviewPeriod(period_name=f'Period {i}', period_type='Annual', start_date=date(2026, 1, 1),
+                            end_date=date(2026, 12, 31), created_by=hr_user.id) for i in range(2)]
+    db.session.add_all(periods)
+    db.session.flush()
+    cards = []
+    for _ in range(request.param):
+        user, _ = make_user('Employee')
+        for period in periods:
+            card = ScoreCard(employee_id=user.employee_id, review_period_id=period.id,
+                             status='accepted' if len(cards) % 2 else 'planning')
+            db.session.add(card)
+            db.session.flush()
+            cards.append(card)
+            for role in GOAL_ROLES:
+                author = user if role == 'Employee' else hr_user
+                db.session.add(Goal(score_card_id=card.id, goal_name=f'{role} goal', weight=10,
+                                    added_by_role=role, added_by_user_id=author.id, created_by=author.id))
+    db.session.commit()
+    # Nothing the requests read should come from the identity map
+    db.session.expire_all()
+    return headers, cards
+
+def test_score_card_list_is_one_query(seeded, pms_app):
+    headers, cards = seeded
+    client = pms_app.test_client()
+    with assert_max_queries(1):
+        response = client.get('/api/score-cards', headers=headers)
+    assert len(response.get_json()) == len(cards)
+
+    with assert_max_queries(1):
+        response = client.get('/api/score-cards?limit=5&fields=employee', headers=headers)
+    assert len(response.get_json()['items']) == min(5, len(cards))
+
+def test_score_card_goals_loads_authors_with_goals(seeded, pms_app):
+    headers, cards = seeded
+    # The score card, then its goals joined to their authors
+    with assert_max_queries(2):
+        response = pms_app.test_client().get(f'/api/score-cards/{cards[0].id}/goals', headers=headers)
+    body = response.get_json()
+    assert len(body['goals']) == len(GOAL_ROLES)
+    assert all(goal['added_by_user'] for goal in body['goals'])
+
+def test_active_review_periods_with_status_counts_is_one_query(seeded, pms_app):
+    headers, cards = seeded
+    with assert_max_queries(1):
+        response = pms_app.test_client().get('/api/review-periods/active?include_status=true', headers=headers)
+    periods = response.get_json()
+    assert sum(period['employeeCount'] for period in periods) == len(cards)
+    assert sum(sum(period['statusCounts'].values()) for period in periods) == len(cards)
@@ -0,0 +1,75 @@
+import logging
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, text
+import services.query_stats_service as query_stats_service
+from services.query_stats_service import assert_max_queries, count_queries, init_query_stats, normalize_sql
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE goals (id INTEGER PRIMARY KEY, score_card_id INTEGER)'))
+        connection.execute(text('INSERT INTO goals (score_card_id) VALUES (1), (1), (2), (3)'))
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def app(engine, monkeypatch):
+    monkeypatch.setattr(query_stats_service, 'QUERY_STATS_ENABLED', True)
+    app = Flask(__name__)
+
+    @app.route('/per-row')
+    def per_row():
+        with engine.connect() as connection:
+            ids = [row.score_card_id for row in connection.execute(text('SELECT DISTINCT score_card_id FROM goals'))]
+            counts = [connection.execute(text('SELECT count(*) FROM goals WHERE score_card_id = :id'), {'id': i}).scalar()
+                      for i in ids]
+        return jsonify(counts)
+
+    @app.route('/grouped')
+    def grouped():
+        with engine.connect() as connection:
+            rows = connection.execute(text('SELECT score_card_id, count(*) FROM goals GROUP BY score_card_id')).all()
+        return jsonify([row[1] for row in rows])
+
+    init_query_stats(app)
+    return app
+
+def test_normalize_sql_folds_literals_parameters_and_in_lists():
+    assert normalize_sql("SELECT * FROM goals WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND title = 'x'") == \
+        normalize_sql("SELECT * FROM goals\n WHERE id IN (?) AND title = 'other'")
+    assert normalize_sql('SELECT * FROM goals WHERE id = 7 AND status::text = :status') == \
+        'SELECT * FROM goals WHERE id = ? AND status::text = ?'
+
+def test_server_timing_header_counts_queries(app):
+    response = app.test_client().get('/grouped')
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert response.headers['Server-Timing'].endswith('desc="1 queries"')
+
+def test_repeated_statement_is_logged_as_n_plus_one(app, monkeypatch, caplog):
+    monkeypatch.setattr(query_stats_service, 'QUERY_STATS_N_PLUS_ONE_THRESHOLD', 3)
+    with caplog.at_level(logging.INFO, logger='services.query_stats_service'):
+        response = app.test_client().get('/per-row')
+    assert response.headers['Server-Timing'].endswith('desc="4 queries"')
+
+    log = caplog.records[-1]
+    assert log.levelno == logging.WARNING
+    assert log.event == 'n_plus_one'
+    assert log.path == '/per-row'
+    assert log.repeated[0]['count'] == 3
+    assert log.repeated[0]['sql'] == 'SELECT count(*) FROM goals WHERE score_card_id = ?'
+
+def test_assert_max_queries(app):
+    client = app.test_client()
+    with assert_max_queries(1):
+        client.get('/grouped')
+    with pytest.raises(AssertionError, match='Expected at most 2 queries, got 4 queries'):
+        with assert_max_queries(2):
+            client.get('/per-row')
+
+def test_count_queries_outside_requests(engine):
+    with count_queries() as stats:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    assert stats.count == 1
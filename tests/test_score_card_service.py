@@ -0,0 +1,100 @@
+import pytest
+from datetime import date, datetime
+from extensions import db
+from models.goal import Goal
+from models.review_period import ReviewPeriod
+from models.score_card import ScoreCard
+from services.score_card_service import adjust_goal_weight
+
+@pytest.fixture
+def score_card(make_user):
+    """HR user plus a score card holding one 40% HR goal; yields (score_card, goal, headers)"""
+    user, headers = make_user('HR Admin')
+    period = ReviewPeriod(period_name='2026', period_type='Annual', start_date=date(2026, 1, 1),
+                          end_date=date(2026, 12, 31), created_by=user.id)
+    db.session.add(period)
+    db.session.flush()
+    card = ScoreCard(employee_id=user.employee_id, review_period_id=period.id, goals_weightage=60,
+                     total_goal_weight=40, hr_goal_weight=40)
+    db.session.add(card)
+    db.session.flush()
+    goal = Goal(score_card_id=card.id, goal_name='Existing', weight=40, added_by_role='HR',
+                added_by_user_id=user.id, created_by=user.id)
+    db.session.add(goal)
+    db.session.commit()
+    return card, goal, headers
+
+def _totals(card_id):
+    db.session.expire_all()
+    card = db.session.get(ScoreCard, card_id)
+    return card.total_goal_weight, card.hr_goal_weight
+
+def test_adjust_goal_weight_rejects_over_budget_increase(score_card):
+    card, _, _ = score_card
+    assert adjust_goal_weight(card.id, 21, 'HR') is False
+    assert _totals(card.id) == (40, 40)
+
+def test_adjust_goal_weight_allows_exact_limit(score_card):
+    card, _, _ = score_card
+    assert adjust_goal_weight(card.id, 20, 'HR') is True
+    assert _totals(card.id) == (60, 60)
+
+def test_adjust_goal_weight_null_weightage_falls_back_to_default(score_card):
+    card, _, _ = score_card
+    card.goals_weightage = None
+    db.session.commit()
+    assert adjust_goal_weight(card.id, 21, 'HR') is False
+    assert adjust_goal_weight(card.id, 20, 'HR') is True
+
+def test_adjust_goal_weight_decrease_ignores_limit(score_card):
+    card, _, _ = score_card
+    card.total_goal_weight = card.hr_goal_weight = 80
+    db.session.commit()
+    assert adjust_goal_weight(card.id, -10, 'HR') is True
+    assert _totals(card.id) == (70, 70)
+
+def test_adjust_goal_weight_missing_score_card(score_card):
+    assert adjust_goal_weight(999, 5, 'HR') is False
+
+def test_update_goal_weight_over_budget_returns_400(score_card, pms_app):
+    card, goal, headers = score_card
+    client = pms_app.test_client()
+    response = client.put(f'/api/goals/{goal.id}', headers=headers, json={'weight': 61})
+    assert response.status_code == 400
+    assert '60%' in response.get_json()['error']
+    assert _totals(card.id) == (40, 40)
+
+    response = client.put(f'/api/goals/{goal.id}', headers=headers, json={'weight': 60})
+    assert response.status_code == 200
+    assert _totals(card.id) == (60, 60)
+
+def test_update_deleted_goal_returns_404(score_card, pms_app):
+    card, goal, headers = score_card
+    goal.deleted_at = datetime.utcnow()
+    db.session.commit()
+    response = pms_app.test_client().put(f'/api/goals/{goal.id}', headers=headers, json={'weight': 10})
+    assert response.status_code == 404
+    assert _totals(card.id) == (40, 40)
+
+def test_delete_goal_releases_weight_once(score_card, pms_app):
+    card, goal, headers = score_card
+    client = pms_app.test_client()
+    assert client.delete(f'/api/goals/{goal.id}', headers=headers).status_code == 200
+    assert _totals(card.id) == (0, 0)
+    assert client.delete(f'/api/goals/{goal.id}', headers=headers).status_code == 404
+    assert _totals(card.id) == (0, 0)
+
+def test_send_for_acceptance_with_null_weightage_uses_default(score_card, pms_app):
+    card, goal, headers = score_card
+    card.goals_weightage = None
+    db.session.commit()
+    client = pms_app.test_client()
+
+    response = client.post(f'/api/score-cards/{card.id}/send-for-acceptance', headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['required'] == 60
+
+    assert client.put(f'/api/goals/{goal.id}', headers=headers, json={'weight': 60}).status_code == 200
+    response = client.post(f'/api/score-cards/{card.id}/send-for-acceptance', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'pending_acceptance'
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import update
+from extensions import db
+from models.user import User
+import services.token_cache_service as token_cache_service
+from services.token_cache_service import TokenCache, issued_before, token_revocations
+
+def test_deactivated_users_token_is_rejected(pms_app, make_user):
+    user, headers = make_user()
+    client = pms_app.test_client()
+    assert client.get('/api/current-user', headers=headers).status_code == 200
+
+    user.is_active = False
+    db.session.commit()
+    assert user.tokens_revoked_at is not None
+    response = client.get('/api/current-user', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token has been revoked'
+
+    # Reactivating does not bring the old token back
+    user.is_active = True
+    db.session.commit()
+    assert client.get('/api/current-user', headers=headers).status_code == 401
+
+def test_unrelated_user_update_does_not_revoke(pms_app, make_user):
+    user, headers = make_user()
+    user.last_login = datetime.utcnow()
+    db.session.commit()
+    assert user.tokens_revoked_at is None
+    assert pms_app.test_client().get('/api/current-user', headers=headers).status_code == 200
+
+def test_deactivation_by_another_process_is_picked_up(pms_app, make_user, monkeypatch):
+    monkeypatch.setattr(token_revocations, 'check_seconds', 0)
+    user, headers = make_user()
+    client = pms_app.test_client()
+    assert client.get('/api/current-user', headers=headers).status_code == 200  # Now cached here
+
+    # Another worker deactivated the user; this process saw no ORM event
+    with db.engine.begin() as connection:
+        connection.execute(update(User).where(User.id == user.id)
+                           .values(is_active=False, tokens_revoked_at=datetime.utcnow()))
+        token_cache_service._bump_shared_version(connection)
+    response = client.get('/api/current-user', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token has been revoked'
+
+def test_issued_before():
+    revoked_at = datetime(2026, 1, 1, 12, 0, 0)
+    epoch = (revoked_at - datetime(1970, 1, 1)).total_seconds()
+    assert issued_before({'iat': epoch - 1}, revoked_at)
+    assert not issued_before({'iat': epoch}, revoked_at)
+    assert issued_before({}, revoked_at)
+    assert not issued_before({'iat': epoch - 1}, None)
+
+def test_entries_expire_at_token_exp_and_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(token_cache_service, 'time', SimpleNamespace(time=lambda: now[0], monotonic=time.monotonic))
+    cache = TokenCache(max_size=10, ttl_seconds=300)
+    cache.put('short', {'user_id': 1, 'exp': 1060})
+    cache.put('long', {'user_id': 2, 'exp': 5000})
+
+    now[0] = 1059.0
+    assert cache.get('short') == {'user_id': 1, 'exp': 1060}
+    now[0] = 1060.0
+    assert cache.get('short') is None  # exp reached
+    assert cache.get('long') is not None
+    now[0] = 1300.0
+    assert cache.get('long') is None  # TTL reached long before exp
+    assert cache.stats()['size'] == 0